@@ -5,8 +5,11 @@ Handles all route definitions and request processing.
 
 from flask import Blueprint, Flask, jsonify, render_template, request, send_file, abort, current_app
 
+from io import BytesIO
 from pathlib import Path
 
+from app.modules.cache_manager import cache_manager
+from app.modules.compression import negotiate, select_encoding, variant_path
 from app.modules.mosque_search import (
     get_formatted_mosques,
     list_countries,
@@ -145,19 +148,41 @@ def init_routes(app):
 
     @app.route("/download_ics/<filename>")
     def download_ics(filename):
-        """Serve ICS files with proper download headers."""
+        """
+        Serve ICS files with proper download headers.
+        The precompressed variant (.gz, .br, .zst) accepted by the client is sent
+        with Content-Encoding when one was published next to the file.
+        Files published by this worker are served from the memory tier of the cache.
+        """
         
         ics_path = Path(current_app.static_folder) / "ics" / filename
         
-        if not ics_path.exists():
-            abort(404, description="Fichier ICS non trouvé")
-        
-        return send_file(
-            ics_path,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/calendar'
-        )
+        cached = cache_manager.get_published_content(ics_path)
+        if cached is not None:
+            encoding = select_encoding(request.accept_encodings, cached["variants"])
+            body = cached["variants"][encoding] if encoding else cached["content"]
+            response = send_file(
+                BytesIO(body),
+                as_attachment=True,
+                download_name=filename,
+                mimetype='text/calendar',
+                etag=f"{cached['content_hash']}-{encoding or 'identity'}"
+            )
+        else:
+            if not ics_path.exists():
+                abort(404, description="Fichier ICS non trouvé")
+
+            encoding = negotiate(request.accept_encodings, ics_path)
+            response = send_file(
+                variant_path(ics_path, encoding) if encoding else ics_path,
+                as_attachment=True,
+                download_name=filename,
+                mimetype='text/calendar'
+            )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
 
     @app.route("/test_download_final")
     def test_download_final():
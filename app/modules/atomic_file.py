@@ -0,0 +1,132 @@
+"""
+Atomic file write module.
+This module publishes a file by writing it to a temporary file in the same directory
+and renaming it over the destination, so that readers in any process see either the
+previous content or the complete new one, never a partial write. Existing files can
+also be published under another name by hard link, reflink or symlink.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Union
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no ioctl
+    fcntl = None
+
+# Prefix and suffix of the temporary files, for cleaning up after a crash
+TEMP_PREFIX = "."
+TEMP_SUFFIX = ".tmp"
+
+# Linux FICLONE ioctl: the new file shares the blocks of the source (Btrfs, XFS...)
+_FICLONE = 0x40049409
+
+
+def atomic_write(path: Union[str, Path], data: bytes, fsync: bool = True):
+    """
+    Write data to path atomically.
+
+    Args:
+        path (str | Path): Destination file (parent directories are created)
+        data (bytes): File content
+        fsync (bool): Flush the file and the directory to disk before returning, so
+            that the new content also survives a crash of the machine
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f"{TEMP_PREFIX}{path.name}.", suffix=TEMP_SUFFIX
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def _fsync_dir(directory: Path):
+    """Flush a directory entry to disk (no-op where directories cannot be opened)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _reflink(source: Path, target: Path):
+    """Clone source into target, sharing its blocks."""
+    if fcntl is None:
+        raise OSError("reflink is not supported on this platform")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+_PUBLISHERS = {
+    "hardlink": lambda source, target: os.link(source, target),
+    "reflink": _reflink,
+    "symlink": lambda source, target: os.symlink(os.path.abspath(source), target),
+    "copy": lambda source, target: shutil.copyfile(source, target),
+}
+
+# Publication methods: the first one supported by the filesystem is used
+PUBLISH_METHODS = tuple(_PUBLISHERS)
+
+
+def atomic_publish(
+    source: Union[str, Path],
+    path: Union[str, Path],
+    methods: tuple = ("hardlink", "reflink", "copy"),
+) -> str:
+    """
+    Publish an existing file under another path, replacing the destination at once.
+    A hard link or a reflink costs no data I/O. A symlink follows later changes of
+    the source, and dangles once the source is removed.
+
+    Args:
+        source (str | Path): Existing file
+        path (str | Path): Destination (parent directories are created)
+        methods (tuple): Methods among PUBLISH_METHODS, tried in order
+
+    Returns:
+        str: Method used
+
+    Raises:
+        OSError: If no method succeeded (error of the last one)
+        ValueError: If a method is unknown
+    """
+    unknown = set(methods) - set(_PUBLISHERS)
+    if unknown:
+        raise ValueError(f"Unknown publish methods: {sorted(unknown)}")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{TEMP_PREFIX}{path.name}.{uuid4().hex}{TEMP_SUFFIX}")
+    error = OSError(f"No publish method for {path}")
+    for method in methods:
+        try:
+            _PUBLISHERS[method](source, tmp_path)
+            os.replace(tmp_path, path)
+            # Renaming a link over another link to the same inode does nothing
+            tmp_path.unlink(missing_ok=True)
+            return method
+        except OSError as e:
+            error = e
+            tmp_path.unlink(missing_ok=True)
+    raise error
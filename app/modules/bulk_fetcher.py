@@ -0,0 +1,215 @@
+"""
+Bulk confData prefetcher module.
+This module loads many mosques concurrently with asyncio: bounded concurrency and per-host
+rate limiting, filling the confData cache as pages arrive.
+asyncio only schedules the requests: each one runs the blocking cache lookup and
+refresh_conf_data (the fetcher's single-flight, RetryPolicy and circuit breaker) in a
+thread pool of `concurrency` workers, so the throughput is that of a thread pool, not of
+an async HTTP client.
+It can be used from a warm-up job or from the command line:
+
+    python -m app.modules.bulk_fetcher --env production --file top_mosques.txt
+"""
+
+import asyncio
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from flask import current_app
+
+from .mawaqit_fetcher import (
+    configure_fetcher,
+    get_cached_conf_data,
+    refresh_conf_data,
+)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RATE_PER_HOST = 10.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+
+
+class HostRateLimiter:
+    """
+    Spaces out request starts per host so that at most `rate` requests per second
+    are sent to each host.
+    """
+
+    def __init__(self, rate: Optional[float]):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float, optional): Requests per second per host. None or 0 disables it
+        """
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_start: dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host: str):
+        """
+        Wait until a request to host may start.
+
+        Args:
+            host (str): Target host
+        """
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def prefetch_mosques_async(
+    slugs: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_per_host: Optional[float] = DEFAULT_RATE_PER_HOST,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    skip_cached: bool = True,
+) -> dict:
+    """
+    Fetch and parse many mosque pages concurrently and fill the confData cache.
+    Requests are blocking calls of refresh_conf_data, run with the current app
+    context in a thread pool of `concurrency` workers. Must be called inside an
+    application context, after configure_fetcher.
+
+    Args:
+        slugs (Iterable[str]): Mosque identifiers
+        concurrency (int): Maximum number of requests in flight (worker threads)
+        rate_per_host (float, optional): Maximum request starts per second per host
+        retries (int): Retries on network and HTTP errors (not on 404 or parse errors)
+        backoff (float): Delay before the first retry, then doubled
+        skip_cached (bool): Do not refetch mosques already in the cache
+
+    Returns:
+        dict: Summary with fetched, skipped and failed mosques and the duration
+    """
+    slugs = list(dict.fromkeys(slugs))
+    app = current_app._get_current_object()
+    host = urlsplit(app.config["MAWAQIT_BASE_URL"]).netloc
+    limiter = HostRateLimiter(rate_per_host)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    summary = {"fetched": [], "skipped": [], "failed": {}}
+    started = time.perf_counter()
+
+    def in_app_context(fn, *args, **kwargs):
+        # Worker threads do not inherit the app context of the event loop
+        with app.app_context():
+            return fn(*args, **kwargs)
+
+    async def fetch_one(slug: str, executor: ThreadPoolExecutor):
+        async with semaphore:
+            # The confData store is SQLite: keep its reads off the event loop
+            if skip_cached and await loop.run_in_executor(
+                executor, in_app_context, get_cached_conf_data, slug
+            ):
+                summary["skipped"].append(slug)
+                return
+
+            await limiter.wait(host)
+            try:
+                await loop.run_in_executor(
+                    executor,
+                    partial(
+                        in_app_context,
+                        refresh_conf_data,
+                        slug,
+                        max_retries=retries,
+                        retry_delay=backoff,
+                        force=not skip_cached,
+                    ),
+                )
+            except (ValueError, requests.RequestException, RuntimeError) as e:
+                # Retries, rate limiter refusals and the open circuit breaker are
+                # handled by refresh_conf_data: what reaches here is final
+                summary["failed"][slug] = str(e)
+                return
+
+            summary["fetched"].append(slug)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix="mawaqit-prefetch"
+    ) as executor:
+        await asyncio.gather(*(fetch_one(slug, executor) for slug in slugs))
+
+    summary["duration_seconds"] = time.perf_counter() - started
+    return summary
+
+
+def prefetch_mosques(slugs: Iterable[str], **overrides) -> dict:
+    """
+    Synchronous entry point of the prefetcher, using the current app configuration.
+    Must be called inside an application context and outside a running event loop.
+
+    Args:
+        slugs (Iterable[str]): Mosque identifiers
+        **overrides: Keyword arguments forwarded to prefetch_mosques_async
+
+    Returns:
+        dict: Summary with fetched, skipped and failed mosques and the duration
+    """
+    configure_fetcher()
+    config = current_app.config
+    options = {
+        "concurrency": config.get("MAWAQIT_PREFETCH_CONCURRENCY", DEFAULT_CONCURRENCY),
+        "rate_per_host": config.get(
+            "MAWAQIT_PREFETCH_RATE_PER_HOST", DEFAULT_RATE_PER_HOST
+        ),
+        "retries": config.get("MAWAQIT_PREFETCH_RETRIES", DEFAULT_RETRIES),
+    }
+    options.update(overrides)
+    return asyncio.run(prefetch_mosques_async(slugs, **options))
+
+
+def main():
+    """Command line entry point: prefetch the given mosques."""
+    import argparse
+
+    from main import create_app
+
+    parser = argparse.ArgumentParser(description="Prefetch Mawaqit mosque data")
+    parser.add_argument("slugs", nargs="*", help="Mosque identifiers")
+    parser.add_argument("--file", help="File with one mosque identifier per line")
+    parser.add_argument(
+        "--env", default=None, choices=["development", "production", "testing"]
+    )
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--rate", type=float, help="Requests per second per host")
+    args = parser.parse_args()
+
+    slugs = list(args.slugs)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            slugs += [line.strip() for line in f if line.strip()]
+
+    overrides = {}
+    if args.concurrency:
+        overrides["concurrency"] = args.concurrency
+    if args.rate is not None:
+        overrides["rate_per_host"] = args.rate
+
+    app = create_app(args.env)
+    with app.app_context():
+        summary = prefetch_mosques(slugs, **overrides)
+
+    print(
+        f"✅ {len(summary['fetched'])} fetched, {len(summary['skipped'])} skipped, "
+        f"{len(summary['failed'])} failed in {summary['duration_seconds']:.1f}s"
+    )
+    for slug, error in summary["failed"].items():
+        print(f"❌ {slug}: {error}")
+
+
+if __name__ == "__main__":
+    main()
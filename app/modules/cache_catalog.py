@@ -0,0 +1,576 @@
+"""
+ICS cache catalog module.
+This module keeps one row per cached ICS file in a SQLite database (WAL mode) next to
+the cache files: generation parameters, content hash, size (raw, and stored with the
+compressed variants), creation, expiry and last access times, generation time and
+version, fingerprint of the timetable it was built from, and hit count. Lookups,
+statistics, expiry and invalidation by mosque are indexed queries instead of directory
+scans. Several rows may share the same content hash.
+Entries shared by the mosques publishing the same timetable belong to no mosque: the
+timetables each mosque was served are recorded apart, so that its invalidation also
+reaches them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+# Bumped when the table layout changes: the catalog is then migrated through
+# _MIGRATIONS when possible, rebuilt empty otherwise
+SCHEMA_VERSION = 9
+
+# Statements upgrading the catalog from a schema version to the next one
+_MIGRATIONS = {
+    5: [
+        "ALTER TABLE cache_entries"
+        " ADD COLUMN generator_version INTEGER NOT NULL DEFAULT 0",
+    ],
+    6: [
+        "ALTER TABLE cache_entries ADD COLUMN masjid_id TEXT",
+        "ALTER TABLE cache_entries ADD COLUMN scope TEXT",
+        "UPDATE cache_entries SET masjid_id = json_extract(parameters, '$.masjid_id'),"
+        " scope = json_extract(parameters, '$.scope')",
+    ],
+    7: ["ALTER TABLE cache_entries ADD COLUMN fingerprint TEXT"],
+    # timetable_refs and its index are created by _SCHEMA
+    8: [],
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    cache_key TEXT PRIMARY KEY,
+    file_type TEXT NOT NULL,
+    masjid_id TEXT,
+    scope TEXT,
+    parameters TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    build_seconds REAL NOT NULL DEFAULT 0,
+    generator_version INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    last_access REAL NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_created_at
+    ON cache_entries (created_at);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_expires_at
+    ON cache_entries (expires_at);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_file_type
+    ON cache_entries (file_type);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_masjid_id
+    ON cache_entries (masjid_id, file_type, scope);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_content_hash
+    ON cache_entries (content_hash);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access
+    ON cache_entries (last_access);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_hit_count
+    ON cache_entries (hit_count, last_access);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_fingerprint
+    ON cache_entries (fingerprint);
+CREATE TABLE IF NOT EXISTS timetable_refs (
+    masjid_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (masjid_id, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS cache_counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# Eviction order of pop_over_quota(): first rows are evicted first
+EVICTION_ORDER = {
+    "lru": "last_access",
+    "lfu": "hit_count, last_access",
+}
+
+
+class CacheCatalog:
+    """
+    SQLite catalog of the ICS cache entries keyed by cache key.
+    Connections are opened per thread and per process, so an instance can be shared by
+    request threads and survives a fork.
+    """
+
+    def __init__(self, path: Union[str, Path], busy_timeout: float = 5.0):
+        """
+        Initialize the catalog, creating the database if needed.
+
+        Args:
+            path (str | Path): SQLite database file
+            busy_timeout (float): Seconds to wait for a lock held by another process
+        """
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            while version in _MIGRATIONS and version != SCHEMA_VERSION:
+                for statement in _MIGRATIONS[version]:
+                    conn.execute(statement)
+                version += 1
+            if version != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS cache_entries")
+                conn.execute("DROP TABLE IF EXISTS cache_counters")
+                conn.execute("DROP TABLE IF EXISTS timetable_refs")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, cache_key: str) -> Optional[dict]:
+        """
+        Read a catalog entry.
+
+        Args:
+            cache_key (str): Cache key
+
+        Returns:
+            Optional[dict]: file_type, masjid_id, scope, parameters, content_hash,
+            size, stored_size, created_at, expires_at, build_seconds,
+            generator_version, fingerprint, last_access and hit_count, or None if the
+            key is not cached
+        """
+        row = (
+            self._connect()
+            .execute("SELECT * FROM cache_entries WHERE cache_key = ?", (cache_key,))
+            .fetchone()
+        )
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["parameters"] = json.loads(entry["parameters"])
+        return entry
+
+    def put(
+        self,
+        cache_key: str,
+        file_type: str,
+        parameters: dict,
+        content_hash: str,
+        size: int,
+        created_at: Optional[float] = None,
+        stored_size: Optional[int] = None,
+        expires_at: Optional[float] = None,
+        build_seconds: float = 0.0,
+        generator_version: int = 0,
+        fingerprint: Optional[str] = None,
+    ):
+        """
+        Record a freshly written cache file, resetting its access statistics.
+
+        Args:
+            cache_key (str): Cache key
+            file_type (str): Type of ICS file
+            parameters (dict): Generation parameters (their masjid_id and scope are
+                indexed, a None masjid_id for an entry shared by several mosques)
+            content_hash (str): Hash of the file content
+            size (int): File size in bytes
+            created_at (float, optional): Creation time (epoch seconds), defaults to now
+            stored_size (int, optional): Bytes on disk with the compressed variants,
+                defaults to size
+            expires_at (float, optional): End of validity (epoch seconds), None if
+                the entry only expires with its age
+            build_seconds (float): Time it took to generate the file, in seconds
+            generator_version (int): Version of the generator that wrote the file
+            fingerprint (str, optional): Fingerprint of the timetable the file was
+                built from
+        """
+        created_at = time.time() if created_at is None else created_at
+        stored_size = size if stored_size is None else stored_size
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries"
+                " (cache_key, file_type, masjid_id, scope, parameters, content_hash,"
+                " size, stored_size, created_at, expires_at, build_seconds,"
+                " generator_version, fingerprint, last_access, hit_count)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (
+                    cache_key,
+                    file_type,
+                    parameters.get("masjid_id"),
+                    parameters.get("scope"),
+                    json.dumps(parameters, ensure_ascii=False, sort_keys=True),
+                    content_hash,
+                    size,
+                    stored_size,
+                    created_at,
+                    expires_at,
+                    build_seconds,
+                    generator_version,
+                    fingerprint,
+                    created_at,
+                ),
+            )
+
+    def restamp(self, cache_key: str, created_at: float):
+        """
+        Renew the creation time of an entry whose content is still up to date.
+
+        Args:
+            cache_key (str): Cache key
+            created_at (float): New creation time (epoch seconds)
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cache_entries SET created_at = ? WHERE cache_key = ?",
+                (created_at, cache_key),
+            )
+
+    def add_reference(self, masjid_id: str, fingerprint: str):
+        """
+        Record that a mosque is served the entries of a timetable.
+
+        Args:
+            masjid_id (str): Mosque identifier
+            fingerprint (str): Fingerprint of the timetable
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO timetable_refs (masjid_id, fingerprint)"
+                " VALUES (?, ?)",
+                (masjid_id, fingerprint),
+            )
+
+    def touch(self, cache_key: str):
+        """Count a cache hit and update the last access time."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cache_entries SET last_access = ?, hit_count = hit_count + 1"
+                " WHERE cache_key = ?",
+                (time.time(), cache_key),
+            )
+
+    def add_hits(self, hits: dict[str, int]):
+        """
+        Add hits counted elsewhere (e.g. batched in memory) in one transaction.
+
+        Args:
+            hits (dict): cache_key → number of hits
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE cache_entries SET last_access = ?, hit_count = hit_count + ?"
+                " WHERE cache_key = ?",
+                [(now, count, cache_key) for cache_key, count in hits.items()],
+            )
+
+    def delete(self, cache_key: str, content_hash: Optional[str] = None):
+        """
+        Remove an entry from the catalog.
+
+        Args:
+            cache_key (str): Cache key
+            content_hash (str, optional): Only remove the entry if it still has this
+                content hash (it may have been rewritten meanwhile)
+        """
+        where, args = "cache_key = ?", (cache_key,)
+        if content_hash is not None:
+            where, args = (
+                "cache_key = ? AND content_hash = ?",
+                (cache_key, content_hash),
+            )
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM cache_entries WHERE {where}", args)
+
+    def unreferenced(self, content_hashes) -> set:
+        """
+        Get the content hashes no entry refers to any more.
+
+        Args:
+            content_hashes (Iterable[str]): Hashes to check
+
+        Returns:
+            set: Hashes without any entry
+        """
+        hashes = set(content_hashes)
+        if not hashes:
+            return hashes
+        conn = self._connect()
+        placeholders = ", ".join("?" * len(hashes))
+        used = conn.execute(
+            "SELECT DISTINCT content_hash FROM cache_entries"
+            f" WHERE content_hash IN ({placeholders})",
+            list(hashes),
+        ).fetchall()
+        return hashes - {row[0] for row in used}
+
+    def pop_created_before(self, created_before: Optional[float]) -> list[tuple]:
+        """
+        Remove the entries created before a time, or every entry.
+
+        Args:
+            created_before (float, optional): Epoch seconds, None for every entry
+
+        Returns:
+            list: (cache_key, content_hash) of the removed entries
+        """
+        where, args = "", ()
+        if created_before is not None:
+            where, args = " WHERE created_at < ?", (created_before,)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT cache_key, content_hash FROM cache_entries{where}", args
+            ).fetchall()
+            conn.execute(f"DELETE FROM cache_entries{where}", args)
+        return [(row["cache_key"], row["content_hash"]) for row in rows]
+
+    def pop_matching(
+        self,
+        masjid_id: str,
+        file_type: Optional[str] = None,
+        scope: Optional[str] = None,
+    ) -> list[tuple]:
+        """
+        Remove the entries of a mosque, through the (masjid_id, file_type, scope)
+        index, and the shared entries of the timetables it was served.
+
+        Args:
+            masjid_id (str): Mosque identifier
+            file_type (str, optional): Only entries of this file type
+            scope (str, optional): Only entries of this scope
+
+        Returns:
+            list: (cache_key, content_hash) of the removed entries
+        """
+        where = (
+            " WHERE (masjid_id = ? OR (masjid_id IS NULL AND fingerprint IN"
+            " (SELECT fingerprint FROM timetable_refs WHERE masjid_id = ?)))"
+        )
+        args = [masjid_id, masjid_id]
+        if file_type is not None:
+            where += " AND file_type = ?"
+            args.append(file_type)
+        if scope is not None:
+            where += " AND scope = ?"
+            args.append(scope)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT cache_key, content_hash FROM cache_entries{where}", args
+            ).fetchall()
+            conn.execute(f"DELETE FROM cache_entries{where}", args)
+        return [(row["cache_key"], row["content_hash"]) for row in rows]
+
+    def pop_other_timetables(self, masjid_id: str, fingerprint: str) -> list[tuple]:
+        """
+        Make a timetable the current one of a mosque: remove its entries built from
+        other timetables, and the shared entries of the timetables no mosque is
+        served any more.
+
+        Args:
+            masjid_id (str): Mosque identifier
+            fingerprint (str): Fingerprint of the current timetable
+
+        Returns:
+            list: (cache_key, content_hash) of the removed entries
+        """
+        with self._connect() as conn:
+            previous = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT fingerprint FROM timetable_refs"
+                    " WHERE masjid_id = ? AND fingerprint != ?",
+                    (masjid_id, fingerprint),
+                )
+            ]
+            conn.execute(
+                "DELETE FROM timetable_refs WHERE masjid_id = ? AND fingerprint != ?",
+                (masjid_id, fingerprint),
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO timetable_refs (masjid_id, fingerprint)"
+                " VALUES (?, ?)",
+                (masjid_id, fingerprint),
+            )
+            where = (
+                " WHERE masjid_id = ? AND fingerprint IS NOT NULL AND fingerprint != ?"
+            )
+            args = [masjid_id, fingerprint]
+            if previous:
+                placeholders = ", ".join("?" * len(previous))
+                where += (
+                    f" OR masjid_id IS NULL AND fingerprint IN ({placeholders})"
+                    " AND fingerprint NOT IN (SELECT fingerprint FROM timetable_refs)"
+                )
+                args += previous
+            rows = conn.execute(
+                f"SELECT cache_key, content_hash FROM cache_entries{where}", args
+            ).fetchall()
+            conn.execute(f"DELETE FROM cache_entries{where}", args)
+        return [(row["cache_key"], row["content_hash"]) for row in rows]
+
+    def pop_expired(self, now: float, created_before: float) -> list[tuple]:
+        """
+        Remove the entries past their expiry time, or created before a time and
+        without a timetable fingerprint (entries with one are kept until the end of
+        their period, since they can be restamped instead of rebuilt).
+
+        Args:
+            now (float): Current time (epoch seconds)
+            created_before (float): Entries created before this time are stale
+
+        Returns:
+            list: (cache_key, content_hash) of the removed entries
+        """
+        where = " WHERE expires_at <= ? OR (created_at < ? AND fingerprint IS NULL)"
+        args = (now, created_before)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT cache_key, content_hash FROM cache_entries{where}", args
+            ).fetchall()
+            conn.execute(f"DELETE FROM cache_entries{where}", args)
+        return [(row["cache_key"], row["content_hash"]) for row in rows]
+
+    def pop_outdated(self, versions: dict[str, int]) -> list[tuple]:
+        """
+        Remove the entries written by an older version of their generator (during
+        a rolling upgrade, workers still running the previous version keep the
+        entries of the new one).
+
+        Args:
+            versions (dict): file_type → current generator version (entries of
+                other file types are kept)
+
+        Returns:
+            list: (cache_key, content_hash) of the removed entries
+        """
+        if not versions:
+            return []
+        where = " WHERE " + " OR ".join(
+            ["(file_type = ? AND generator_version < ?)"] * len(versions)
+        )
+        args = [value for item in versions.items() for value in item]
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT cache_key, content_hash FROM cache_entries{where}", args
+            ).fetchall()
+            conn.execute(f"DELETE FROM cache_entries{where}", args)
+        return [(row["cache_key"], row["content_hash"]) for row in rows]
+
+    def pop_over_quota(self, max_bytes: int, policy: str = "lru") -> list[tuple]:
+        """
+        Remove entries until the stored size is at most max_bytes.
+        Content shared by several entries only counts once, and is only freed by
+        removing its last entry.
+
+        Args:
+            max_bytes (int): Size to get under, in bytes
+            policy (str): "lru" (least recently used first) or "lfu" (least
+                frequently used first, least recently used among equals)
+
+        Returns:
+            list: (cache_key, content_hash, stored_size) of the removed entries
+
+        Raises:
+            ValueError: If the policy is unknown
+        """
+        if policy not in EVICTION_ORDER:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        removed = []
+        with self._connect() as conn:
+            references = {}
+            excess = -max_bytes
+            for content_hash, count, size in conn.execute(
+                "SELECT content_hash, COUNT(*), MAX(stored_size) FROM cache_entries"
+                " GROUP BY content_hash"
+            ):
+                references[content_hash] = count
+                excess += size
+            if excess <= 0:
+                return removed
+            rows = conn.execute(
+                "SELECT cache_key, content_hash, stored_size FROM cache_entries"
+                f" ORDER BY {EVICTION_ORDER[policy]}"
+            )
+            for row in rows:
+                removed.append(
+                    (row["cache_key"], row["content_hash"], row["stored_size"])
+                )
+                references[row["content_hash"]] -= 1
+                if references[row["content_hash"]] == 0:
+                    excess -= row["stored_size"]
+                if excess <= 0:
+                    break
+            rows.close()
+            conn.executemany(
+                "DELETE FROM cache_entries WHERE cache_key = ?",
+                [(cache_key,) for cache_key, _, _ in removed],
+            )
+        return removed
+
+    def add_counters(self, counters: dict[str, float]):
+        """
+        Add to named counters shared by every process using the catalog.
+
+        Args:
+            counters (dict): Counter name → increment
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO cache_counters (name, value) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                list(counters.items()),
+            )
+
+    def counters(self) -> dict[str, float]:
+        """
+        Read the named counters.
+
+        Returns:
+            dict: Counter name → value
+        """
+        rows = self._connect().execute("SELECT name, value FROM cache_counters")
+        return {row["name"]: row["value"] for row in rows}
+
+    def stats(self) -> dict:
+        """
+        Get statistics of the catalog.
+
+        Returns:
+            dict: Entry count, stored size (each content once, with its compressed
+            variants), logical size (raw size of every entry), hits, distinct
+            contents, and entry count and logical size per file type
+        """
+        conn = self._connect()
+        total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hit_count), 0)"
+            " FROM cache_entries"
+        ).fetchone()
+        stored = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM"
+            " (SELECT MAX(stored_size) AS size FROM cache_entries"
+            " GROUP BY content_hash)"
+        ).fetchone()
+        by_type = conn.execute(
+            "SELECT file_type, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            " GROUP BY file_type"
+        ).fetchall()
+        return {
+            "entries": total[0],
+            "size_bytes": stored[1],
+            "logical_bytes": total[1],
+            "objects": stored[0],
+            "hits": total[2],
+            "by_file_type": {
+                row[0]: {"entries": row[1], "size_bytes": row[2]} for row in by_type
+            },
+        }
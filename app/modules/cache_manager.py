@@ -1,18 +1,238 @@
 """
 Cache manager module for ICS file generation.
 This module handles caching of generated ICS files to avoid regeneration.
+Cache entries are recorded in a SQLite catalog stored next to the files, and a
+background janitor keeps the directory under a disk quota. Entries are written
+atomically under a per-entry advisory lock, so several worker processes can share
+the cache directory. File contents are stored once per SHA-256 under objects/, with
+precompressed variants (gzip, and brotli/zstd when installed), and published to their
+destination by hard link (or reflink) rather than copied.
+Entries of a day, month or year scope expire at the end of that period in the mosque's
+timezone, and every entry expires once the upstream timetable may have changed.
+Concurrent misses of an entry are coalesced into a single generation. Entries are
+stamped with the version of their generator: after an upgrade, entries of an older
+version are rebuilt on their next request and removed by the janitor meanwhile.
+The entries of a mosque can be invalidated on their own, and those built from its
+previous timetable are removed when its timetable changes upstream.
+The raw bytes and variants of the hottest entries are also kept in a per-process LRU
+tier bounded by a byte budget, from which the download route serves published files.
 """
 
+import contextlib
 import hashlib
 import json
-from datetime import datetime, timedelta
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app, has_app_context
+
+from .atomic_file import TEMP_PREFIX, TEMP_SUFFIX, atomic_publish, atomic_write
+from .cache_catalog import CacheCatalog
+from .compression import EXTENSIONS, available_encodings, compress, variant_path
+from .file_lock import FileLock, remove_lock_file
+from .single_flight import DEFAULT_LOCK_TIMEOUT, SingleFlight
+from .ttl_cache import TTLCache
+
+# Default budget of the in-memory tier, overridable through ICS_CACHE_MEMORY_*
+DEFAULT_MEMORY_MAX_ENTRIES = 256
+DEFAULT_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+
+# Published files whose entry this process remembers, for the download route
+PUBLISHED_MAX_ENTRIES = 4096
+
+# Hits are counted in memory and written to the catalog at most this often (seconds),
+# and invalidations by other processes are applied to the memory tier as often
+HIT_FLUSH_INTERVAL = 5.0
+
+# Disk quota of the cache directory, overridable through ICS_CACHE_MAX_BYTES,
+# ICS_CACHE_EVICTION_POLICY and ICS_CACHE_JANITOR_INTERVAL
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_EVICTION_POLICY = "lru"
+DEFAULT_JANITOR_INTERVAL = 300.0
+
+# Entries are rebuilt from a fresh timetable after this many hours, even within their
+# period (timetables are published for the whole year and rarely change), overridable
+# through ICS_CACHE_UPSTREAM_TTL_HOURS
+DEFAULT_UPSTREAM_TTL_HOURS = 7 * 24
+
+# Probabilistic early refresh before the upstream TTL runs out, overridable through
+# ICS_CACHE_EARLY_REFRESH_BETA (0 disables it, 1 is the usual value, higher values
+# refresh earlier)
+DEFAULT_EARLY_REFRESH_BETA = 0.0
+
+# Once over quota, the janitor evicts down to this fraction of it
+QUOTA_LOW_WATERMARK = 0.9
+
+# Temporary files of interrupted writes are removed after this many seconds
+STALE_TEMP_SECONDS = 3600
+
+# Ways of publishing a cached file, tried in order (see atomic_file.PUBLISH_METHODS),
+# overridable through ICS_CACHE_PUBLISH_METHODS
+DEFAULT_PUBLISH_METHODS = ("hardlink", "reflink", "copy")
+
+# Precompressed variants kept next to each content, overridable through
+# ICS_CACHE_ENCODINGS (encodings whose codec is not installed are skipped)
+DEFAULT_ENCODINGS = ("gzip", "br", "zstd")
+
+# Version of the output of each generator, stamped on its cache entries: bump it when
+# a change of the generator changes its files (titles, paddings, events...), so that
+# the files cached by the previous version are rebuilt instead of served
+GENERATOR_VERSIONS = {
+    "prayer_times": 1,
+    "slots": 1,
+    "empty_slots": 1,
+}
+
+# Minimum padding after a prayer applied by every generator
+MIN_PADDING_AFTER = 10
+
+# Only the prayer times file shows the features options (adhkar, hijri date, fasts)
+FEATURE_FILE_TYPES = ("prayer_times",)
+
+# File types that do not show the mosque: keyed by timetable fingerprint instead of
+# masjid_id, so that mosques publishing the same timetable share them
+SHARED_FILE_TYPES = ("slots", "empty_slots")
+
+
+def canonical_parameters(
+    file_type: str,
+    padding_before: int,
+    padding_after: int,
+    include_sunset: bool,
+    prayer_paddings: Optional[dict] = None,
+    features_options: Optional[dict] = None,
+) -> dict:
+    """
+    Reduce generation parameters to the inputs that actually change a file, so that
+    equivalent requests share one cache entry: the padding used for each prayer of
+    the day (individual padding, else the global one, with the minimum padding after),
+    and the enabled features options of the file types that show them.
+
+    Args:
+        file_type (str): Type of ICS file (prayer_times/slots/empty_slots)
+        padding_before (int): Minutes before prayer
+        padding_after (int): Minutes after prayer
+        include_sunset (bool): Whether to include sunset
+        prayer_paddings (dict): Individual padding settings for each prayer
+        features_options (dict): Active features options
+
+    Returns:
+        dict: include_sunset, paddings (prayer → [before, after]) and features
+        (sorted names of the enabled options)
+    """
+    prayers = ["fajr"] + (["sunset"] if include_sunset else [])
+    prayers += ["dohr", "asr", "maghreb", "icha"]
+    paddings = {}
+    for name in prayers:
+        before, after = padding_before, padding_after
+        if prayer_paddings and name in prayer_paddings:
+            before = prayer_paddings[name]["before"]
+            after = prayer_paddings[name]["after"]
+        paddings[name] = [before, max(after, MIN_PADDING_AFTER)]
+
+    features = []
+    if features_options and file_type in FEATURE_FILE_TYPES:
+        features = sorted(name for name, value in features_options.items() if value)
+    return {
+        "include_sunset": bool(include_sunset),
+        "paddings": paddings,
+        "features": features,
+    }
+
+
+def _zone(timezone_str: Optional[str]) -> Optional[ZoneInfo]:
+    """Get the ZoneInfo of a timezone name, None (server time) if unknown."""
+    if not timezone_str:
+        return None
+    try:
+        return ZoneInfo(timezone_str)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"⚠️ Unknown timezone {timezone_str}, using server time")
+        return None
+
+
+def local_now(
+    timezone_str: Optional[str] = None, now: Optional[float] = None
+) -> datetime:
+    """
+    Get the wall-clock time of a mosque, whose date sets the day, month and year
+    of its today/month/year scopes.
+
+    Args:
+        timezone_str (str, optional): Timezone of the mosque (e.g. "Europe/Paris"),
+            server local time if None or unknown
+        now (float, optional): Epoch seconds, defaults to now
+
+    Returns:
+        datetime: Naive local date and time of the mosque
+    """
+    local = datetime.fromtimestamp(
+        time.time() if now is None else now, _zone(timezone_str)
+    )
+    return local.replace(tzinfo=None)
+
+
+def scope_period(
+    scope: str, timezone_str: Optional[str] = None, now: Optional[float] = None
+) -> tuple[str, Optional[float]]:
+    """
+    Get the period covered by a scope at a given time, in the mosque's timezone.
+
+    Args:
+        scope (str): Time scope (today/month/year)
+        timezone_str (str, optional): Timezone of the mosque (e.g. "Europe/Paris"),
+            server local time if None or unknown
+        now (float, optional): Epoch seconds, defaults to now
+
+    Returns:
+        tuple: (label of the period, e.g. "2025-03-14", "2025_03" or "2025", and the
+        epoch seconds of its end), ("", None) for a scope without period
+    """
+    tz = _zone(timezone_str)
+    local = datetime.fromtimestamp(time.time() if now is None else now, tz)
+
+    if scope == "today":
+        label = str(local.date())
+        end = local.date() + timedelta(days=1)
+    elif scope == "month":
+        label = f"{local.year}_{local.month:02d}"
+        end = date(local.year + local.month // 12, local.month % 12 + 1, 1)
+    elif scope == "year":
+        label = str(local.year)
+        end = date(local.year + 1, 1, 1)
+    else:
+        return "", None
+    # Minuit local (heure du serveur si tz est None)
+    return label, datetime.combine(end, dt_time(), tzinfo=tz).timestamp()
+
+
+def _file_identity(stat_result: os.stat_result) -> tuple:
+    """Identity of a published file: replaced by another publish, it changes."""
+    return (
+        stat_result.st_dev,
+        stat_result.st_ino,
+        stat_result.st_size,
+        stat_result.st_mtime_ns,
+    )
 
 
 class ICSCacheManager:
     """
     Manages caching for ICS file generation to avoid redundant API calls and processing.
+    The raw bytes of the hottest entries are also kept in a per-process LRU tier bounded
+    by a byte budget, so that a hit on them does not read the filesystem.
+    A background janitor removes expired entries and keeps the directory under its
+    disk quota by evicting the least recently (or least frequently) used entries.
+    Generation of a missing entry is single-flight across threads and processes.
     """
 
     def __init__(self, cache_dir: Optional[str] = None):
@@ -24,33 +244,340 @@ class ICSCacheManager:
         """
         if cache_dir is None:
             # Use app/cache directory by default
-            from pathlib import Path
-
             app_dir = Path(__file__).parent.parent
             cache_dir = app_dir / "cache"
 
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
-        self.metadata_file = self.cache_dir / "cache_metadata.json"
-        self.metadata = self._load_metadata()
+        self.catalog = CacheCatalog(self.cache_dir / "cache_catalog.sqlite3")
+        self.memory = TTLCache(
+            max_entries=DEFAULT_MEMORY_MAX_ENTRIES,
+            max_bytes=DEFAULT_MEMORY_MAX_BYTES,
+            ttl=None,
+        )
+        # Published path → (cache_key, file_type, content_hash, file identity)
+        self._published = TTLCache(
+            max_entries=PUBLISHED_MAX_ENTRIES, max_bytes=2**63, ttl=None
+        )
+        self._pending_hits: Counter = Counter()
+        self._hits_lock = threading.Lock()
+        self._hits_flushed_at = time.monotonic()
+        self._invalidations_seen = self.catalog.counters().get("invalidations", 0)
+        self._memory_synced_at = time.monotonic()
+        # (masjid_id, fingerprint) already recorded in the catalog by this process
+        self._references: set = set()
+        self.max_bytes: Optional[int] = DEFAULT_MAX_BYTES
+        self.eviction_policy = DEFAULT_EVICTION_POLICY
+        self.janitor_interval: Optional[float] = DEFAULT_JANITOR_INTERVAL
+        self.upstream_ttl_hours: float = DEFAULT_UPSTREAM_TTL_HOURS
+        self.early_refresh_beta: float = DEFAULT_EARLY_REFRESH_BETA
+        self.generator_versions = dict(GENERATOR_VERSIONS)
+        self._generation_flight = SingleFlight(self.cache_dir / "locks" / "generate")
+        self._janitor: Optional[threading.Thread] = None
+        self._janitor_pid: Optional[int] = None
+        self._janitor_stop = threading.Event()
+        self._janitor_lock = threading.Lock()
+        self.publish_methods = DEFAULT_PUBLISH_METHODS
+        self.publish_counts: Counter = Counter()
+        self.encodings = available_encodings(DEFAULT_ENCODINGS)
+        self._import_legacy_files()
+
+    def configure(self):
+        """
+        Apply the ICS_CACHE_* settings of the current app, if any, and make sure the
+        janitor of this process is running.
+        """
+        if not has_app_context():
+            return
+        config = current_app.config
+        self.memory.configure(
+            max_entries=config.get(
+                "ICS_CACHE_MEMORY_MAX_ENTRIES", DEFAULT_MEMORY_MAX_ENTRIES
+            ),
+            max_bytes=config.get(
+                "ICS_CACHE_MEMORY_MAX_BYTES", DEFAULT_MEMORY_MAX_BYTES
+            ),
+        )
+        self.max_bytes = config.get("ICS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        self.eviction_policy = config.get(
+            "ICS_CACHE_EVICTION_POLICY", DEFAULT_EVICTION_POLICY
+        )
+        self.janitor_interval = config.get(
+            "ICS_CACHE_JANITOR_INTERVAL", DEFAULT_JANITOR_INTERVAL
+        )
+        self.upstream_ttl_hours = config.get(
+            "ICS_CACHE_UPSTREAM_TTL_HOURS", DEFAULT_UPSTREAM_TTL_HOURS
+        )
+        self.early_refresh_beta = config.get(
+            "ICS_CACHE_EARLY_REFRESH_BETA", DEFAULT_EARLY_REFRESH_BETA
+        )
+        self.publish_methods = tuple(
+            config.get("ICS_CACHE_PUBLISH_METHODS", DEFAULT_PUBLISH_METHODS)
+        )
+        self.encodings = available_encodings(
+            config.get("ICS_CACHE_ENCODINGS", DEFAULT_ENCODINGS)
+        )
+        self._generation_flight.lock_timeout = config.get(
+            "ICS_CACHE_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT
+        )
+        if self.janitor_interval:
+            self.start_janitor()
+
+    def start_janitor(self):
+        """Start the janitor thread of this process if it is not running."""
+        with self._janitor_lock:
+            if (
+                self._janitor is not None
+                and self._janitor.is_alive()
+                and self._janitor_pid == os.getpid()
+            ):
+                return
+            self._janitor_stop = threading.Event()
+            self._janitor = threading.Thread(
+                target=self._janitor_loop,
+                args=(self._janitor_stop,),
+                name="ics-cache-janitor",
+                daemon=True,
+            )
+            self._janitor_pid = os.getpid()
+            self._janitor.start()
+
+    def stop_janitor(self):
+        """Stop the janitor thread and wait for it."""
+        with self._janitor_lock:
+            self._janitor_stop.set()
+            if self._janitor is not None and self._janitor_pid == os.getpid():
+                self._janitor.join(timeout=5)
+            self._janitor = None
+
+    def _janitor_loop(self, stop: threading.Event):
+        """Run the janitor every janitor_interval seconds until stopped."""
+        while True:
+            try:
+                self.run_janitor()
+            except Exception as e:
+                print(f"⚠️ Cache janitor error: {e}")
+            if stop.wait(self.janitor_interval or DEFAULT_JANITOR_INTERVAL):
+                return
+
+    def run_janitor(self) -> dict[str, int]:
+        """
+        Remove the expired entries (past the end of their period or older than the
+        upstream TTL) and those of older generator versions, then evict entries while
+        the cache is over its disk quota. Workers sharing the cache directory take
+        turns through a file lock.
+
+        Returns:
+            dict: Numbers of expired, outdated and evicted entries and of evicted bytes
+        """
+        with FileLock(self.cache_dir / "janitor.lock"):
+            self.flush_hits()
+            now = time.time()
+            expired = self.catalog.pop_expired(
+                now, now - self.upstream_ttl_hours * 3600
+            )
+            outdated = self.catalog.pop_outdated(self.generator_versions)
+            evicted = []
+            if self._over_quota():
+                evicted = self.catalog.pop_over_quota(
+                    int(self.max_bytes * QUOTA_LOW_WATERMARK), self.eviction_policy
+                )
+            for cache_key, *_ in expired + outdated + evicted:
+                self.memory.pop(cache_key)
+            self._remove_objects(content_hash for _, content_hash in expired + outdated)
+            evicted_bytes = self._remove_objects(
+                content_hash for _, content_hash, _ in evicted
+            )
+            self._remove_locks(
+                [cache_key for cache_key, _ in expired + outdated]
+                + [cache_key for cache_key, _, _ in evicted]
+            )
+            self._remove_stale_temp_files()
+
+        result = {
+            "expired": len(expired),
+            "outdated": len(outdated),
+            "evicted": len(evicted),
+            "evicted_bytes": evicted_bytes,
+        }
+        self.catalog.add_counters({"janitor_runs": 1, **result})
+        if expired or outdated or evicted:
+            print(
+                f"🧹 Cache janitor: {len(expired)} expired, {len(outdated)} outdated,"
+                f" {len(evicted)} evicted"
+                f" ({result['evicted_bytes'] / (1024 * 1024):.1f} MB)"
+            )
+        return result
+
+    def _remove_locks(self, cache_keys):
+        """
+        Remove the entry and generation lock files of removed entries. A lock held
+        by a reader or a generation in progress is left for a later removal.
 
-    def _load_metadata(self) -> dict[str, Any]:
-        """Load cache metadata from file."""
-        if self.metadata_file.exists():
+        Args:
+            cache_keys (Iterable[str]): Cache keys of the removed entries
+        """
+        for cache_key in cache_keys:
+            remove_lock_file(self._entry_lock(cache_key).path)
+            self._generation_flight.remove_lock(cache_key)
+
+    def _remove_stale_temp_files(self):
+        """Remove the temporary files left behind by interrupted writes."""
+        stale_before = time.time() - STALE_TEMP_SECONDS
+        for tmp_file in self.cache_dir.rglob(f"{TEMP_PREFIX}*{TEMP_SUFFIX}"):
+            try:
+                if tmp_file.stat().st_mtime < stale_before:
+                    tmp_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _over_quota(self) -> bool:
+        """Whether the cache is larger than its disk quota."""
+        return bool(self.max_bytes) and (
+            self.catalog.stats()["size_bytes"] > self.max_bytes
+        )
+
+    def _import_legacy_files(self):
+        """
+        Move the <key>_<file_type>.ics files and <key>_metadata.json files of older
+        versions into the object store and the catalog. Runs once: the legacy files
+        are removed afterwards, including those whose catalog entry is gone.
+        """
+        for metadata_file in self.cache_dir.glob("*_metadata.json"):
+            cache_key = metadata_file.name[: -len("_metadata.json")]
             try:
-                with open(self.metadata_file, encoding="utf-8") as f:
-                    return json.load(f)
+                with open(metadata_file, encoding="utf-8") as f:
+                    metadata = json.load(f)
+                parameters = metadata.get("parameters", {})
+                file_type = parameters["file_type"]
+                created_at = datetime.fromisoformat(metadata["created_at"]).timestamp()
+                legacy_file = self.cache_dir / f"{cache_key}_{file_type}.ics"
+                if legacy_file.exists():
+                    content = legacy_file.read_bytes()
+                    content_hash, stored_size = self._store_object(content)
+                    self.catalog.put(
+                        cache_key,
+                        file_type,
+                        parameters,
+                        content_hash,
+                        len(content),
+                        created_at=created_at,
+                        stored_size=stored_size,
+                    )
             except Exception as e:
-                print(f"⚠️ Error loading cache metadata: {e}")
-        return {}
+                print(f"⚠️ Error importing cache metadata {metadata_file.name}: {e}")
+            metadata_file.unlink(missing_ok=True)
+        for legacy_file in self.cache_dir.glob("*.ics"):
+            legacy_file.unlink(missing_ok=True)
+
+    def _object_path(self, content_hash: str) -> Path:
+        """
+        Get the path of a stored content.
+
+        Args:
+            content_hash (str): SHA-256 of the content
+
+        Returns:
+            Path: Path to the object file
+        """
+        return self.cache_dir / "objects" / content_hash[:2] / f"{content_hash}.ics"
+
+    def _store_object(self, content: bytes) -> tuple[str, int]:
+        """
+        Store a content and its compressed variants once, whatever the number of
+        entries sharing it. Compression only happens here, never when serving.
+
+        Args:
+            content (bytes): File content
 
-    def _save_metadata(self):
-        """Save cache metadata to file."""
+        Returns:
+            tuple: (SHA-256 of the content, bytes stored with the variants)
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(content_hash)
         try:
-            with open(self.metadata_file, "w", encoding="utf-8") as f:
-                json.dump(self.metadata, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"⚠️ Error saving cache metadata: {e}")
+            stored = object_path.stat().st_size == len(content)
+        except FileNotFoundError:
+            stored = False
+        if not stored:
+            atomic_write(object_path, content)
+
+        stored_size = len(content)
+        for encoding in self.encodings:
+            path = variant_path(object_path, encoding)
+            try:
+                stored_size += path.stat().st_size
+            except FileNotFoundError:
+                variant = compress(content, encoding)
+                # Tiny files do not shrink: they are always served raw
+                if len(variant) < len(content):
+                    atomic_write(path, variant)
+                    stored_size += len(variant)
+        return content_hash, stored_size
+
+    def _remove_objects(self, content_hashes) -> int:
+        """
+        Remove the stored contents no entry refers to any more.
+        A file published by hard link or reflink keeps its own copy.
+
+        Args:
+            content_hashes (Iterable[str]): Contents of removed or rewritten entries
+
+        Returns:
+            int: Bytes freed
+        """
+        freed = 0
+        for content_hash in self.catalog.unreferenced(content_hashes):
+            object_path = self._object_path(content_hash)
+            for path in [object_path] + [
+                variant_path(object_path, encoding) for encoding in EXTENSIONS
+            ]:
+                try:
+                    freed += path.stat().st_size
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        return freed
+
+    def _publish(
+        self, content_hash: str, destination_path: str, content: Optional[bytes] = None
+    ) -> str:
+        """
+        Publish a stored content and its compressed variants at a destination.
+        Variants that are not stored are removed from the destination, so that a
+        stale variant of an older content is never served.
+
+        Args:
+            content_hash (str): SHA-256 of the content
+            destination_path (str): Destination of the raw file
+            content (bytes, optional): Content to write if the object was evicted
+
+        Returns:
+            str: Publish method of the raw file ("memory" if written from content)
+
+        Raises:
+            OSError: If the content cannot be published
+        """
+        object_path = self._object_path(content_hash)
+        try:
+            method = atomic_publish(object_path, destination_path, self.publish_methods)
+        except FileNotFoundError:
+            if content is None:
+                raise
+            # Object evicted meanwhile: write the bytes kept in memory
+            atomic_write(destination_path, content, fsync=False)
+            method = "memory"
+
+        for encoding in EXTENSIONS:
+            source = variant_path(object_path, encoding)
+            target = variant_path(destination_path, encoding)
+            try:
+                if method == "memory" or encoding not in self.encodings:
+                    raise FileNotFoundError(source)
+                atomic_publish(source, target, self.publish_methods)
+            except FileNotFoundError:
+                target.unlink(missing_ok=True)
+        return method
 
     def _generate_cache_key(
         self,
@@ -62,9 +589,14 @@ class ICSCacheManager:
         file_type: str,
         prayer_paddings: Optional[dict] = None,
         features_options: Optional[dict] = None,
+        timezone_str: Optional[str] = None,
+        now: Optional[float] = None,
+        fingerprint: Optional[str] = None,
     ) -> str:
         """
-        Generate a unique cache key based on generation parameters.
+        Generate a unique cache key based on the effective generation parameters
+        (see canonical_parameters). The keys of SHARED_FILE_TYPES use the timetable
+        fingerprint, when known, in place of the mosque.
 
         Args:
             masjid_id (str): Mosque identifier
@@ -74,68 +606,138 @@ class ICSCacheManager:
             include_sunset (bool): Whether to include sunset
             file_type (str): Type of ICS file (prayer_times/slots/empty_slots)
             prayer_paddings (dict): Individual padding settings for each prayer
+            features_options (dict): Active features options
+            timezone_str (str, optional): Timezone of the mosque, for the period
+            now (float, optional): Epoch seconds, defaults to now
+            fingerprint (str, optional): Fingerprint of the mosque's timetable
 
         Returns:
             str: Unique cache key
         """
-        # Create a string with all parameters
-        params_str = f"{masjid_id}_{scope}_{padding_before}_{padding_after}_{include_sunset}_{file_type}"
-
-        # Add prayer paddings to the cache key if provided
-        if prayer_paddings:
-            # Sort prayer paddings for consistent ordering
-            sorted_paddings = sorted(prayer_paddings.items())
-            padding_str = "_".join(
-                [
-                    f"{prayer}_{paddings['before']}_{paddings['after']}"
-                    for prayer, paddings in sorted_paddings
-                ]
-            )
-            params_str += f"_paddings_{padding_str}"
-
-        # Add options options to the cache key if provided
-        if features_options:
-            # Sort options options for consistent ordering
-            sorted_options = sorted(features_options.items())
-            options_str = "_".join([f"{key}_{value}" for key, value in sorted_options])
-            params_str += f"_options_{options_str}"
-
-        # Add current date for today scope, month for month scope, year for year scope
-        now = datetime.now()
-        if scope == "today":
-            params_str += f"_{now.date()}"
-        elif scope == "month":
-            params_str += f"_{now.year}_{now.month:02d}"
-        elif scope == "year":
-            params_str += f"_{now.year}"
+        # Create a string with the parameters that change the file
+        parameters = canonical_parameters(
+            file_type,
+            padding_before,
+            padding_after,
+            include_sunset,
+            prayer_paddings,
+            features_options,
+        )
+        subject = masjid_id
+        if fingerprint is not None and file_type in SHARED_FILE_TYPES:
+            subject = f"timetable:{fingerprint}"
+        params_str = f"{subject}_{scope}_{file_type}_" + json.dumps(
+            parameters, sort_keys=True
+        )
+
+        # Add the mosque-local date for today scope, month for month scope, year for
+        # year scope
+        period, _ = scope_period(scope, timezone_str, now)
+        if period:
+            params_str += f"_{period}"
 
         # Generate hash for consistent key length
         return hashlib.md5(params_str.encode()).hexdigest()
 
-    def _get_cache_file_path(self, cache_key: str, file_type: str) -> Path:
+    def _entry_lock(self, cache_key: str, shared: bool = False) -> FileLock:
         """
-        Get the cache file path for a given key and file type.
+        Get the advisory lock of an entry: exclusive for writers, shared for readers.
 
         Args:
             cache_key (str): Cache key
-            file_type (str): Type of ICS file
+            shared (bool): Take a shared lock
 
         Returns:
-            Path: Path to the cache file
+            FileLock: Lock, not acquired yet
         """
-        return self.cache_dir / f"{cache_key}_{file_type}.ics"
+        return FileLock(self.cache_dir / "locks" / f"{cache_key}.lock", shared=shared)
 
-    def _get_cache_metadata_path(self, cache_key: str) -> Path:
+    def _valid_entry(
+        self,
+        cache_key: str,
+        file_type: str,
+        max_age_hours: Optional[float] = None,
+        locked: bool = False,
+        fingerprint: Optional[str] = None,
+    ) -> Optional[dict]:
         """
-        Get the metadata file path for a given cache key.
+        Check a cache entry against the catalog and the file on disk.
+        Reads are lock-free; a missing or mismatching file is checked again under the
+        shared entry lock, since a writer may be rewriting the entry.
+        With the fingerprint of the current timetable, an entry built from another
+        timetable is invalid, and an entry past its age limit but built from the
+        same timetable is restamped as fresh instead of being rebuilt.
 
         Args:
             cache_key (str): Cache key
+            file_type (str): Type of ICS file
+            max_age_hours (float, optional): Maximum age of cache in hours, defaults
+                to the upstream TTL
+            locked (bool): Whether the shared entry lock is already held
+            fingerprint (str, optional): Fingerprint of the current timetable
 
         Returns:
-            Path: Path to the metadata file
+            Optional[dict]: Catalog entry (see CacheCatalog.get) with the cache file
+            `path` and the `remaining` validity in seconds, None if not valid
         """
-        return self.cache_dir / f"{cache_key}_metadata.json"
+        entry = self.catalog.get(cache_key)
+        if entry is None:
+            return None
+
+        version = self.generator_versions.get(entry["file_type"], 0)
+        if entry["generator_version"] != version:
+            print(
+                f"🔁 Cache written by {file_type} generator v{entry['generator_version']},"
+                f" rebuilding with v{version}"
+            )
+            return None
+
+        if max_age_hours is None:
+            max_age_hours = self.upstream_ttl_hours
+        now = time.time()
+        if entry["expires_at"] is not None and now >= entry["expires_at"]:
+            print(f"🕐 Cache expired for {file_type} (end of its period)")
+            return None
+        compared = fingerprint is not None and entry["fingerprint"] is not None
+        if compared and entry["fingerprint"] != fingerprint:
+            print(f"📅 Cache built from another timetable for {file_type}")
+            return None
+        age = now - entry["created_at"]
+        restamp = age > max_age_hours * 3600
+        if restamp and not compared:
+            print(f"🕐 Cache expired for {file_type} ({age / 3600:.1f}h old)")
+            return None
+
+        # Check if file size matches
+        cache_file = self._object_path(entry["content_hash"])
+        try:
+            actual_size = cache_file.stat().st_size
+        except FileNotFoundError:
+            actual_size = None
+        if actual_size != entry["size"]:
+            if not locked:
+                with self._entry_lock(cache_key, shared=True):
+                    return self._valid_entry(
+                        cache_key, file_type, max_age_hours, True, fingerprint
+                    )
+            if actual_size is None:
+                self.catalog.delete(cache_key, entry["content_hash"])
+            else:
+                print(f"⚠️ Cache file size mismatch for {file_type}")
+            return None
+
+        if restamp:
+            # Same timetable as when it was built: the content is still up to date
+            self.catalog.restamp(cache_key, now)
+            self.catalog.add_counters({"restamped": 1})
+            print(f"♻️ Timetable unchanged, cache renewed for {file_type}")
+            entry["created_at"], age = now, 0.0
+        print(f"✅ Cache valid for {file_type} (age: {age / 3600:.1f}h)")
+        entry["path"] = cache_file
+        entry["remaining"] = max_age_hours * 3600 - age
+        if entry["expires_at"] is not None:
+            entry["remaining"] = min(entry["remaining"], entry["expires_at"] - now)
+        return entry
 
     def is_cache_valid(
         self,
@@ -147,7 +749,9 @@ class ICSCacheManager:
         file_type: str,
         prayer_paddings: Optional[dict] = None,
         features_options: Optional[dict] = None,
-        max_age_hours: int = 24,
+        max_age_hours: Optional[float] = None,
+        timezone_str: Optional[str] = None,
+        fingerprint: Optional[str] = None,
     ) -> bool:
         """
         Check if cache is valid for the given parameters.
@@ -160,7 +764,10 @@ class ICSCacheManager:
             include_sunset (bool): Whether to include sunset
             file_type (str): Type of ICS file
             prayer_paddings (dict): Individual padding settings for each prayer
-            max_age_hours (int): Maximum age of cache in hours
+            max_age_hours (float, optional): Maximum age of cache in hours, defaults
+                to the upstream TTL
+            timezone_str (str, optional): Timezone of the mosque
+            fingerprint (str, optional): Fingerprint of the mosque's timetable
 
         Returns:
             bool: True if cache is valid, False otherwise
@@ -174,44 +781,12 @@ class ICSCacheManager:
             file_type,
             prayer_paddings,
             features_options,
+            timezone_str=timezone_str,
+            fingerprint=fingerprint,
         )
 
-        # Check if cache file exists
-        cache_file = self._get_cache_file_path(cache_key, file_type)
-        if not cache_file.exists():
-            return False
-
-        # Check if metadata exists
-        metadata_file = self._get_cache_metadata_path(cache_key)
-        if not metadata_file.exists():
-            return False
-
         try:
-            with open(metadata_file, encoding="utf-8") as f:
-                metadata = json.load(f)
-
-            # Check cache age
-            cache_time = datetime.fromisoformat(metadata.get("created_at", ""))
-            age = datetime.now() - cache_time
-
-            if age > timedelta(hours=max_age_hours):
-                print(
-                    f"🕐 Cache expired for {file_type} ({age.total_seconds() / 3600:.1f}h old)"
-                )
-                return False
-
-            # Check if file size matches
-            expected_size = metadata.get("file_size", 0)
-            actual_size = cache_file.stat().st_size
-            if actual_size != expected_size:
-                print(f"⚠️ Cache file size mismatch for {file_type}")
-                return False
-
-            print(
-                f"✅ Cache valid for {file_type} (age: {age.total_seconds() / 3600:.1f}h)"
-            )
-            return True
-
+            return self._valid_entry(cache_key, file_type, max_age_hours) is not None
         except Exception as e:
             print(f"⚠️ Error checking cache validity: {e}")
             return False
@@ -226,6 +801,8 @@ class ICSCacheManager:
         file_type: str,
         prayer_paddings: Optional[dict] = None,
         features_options: Optional[dict] = None,
+        timezone_str: Optional[str] = None,
+        fingerprint: Optional[str] = None,
     ) -> Optional[str]:
         """
         Get the path to a cached file if it exists and is valid.
@@ -238,11 +815,13 @@ class ICSCacheManager:
             include_sunset (bool): Whether to include sunset
             file_type (str): Type of ICS file
             prayer_paddings (dict): Individual padding settings for each prayer
+            timezone_str (str, optional): Timezone of the mosque
+            fingerprint (str, optional): Fingerprint of the mosque's timetable
 
         Returns:
             Optional[str]: Path to cached file if valid, None otherwise
         """
-        if not self.is_cache_valid(
+        cache_key = self._generate_cache_key(
             masjid_id,
             scope,
             padding_before,
@@ -251,9 +830,53 @@ class ICSCacheManager:
             file_type,
             prayer_paddings,
             features_options,
-        ):
+            timezone_str=timezone_str,
+            fingerprint=fingerprint,
+        )
+        try:
+            entry = self._valid_entry(cache_key, file_type)
+        except Exception as e:
+            print(f"⚠️ Error checking cache validity: {e}")
             return None
+        if entry is None:
+            return None
+
+        self.catalog.touch(cache_key)
+        return str(entry["path"])
+
+    def get_cached_content(
+        self,
+        masjid_id: str,
+        scope: str,
+        padding_before: int,
+        padding_after: int,
+        include_sunset: bool,
+        file_type: str,
+        prayer_paddings: Optional[dict] = None,
+        features_options: Optional[dict] = None,
+        timezone_str: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ) -> Optional[bytes]:
+        """
+        Get the content of a valid cached file, from memory when possible.
+        Entries read from disk are promoted to the memory tier until they expire.
 
+        Args:
+            masjid_id (str): Mosque identifier
+            scope (str): Time scope
+            padding_before (int): Minutes before prayer
+            padding_after (int): Minutes after prayer
+            include_sunset (bool): Whether to include sunset
+            file_type (str): Type of ICS file
+            prayer_paddings (dict): Individual padding settings for each prayer
+            features_options (dict): Active features options
+            timezone_str (str, optional): Timezone of the mosque
+            fingerprint (str, optional): Fingerprint of the mosque's timetable
+
+        Returns:
+            Optional[bytes]: ICS content if cached and valid, None otherwise
+        """
+        self.configure()
         cache_key = self._generate_cache_key(
             masjid_id,
             scope,
@@ -263,13 +886,185 @@ class ICSCacheManager:
             file_type,
             prayer_paddings,
             features_options,
+            timezone_str=timezone_str,
+            fingerprint=fingerprint,
         )
-        cache_file = self._get_cache_file_path(cache_key, file_type)
+        self._sync_memory()
+        cached = self.memory.get(cache_key)
+        if cached is None:
+            cached = self._promote(cache_key, file_type)
+        if cached is None:
+            return None
 
-        if cache_file.exists():
-            return str(cache_file)
+        self._count_hit(cache_key)
+        return cached["content"]
 
-        return None
+    def get_published_content(self, path) -> Optional[dict]:
+        """
+        Get the content of a file published by this process from the memory tier,
+        provided it is still the file at that path (another process may have
+        published another entry there since). Costs a stat() of the file instead of
+        opening and reading it; the first request of a file promotes it from disk.
+
+        Args:
+            path (str | Path): Published path
+
+        Returns:
+            Optional[dict]: content_hash, content and variants (encoding → bytes),
+            None if the file is not known here or no longer the one published
+        """
+        published = self._published.get(str(path))
+        if published is None:
+            return None
+        cache_key, file_type, content_hash, identity = published
+        try:
+            if _file_identity(os.stat(path)) != identity:
+                self._published.pop(str(path))
+                return None
+        except FileNotFoundError:
+            self._published.pop(str(path))
+            return None
+
+        self._sync_memory()
+        cached = self.memory.get(cache_key)
+        if cached is None:
+            cached = self._promote(cache_key, file_type)
+        if cached is None or cached["content_hash"] != content_hash:
+            return None
+        return cached
+
+    def _promote(self, cache_key: str, file_type: str) -> Optional[dict]:
+        """
+        Read a valid entry from disk and keep it in the memory tier.
+
+        Args:
+            cache_key (str): Cache key
+            file_type (str): Type of ICS file
+
+        Returns:
+            Optional[dict]: Memory tier value of the entry, None if not valid
+        """
+        try:
+            entry, content = self._read_entry(cache_key, file_type)
+        except Exception as e:
+            print(f"⚠️ Error reading cached file: {e}")
+            return None
+        if content is None:
+            return None
+        return self._remember(
+            cache_key, entry["content_hash"], content, entry["expires_at"]
+        )
+
+    def _remember(
+        self,
+        cache_key: str,
+        content_hash: str,
+        content: bytes,
+        expires_at: Optional[float],
+    ) -> dict:
+        """
+        Keep the content of an entry and its stored variants in the memory tier,
+        until the entry expires.
+
+        Args:
+            cache_key (str): Cache key
+            content_hash (str): SHA-256 of the content
+            content (bytes): File content
+            expires_at (float, optional): End of the period of the entry
+
+        Returns:
+            dict: content_hash, content and variants (encoding → bytes)
+        """
+        object_path = self._object_path(content_hash)
+        variants = {}
+        for encoding in self.encodings:
+            with contextlib.suppress(FileNotFoundError):
+                variants[encoding] = variant_path(object_path, encoding).read_bytes()
+        cached = {
+            "content_hash": content_hash,
+            "content": bytes(content),
+            "variants": variants,
+        }
+        ttl = self.upstream_ttl_hours * 3600
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl > 0:
+            self.memory.set(
+                cache_key,
+                cached,
+                size=len(content) + sum(map(len, variants.values())),
+                ttl=ttl,
+            )
+        return cached
+
+    def _record_published(
+        self, destination_path: str, cache_key: str, file_type: str, content_hash: str
+    ):
+        """
+        Remember which entry was published at a path, for get_published_content.
+
+        Args:
+            destination_path (str): Published path
+            cache_key (str): Cache key
+            file_type (str): Type of ICS file
+            content_hash (str): SHA-256 of the published content
+        """
+        try:
+            identity = _file_identity(os.stat(destination_path))
+        except FileNotFoundError:
+            return
+        self._published.set(
+            str(destination_path),
+            (cache_key, file_type, content_hash, identity),
+            size=0,
+        )
+
+    def _read_entry(
+        self, cache_key: str, file_type: str
+    ) -> tuple[Optional[dict], Optional[bytes]]:
+        """
+        Read a valid entry and its content from disk.
+
+        Args:
+            cache_key (str): Cache key
+            file_type (str): Type of ICS file
+
+        Returns:
+            tuple: (catalog entry, content), or (None, None) if not valid
+        """
+        entry = self._valid_entry(cache_key, file_type)
+        if entry is None:
+            return None, None
+        try:
+            content = entry["path"].read_bytes()
+        except FileNotFoundError:
+            content = None
+        if content is None or len(content) != entry["size"]:
+            # Rewritten since the check: read again while no writer holds the entry
+            with self._entry_lock(cache_key, shared=True):
+                entry = self._valid_entry(cache_key, file_type, locked=True)
+                if entry is None:
+                    return None, None
+                content = entry["path"].read_bytes()
+            if len(content) != entry["size"]:
+                return None, None
+        return entry, content
+
+    def _count_hit(self, cache_key: str):
+        """Count a hit, writing pending hits to the catalog every HIT_FLUSH_INTERVAL."""
+        with self._hits_lock:
+            self._pending_hits[cache_key] += 1
+            if time.monotonic() - self._hits_flushed_at < HIT_FLUSH_INTERVAL:
+                return
+        self.flush_hits()
+
+    def flush_hits(self):
+        """Write the hits counted in memory to the catalog."""
+        with self._hits_lock:
+            pending, self._pending_hits = self._pending_hits, Counter()
+            self._hits_flushed_at = time.monotonic()
+        if pending:
+            self.catalog.add_hits(pending)
 
     def save_to_cache(
         self,
@@ -283,6 +1078,10 @@ class ICSCacheManager:
         original_path: str,
         prayer_paddings: Optional[dict] = None,
         features_options: Optional[dict] = None,
+        publish: bool = False,
+        timezone_str: Optional[str] = None,
+        build_seconds: float = 0.0,
+        fingerprint: Optional[str] = None,
     ) -> str:
         """
         Save a generated file to cache.
@@ -297,10 +1096,19 @@ class ICSCacheManager:
             file_content (bytes): File content to cache
             original_path (str): Original file path
             prayer_paddings (dict): Individual padding settings for each prayer
+            features_options (dict): Active features options
+            publish (bool): Also publish the file and its variants at original_path
+            timezone_str (str, optional): Timezone of the mosque, whose local
+                midnight ends the period of the entry
+            build_seconds (float): Time it took to generate the file, in seconds
+            fingerprint (str, optional): Fingerprint of the timetable the file was
+                built from (see timetable_fingerprint)
 
         Returns:
             str: Path to the cached file
         """
+        now = time.time()
+        shared = fingerprint is not None and file_type in SHARED_FILE_TYPES
         cache_key = self._generate_cache_key(
             masjid_id,
             scope,
@@ -310,34 +1118,53 @@ class ICSCacheManager:
             file_type,
             prayer_paddings,
             features_options,
+            timezone_str=timezone_str,
+            now=now,
+            fingerprint=fingerprint,
         )
+        _, expires_at = scope_period(scope, timezone_str, now)
+
+        # Save the file and record it in the catalog, one writer per entry at a time
+        self._reference(masjid_id, fingerprint)
+        with self._entry_lock(cache_key):
+            previous = self.catalog.get(cache_key)
+            content_hash, stored_size = self._store_object(file_content)
+            self.catalog.put(
+                cache_key,
+                file_type,
+                {
+                    # Shared entries belong to every mosque served them
+                    "masjid_id": None if shared else masjid_id,
+                    "scope": scope,
+                    "padding_before": padding_before,
+                    "padding_after": padding_after,
+                    "include_sunset": include_sunset,
+                    "file_type": file_type,
+                    "prayer_paddings": prayer_paddings,
+                    "features_options": features_options,
+                    "timezone": timezone_str,
+                    "original_path": original_path,
+                },
+                content_hash,
+                len(file_content),
+                created_at=now,
+                stored_size=stored_size,
+                expires_at=expires_at,
+                build_seconds=build_seconds,
+                generator_version=self.generator_versions.get(file_type, 0),
+                fingerprint=fingerprint,
+            )
+            if previous is not None and previous["content_hash"] != content_hash:
+                self._remove_objects([previous["content_hash"]])
 
-        # Save the file
-        cache_file = self._get_cache_file_path(cache_key, file_type)
-        with open(cache_file, "wb") as f:
-            f.write(file_content)
-
-        # Save metadata
-        metadata = {
-            "created_at": datetime.now().isoformat(),
-            "original_path": original_path,
-            "file_size": len(file_content),
-            "parameters": {
-                "masjid_id": masjid_id,
-                "scope": scope,
-                "padding_before": padding_before,
-                "padding_after": padding_after,
-                "include_sunset": include_sunset,
-                "file_type": file_type,
-                "prayer_paddings": prayer_paddings,
-                "features_options": features_options,
-            },
-        }
+        self.configure()
+        self._remember(cache_key, content_hash, file_content, expires_at)
 
-        metadata_file = self._get_cache_metadata_path(cache_key)
-        with open(metadata_file, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        if publish:
+            self._publish(content_hash, original_path, file_content)
+            self._record_published(original_path, cache_key, file_type, content_hash)
 
+        cache_file = self._object_path(content_hash)
         print(f"💾 Cached {file_type} file: {cache_file}")
         return str(cache_file)
 
@@ -352,9 +1179,14 @@ class ICSCacheManager:
         destination_path: str,
         prayer_paddings: Optional[dict] = None,
         features_options: Optional[dict] = None,
+        timezone_str: Optional[str] = None,
+        fingerprint: Optional[str] = None,
     ) -> bool:
         """
-        Copy a cached file to the destination path.
+        Publish a cached file and its compressed variants at the destination path,
+        by hard link (or reflink) to the stored content when the filesystem allows
+        it, the destination being replaced at once so that downloads never see a
+        partial file.
 
         Args:
             masjid_id (str): Mosque identifier
@@ -365,11 +1197,15 @@ class ICSCacheManager:
             file_type (str): Type of ICS file
             destination_path (str): Destination path
             prayer_paddings (dict): Individual padding settings for each prayer
+            features_options (dict): Active features options
+            timezone_str (str, optional): Timezone of the mosque
+            fingerprint (str, optional): Fingerprint of the mosque's timetable
 
         Returns:
             bool: True if successful, False otherwise
         """
-        cached_path = self.get_cached_file_path(
+        self.configure()
+        cache_key = self._generate_cache_key(
             masjid_id,
             scope,
             padding_before,
@@ -378,57 +1214,335 @@ class ICSCacheManager:
             file_type,
             prayer_paddings,
             features_options,
+            timezone_str=timezone_str,
+            fingerprint=fingerprint,
         )
-
-        if not cached_path:
+        try:
+            found = self._lookup(cache_key, file_type)
+        except Exception as e:
+            print(f"⚠️ Error checking cache validity: {e}")
+            return False
+        if found is None:
             return False
+        return self._publish_entry(cache_key, file_type, found, destination_path)
+
+    def publish_or_generate(
+        self,
+        masjid_id: str,
+        scope: str,
+        padding_before: int,
+        padding_after: int,
+        include_sunset: bool,
+        file_type: str,
+        destination_path: str,
+        generate: Callable[[], bytes],
+        prayer_paddings: Optional[dict] = None,
+        features_options: Optional[dict] = None,
+        timezone_str: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ) -> bool:
+        """
+        Publish a cached file at the destination path, or generate, cache and publish
+        it on a miss. Concurrent misses of the same entry run a single generation:
+        threads of this process wait for it, and other processes wait on a lock file
+        and then find the fresh entry. With early_refresh_beta set, a request now and
+        then rebuilds an entry shortly before its upstream TTL runs out (the closer to
+        it, the likelier), while the other requests keep being served the cached file.
+        With the fingerprint of the timetable, only a change of timetable rebuilds an
+        entry: one that outlived its upstream TTL is restamped as fresh.
 
+        Args:
+            masjid_id (str): Mosque identifier
+            scope (str): Time scope
+            padding_before (int): Minutes before prayer
+            padding_after (int): Minutes after prayer
+            include_sunset (bool): Whether to include sunset
+            file_type (str): Type of ICS file
+            destination_path (str): Destination path
+            generate (Callable): Builds the ICS content, without arguments
+            prayer_paddings (dict): Individual padding settings for each prayer
+            features_options (dict): Active features options
+            timezone_str (str, optional): Timezone of the mosque
+            fingerprint (str, optional): Fingerprint of the current timetable
+
+        Returns:
+            bool: True if published from cache, False if generated by this call
+
+        Raises:
+            Exception: The exception raised by generate
+        """
+        self.configure()
+        started = time.time()
+        cache_key = self._generate_cache_key(
+            masjid_id,
+            scope,
+            padding_before,
+            padding_after,
+            include_sunset,
+            file_type,
+            prayer_paddings,
+            features_options,
+            timezone_str=timezone_str,
+            fingerprint=fingerprint,
+        )
         try:
-            # Ensure destination directory exists
-            dest_path = Path(destination_path)
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            self._reference(masjid_id, fingerprint)
+            found = self._lookup(cache_key, file_type, fingerprint)
+        except Exception as e:
+            print(f"⚠️ Error checking cache validity: {e}")
+            found = None
+        if found is not None:
+            if not self._refresh_early(found, fingerprint):
+                if self._publish_entry(cache_key, file_type, found, destination_path):
+                    return True
+            else:
+                print(f"⏳ Early refresh of cached {file_type}")
+                self.catalog.add_counters({"early_refreshes": 1})
+
+        built = []
+
+        def build() -> dict:
+            start = time.monotonic()
+            content = generate()
+            self.save_to_cache(
+                masjid_id,
+                scope,
+                padding_before,
+                padding_after,
+                include_sunset,
+                file_type,
+                content,
+                destination_path,
+                prayer_paddings,
+                features_options,
+                publish=True,
+                timezone_str=timezone_str,
+                build_seconds=time.monotonic() - start,
+                fingerprint=fingerprint,
+            )
+            built.append(True)
+            return {
+                "content_hash": hashlib.sha256(content).hexdigest(),
+                "content": content,
+            }
+
+        def recheck() -> Optional[dict]:
+            # Generated by another process while this one was waiting for the lock
+            entry = self.catalog.get(cache_key)
+            if entry is None or entry["created_at"] < started:
+                return None
+            return self._lookup(cache_key, file_type, fingerprint)
+
+        result = self._generation_flight.do(cache_key, build, recheck)
+        if built:
+            return False
+        # Generated by another request: publish its result here too
+        return self._publish_entry(cache_key, file_type, result, destination_path)
+
+    def _lookup(
+        self, cache_key: str, file_type: str, fingerprint: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Find a valid entry, with its content when the memory tier holds it.
 
-            # Copy file
-            import shutil
+        Args:
+            cache_key (str): Cache key
+            file_type (str): Type of ICS file
+            fingerprint (str, optional): Fingerprint of the current timetable
 
-            shutil.copy2(cached_path, destination_path)
+        Returns:
+            Optional[dict]: content_hash, content (None if not in memory: it is
+            then read from the stored object), created_at, expires_at,
+            build_seconds and fingerprint, None if not valid
+        """
+        entry = self._valid_entry(cache_key, file_type, fingerprint=fingerprint)
+        if entry is None:
+            return None
+        cached = self.memory.get(cache_key)
+        in_memory = cached is not None and (
+            cached["content_hash"] == entry["content_hash"]
+        )
+        return {
+            "content_hash": entry["content_hash"],
+            "content": cached["content"] if in_memory else None,
+            "created_at": entry["created_at"],
+            "expires_at": entry["expires_at"],
+            "build_seconds": entry["build_seconds"],
+            "fingerprint": entry["fingerprint"],
+        }
+
+    def _refresh_early(self, found: dict, fingerprint: Optional[str] = None) -> bool:
+        """
+        Draw whether a valid entry should be rebuilt ahead of its upstream TTL: the
+        probability grows as the TTL gets closer, and with the generation time.
+
+        Args:
+            found (dict): Entry returned by _lookup
+            fingerprint (str, optional): Fingerprint of the current timetable
+
+        Returns:
+            bool: True to rebuild the entry now
+        """
+        if not self.early_refresh_beta or not found.get("build_seconds"):
+            return False
+        if fingerprint is not None and found.get("fingerprint") == fingerprint:
+            # Restamped at no cost once its TTL runs out
+            return False
+        stale_at = found["created_at"] + self.upstream_ttl_hours * 3600
+        if found["expires_at"] is not None and found["expires_at"] <= stale_at:
+            # Expires with its period: a rebuild would not last longer
+            return False
+        gap = -math.log(1.0 - random.random())
+        gap *= found["build_seconds"] * self.early_refresh_beta
+        return time.time() + gap >= stale_at
+
+    def _publish_entry(
+        self, cache_key: str, file_type: str, found: dict, destination_path: str
+    ) -> bool:
+        """
+        Count a hit on an entry and publish it at the destination path.
+
+        Args:
+            cache_key (str): Cache key
+            file_type (str): Type of ICS file
+            found (dict): content_hash and content (or None) of the entry
+            destination_path (str): Destination path
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self._count_hit(cache_key)
+        try:
+            method = self._publish(
+                found["content_hash"], destination_path, found["content"]
+            )
+            self._record_published(
+                destination_path, cache_key, file_type, found["content_hash"]
+            )
+            with self._hits_lock:
+                self.publish_counts[method] += 1
 
-            print(f"📋 Copied cached {file_type} to: {destination_path}")
+            print(f"📋 Published cached {file_type} to: {destination_path} ({method})")
             return True
 
         except Exception as e:
             print(f"❌ Error copying cached file: {e}")
             return False
 
-    def clear_cache(self, max_age_hours: Optional[int] = None):
+    def _reference(self, masjid_id: str, fingerprint: Optional[str]):
         """
-        Clear old cache files.
+        Record once per process that a mosque is served the entries of a timetable,
+        so that invalidating the mosque also removes the entries it shares.
 
         Args:
-            max_age_hours (int, optional): Maximum age in hours. If None, clears all cache.
+            masjid_id (str): Mosque identifier
+            fingerprint (str, optional): Fingerprint of its timetable
         """
-        try:
-            for cache_file in self.cache_dir.glob("*_metadata.json"):
-                try:
-                    with open(cache_file, encoding="utf-8") as f:
-                        metadata = json.load(f)
+        if fingerprint is None or (masjid_id, fingerprint) in self._references:
+            return
+        self.catalog.add_reference(masjid_id, fingerprint)
+        self._references.add((masjid_id, fingerprint))
 
-                    cache_time = datetime.fromisoformat(metadata.get("created_at", ""))
-                    age = datetime.now() - cache_time
+    def invalidate(
+        self,
+        masjid_id: str,
+        file_type: Optional[str] = None,
+        scope: Optional[str] = None,
+    ) -> int:
+        """
+        Remove the cache entries of a mosque, including the entries it shares with the
+        mosques publishing the same timetable, in time proportional to their number.
+        Other worker processes drop their memory tier within HIT_FLUSH_INTERVAL.
 
-                    if max_age_hours is None or age > timedelta(hours=max_age_hours):
-                        # Remove metadata file
-                        cache_file.unlink()
+        Args:
+            masjid_id (str): Mosque identifier
+            file_type (str, optional): Only entries of this file type
+            scope (str, optional): Only entries of this scope
 
-                        # Remove corresponding ICS file
-                        cache_key = cache_file.stem.replace("_metadata", "")
-                        for ics_file in self.cache_dir.glob(f"{cache_key}_*.ics"):
-                            ics_file.unlink()
+        Returns:
+            int: Number of removed entries
+        """
+        removed = self.catalog.pop_matching(masjid_id, file_type, scope)
+        self._drop_invalidated(removed)
+        if removed:
+            print(f"🗑️ Invalidated {len(removed)} cache entries of {masjid_id}")
+        return len(removed)
 
-                        print(f"🗑️ Cleared cache: {cache_key}")
+    def invalidate_outdated(self, masjid_id: str, fingerprint: str) -> int:
+        """
+        Record the current timetable of a mosque and remove the entries built from
+        its previous ones. Shared entries are only removed once no mosque is served
+        their timetable any more.
 
-                except Exception as e:
-                    print(f"⚠️ Error processing cache file {cache_file}: {e}")
+        Args:
+            masjid_id (str): Mosque identifier
+            fingerprint (str): Fingerprint of its current timetable
+
+        Returns:
+            int: Number of removed entries
+        """
+        removed = self.catalog.pop_other_timetables(masjid_id, fingerprint)
+        self._references = {
+            reference for reference in self._references if reference[0] != masjid_id
+        }
+        self._references.add((masjid_id, fingerprint))
+        self._drop_invalidated(removed)
+        if removed:
+            print(
+                f"📅 Timetable of {masjid_id} changed, "
+                f"{len(removed)} cache entries invalidated"
+            )
+        return len(removed)
+
+    def _drop_invalidated(self, removed: list):
+        """
+        Remove the memory copies, stored contents and lock files of invalidated
+        entries, count them and notify the other worker processes.
+
+        Args:
+            removed (list): (cache_key, content_hash) of the removed entries
+        """
+        for cache_key, _ in removed:
+            self.memory.pop(cache_key)
+        self._remove_objects(content_hash for _, content_hash in removed)
+        self._remove_locks(cache_key for cache_key, _ in removed)
+        if removed:
+            self.catalog.add_counters({"invalidations": 1, "invalidated": len(removed)})
+            # Already applied to the memory tier of this process
+            self._invalidations_seen += 1
+
+    def _sync_memory(self):
+        """
+        Drop the memory tier of this process once another process invalidated
+        entries, checked at most every HIT_FLUSH_INTERVAL.
+        """
+        now = time.monotonic()
+        if now - self._memory_synced_at < HIT_FLUSH_INTERVAL:
+            return
+        self._memory_synced_at = now
+        invalidations = self.catalog.counters().get("invalidations", 0)
+        if invalidations != self._invalidations_seen:
+            self._invalidations_seen = invalidations
+            self.memory.clear()
+
+    def clear_cache(self, max_age_hours: Optional[int] = None):
+        """
+        Clear old cache files.
+
+        Args:
+            max_age_hours (int, optional): Maximum age in hours. If None, clears all cache.
+        """
+        try:
+            created_before = (
+                None if max_age_hours is None else time.time() - max_age_hours * 3600
+            )
+            self.flush_hits()
+            removed = self.catalog.pop_created_before(created_before)
+            for cache_key, _ in removed:
+                self.memory.pop(cache_key)
+            self._remove_objects(content_hash for _, content_hash in removed)
+            self._remove_locks(cache_key for cache_key, _ in removed)
+            print(f"🗑️ Cleared {len(removed)} cache entries")
 
         except Exception as e:
             print(f"❌ Error clearing cache: {e}")
@@ -441,16 +1555,49 @@ class ICSCacheManager:
             Dict[str, Any]: Cache statistics
         """
         try:
-            ics_files = list(self.cache_dir.glob("*.ics"))
-            metadata_files = list(self.cache_dir.glob("*_metadata.json"))
-
-            total_size = sum(f.stat().st_size for f in ics_files)
-
+            self.flush_hits()
+            stats = self.catalog.stats()
+            counters = self.catalog.counters()
             return {
-                "total_files": len(ics_files),
-                "total_metadata": len(metadata_files),
-                "total_size_bytes": total_size,
-                "total_size_mb": total_size / (1024 * 1024),
+                "total_files": stats["entries"],
+                "total_metadata": stats["entries"],
+                "total_size_bytes": stats["size_bytes"],
+                "total_size_mb": stats["size_bytes"] / (1024 * 1024),
+                "total_objects": stats["objects"],
+                "deduplicated_bytes": stats["logical_bytes"] - stats["size_bytes"],
+                "total_hits": stats["hits"],
+                "by_file_type": stats["by_file_type"],
+                "memory": self.memory.stats(),
+                "quota": {
+                    "max_bytes": self.max_bytes,
+                    "usage": (
+                        round(stats["size_bytes"] / self.max_bytes, 4)
+                        if self.max_bytes
+                        else None
+                    ),
+                    "eviction_policy": self.eviction_policy,
+                    "janitor_interval": self.janitor_interval,
+                    "janitor_runs": int(counters.get("janitor_runs", 0)),
+                    "expired": int(counters.get("expired", 0)),
+                    "outdated": int(counters.get("outdated", 0)),
+                    "invalidated": int(counters.get("invalidated", 0)),
+                    "evicted": int(counters.get("evicted", 0)),
+                    "evicted_bytes": int(counters.get("evicted_bytes", 0)),
+                },
+                "generation": {
+                    "versions": dict(self.generator_versions),
+                    "in_flight": self._generation_flight.in_flight(),
+                    "coalesced": self._generation_flight.coalesced,
+                    "lock_timeouts": self._generation_flight.lock_timeouts,
+                    "early_refresh_beta": self.early_refresh_beta,
+                    "early_refreshes": int(counters.get("early_refreshes", 0)),
+                    "restamped": int(counters.get("restamped", 0)),
+                },
+                "encodings": list(self.encodings),
+                "publish": {
+                    "methods": list(self.publish_methods),
+                    "counts": dict(self.publish_counts),
+                },
                 "cache_dir": str(self.cache_dir),
             }
 
@@ -0,0 +1,119 @@
+"""
+Compression module.
+This module compresses the precompressed variants of the ICS files and picks the
+variant to serve from the Accept-Encoding header. gzip is always available; brotli
+and zstd are used when the optional brotli and zstandard packages are installed.
+"""
+
+import gzip
+from pathlib import Path
+from typing import Optional, Union
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Content-Encoding → extension of the variant file, smallest output first
+EXTENSIONS = {"zstd": "zst", "br": "br", "gzip": "gz"}
+
+# Variants are compressed on the cache miss path, while the request waits: moderate
+# levels keep that to milliseconds, the highest ones (brotli 11, zstd 19) are many
+# times slower for files only a few percent smaller
+COMPRESSION_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+
+def available_encodings(encodings=tuple(EXTENSIONS)) -> tuple:
+    """
+    Filter encodings down to those whose codec is installed.
+
+    Args:
+        encodings (Iterable[str]): Content-Encoding names
+
+    Returns:
+        tuple: Supported encodings, smallest output first
+
+    Raises:
+        ValueError: If an encoding is unknown
+    """
+    unknown = set(encodings) - set(EXTENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown encodings: {sorted(unknown)}")
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return tuple(e for e in EXTENSIONS if e in encodings and installed[e])
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress data at the COMPRESSION_LEVELS level of a codec (done once per cached
+    file).
+
+    Args:
+        data (bytes): Raw content
+        encoding (str): Content-Encoding name
+
+    Returns:
+        bytes: Compressed content
+    """
+    if encoding == "gzip":
+        # mtime=0: identical contents give identical variants
+        return gzip.compress(data, compresslevel=COMPRESSION_LEVELS["gzip"], mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_LEVELS["br"])
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=COMPRESSION_LEVELS["zstd"]).compress(data)
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
+def variant_path(path: Union[str, Path], encoding: str) -> Path:
+    """
+    Get the path of the variant of a file for an encoding.
+
+    Args:
+        path (str | Path): Raw file
+        encoding (str): Content-Encoding name
+
+    Returns:
+        Path: Path of the variant (e.g. file.ics.gz)
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}.{EXTENSIONS[encoding]}")
+
+
+def negotiate(accept_encodings, path: Union[str, Path]) -> Optional[str]:
+    """
+    Pick the encoding to serve a file with.
+
+    Args:
+        accept_encodings (werkzeug Accept): Parsed Accept-Encoding header
+        path (str | Path): Raw file
+
+    Returns:
+        Optional[str]: Preferred encoding accepted by the client among the variants
+        present next to the file, None to serve the raw file
+    """
+    present = [e for e in EXTENSIONS if variant_path(path, e).is_file()]
+    return select_encoding(accept_encodings, present)
+
+
+def select_encoding(accept_encodings, present) -> Optional[str]:
+    """
+    Pick the encoding to serve a content with among its available variants.
+
+    Args:
+        accept_encodings (werkzeug Accept): Parsed Accept-Encoding header
+        present (Iterable[str]): Encodings of the available variants
+
+    Returns:
+        Optional[str]: Preferred encoding accepted by the client, None to serve the
+        raw content
+    """
+    present = [e for e in EXTENSIONS if e in present]
+    if not present:
+        return None
+    return accept_encodings.best_match(present)
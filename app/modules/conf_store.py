@@ -0,0 +1,175 @@
+"""
+Persistent confData store module.
+This module keeps fetched confData in a SQLite database shared by every worker process,
+together with the upstream validators (ETag / Last-Modified) used for conditional GETs.
+The database runs in WAL mode so that readers never wait for a writer.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conf_data (
+    masjid_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+)
+"""
+
+
+class ConfStore:
+    """
+    SQLite store of confData keyed by masjid_id.
+    Connections are opened per thread and per process, so an instance can be shared by
+    request threads and survives a fork.
+    """
+
+    def __init__(self, path: Union[str, Path], busy_timeout: float = 5.0):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            path (str | Path): SQLite database file
+            busy_timeout (float): Seconds to wait for a lock held by another process
+        """
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, masjid_id: str) -> Optional[dict]:
+        """
+        Read a stored entry.
+
+        Args:
+            masjid_id (str): Mosque identifier
+
+        Returns:
+            Optional[dict]: conf_data, size, fetched_at, etag and last_modified,
+            or None if the mosque is not stored
+        """
+        row = (
+            self._connect()
+            .execute(
+                "SELECT payload, size, fetched_at, etag, last_modified"
+                " FROM conf_data WHERE masjid_id = ?",
+                (masjid_id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        try:
+            conf_data = json.loads(row["payload"])
+        except json.JSONDecodeError:
+            return None
+        return {
+            "conf_data": conf_data,
+            "size": row["size"],
+            "fetched_at": row["fetched_at"],
+            "etag": row["etag"],
+            "last_modified": row["last_modified"],
+        }
+
+    def put(
+        self,
+        masjid_id: str,
+        conf_data: dict,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+    ):
+        """
+        Store freshly downloaded confData.
+
+        Args:
+            masjid_id (str): Mosque identifier
+            conf_data (dict): confData object
+            etag (str, optional): ETag header of the upstream response
+            last_modified (str, optional): Last-Modified header of the upstream response
+            fetched_at (float, optional): Fetch time (epoch seconds), defaults to now
+        """
+        payload = json.dumps(conf_data, ensure_ascii=False, separators=(",", ":"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO conf_data"
+                " (masjid_id, payload, size, fetched_at, etag, last_modified)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    masjid_id,
+                    payload,
+                    len(payload),
+                    time.time() if fetched_at is None else fetched_at,
+                    etag,
+                    last_modified,
+                ),
+            )
+
+    def touch(
+        self,
+        masjid_id: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """
+        Mark an entry as revalidated (304 Not Modified) without rewriting its payload.
+        Validators sent with the 304 replace the stored ones.
+
+        Args:
+            masjid_id (str): Mosque identifier
+            etag (str, optional): ETag header of the 304 response
+            last_modified (str, optional): Last-Modified header of the 304 response
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE conf_data SET fetched_at = ?,"
+                " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)"
+                " WHERE masjid_id = ?",
+                (time.time(), etag, last_modified, masjid_id),
+            )
+
+    def delete(self, masjid_id: str):
+        """Remove a mosque from the store."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM conf_data WHERE masjid_id = ?", (masjid_id,))
+
+    def clear(self):
+        """Remove every entry."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM conf_data")
+
+    def stats(self) -> dict:
+        """
+        Get statistics of the store.
+
+        Returns:
+            dict: Database path, entry count and total payload size
+        """
+        row = (
+            self._connect()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conf_data")
+            .fetchone()
+        )
+        return {"path": str(self.path), "entries": row[0], "size_bytes": row[1]}
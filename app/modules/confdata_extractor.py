@@ -0,0 +1,194 @@
+"""
+confData extractor module.
+This module finds the `var confData = {...}` object in a Mawaqit mosque page by scanning the
+raw response bytes, without building an HTML tree. Scanning stops as soon as the JSON object
+is closed so the rest of the page does not need to be downloaded.
+Only the fields read by the application are kept from the parsed object.
+"""
+
+import re
+import sys
+from collections.abc import Iterable
+from typing import Optional
+
+# Start of the confData assignment, up to and including the opening brace
+CONF_DATA_MARKER = re.compile(rb"var\s+confData\s*=\s*\{")
+
+# Characters that change the scanner state outside / inside a JSON string
+_STRUCTURAL = re.compile(rb'[{}"]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+# confData fields read by the application, everything else is dropped before caching
+CONF_DATA_FIELDS = (
+    "times",
+    "shuruq",
+    "calendar",
+    "timezone",
+    "name",
+    "address",
+    "lat",
+    "lng",
+    "slug",
+)
+
+# Bytes kept from the end of a chunk so that a marker split across chunks is still found
+_MARKER_OVERLAP = 64
+
+
+class ConfDataScanner:
+    """
+    Incremental scanner that locates the confData object in a byte stream.
+    Feed chunks with feed() until it returns True, then read json_text.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.start: Optional[int] = None  # index of the opening brace
+        self.end: Optional[int] = None  # index just after the closing brace
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the confData object has been fully read."""
+        return self.end is not None
+
+    @property
+    def json_text(self) -> Optional[str]:
+        """The confData JSON text, or None if the object has not been closed."""
+        if self.end is None:
+            return None
+        return self.buffer[self.start : self.end].decode("utf-8", errors="replace")
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Feed the next chunk of the response body.
+
+        Args:
+            chunk (bytes): Raw bytes of the response
+
+        Returns:
+            bool: True once the confData object is complete
+        """
+        if self.done:
+            return True
+        self.buffer += chunk
+
+        if self.start is None:
+            search_from = max(0, self._pos - _MARKER_OVERLAP)
+            match = CONF_DATA_MARKER.search(self.buffer, search_from)
+            if not match:
+                self._pos = len(self.buffer)
+                return False
+            self.start = match.end() - 1
+            self._pos = self.start
+
+        return self._scan()
+
+    def _scan(self) -> bool:
+        """Advance the brace/string state machine over the buffered bytes."""
+        buffer = self.buffer
+        pos = self._pos
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if not match:
+                    self._pos = len(buffer)
+                    return False
+                if match.group() == b"\\":
+                    # Escape sequence: wait for the escaped byte if it is not here yet
+                    if match.end() >= len(buffer):
+                        self._pos = match.start()
+                        return False
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURAL.search(buffer, pos)
+            if not match:
+                self._pos = len(buffer)
+                return False
+            token = match.group()
+            pos = match.end()
+            if token == b'"':
+                self._in_string = True
+            elif token == b"{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = pos
+                    self._pos = pos
+                    return True
+
+
+def scan_conf_data(chunks: Iterable[bytes]) -> tuple[Optional[str], bytes]:
+    """
+    Read chunks until the confData object is closed.
+
+    Args:
+        chunks (Iterable[bytes]): Response body chunks
+
+    Returns:
+        tuple: (confData JSON text or None if not found, bytes read so far)
+    """
+    scanner = ConfDataScanner()
+    for chunk in chunks:
+        if chunk and scanner.feed(chunk):
+            break
+    return scanner.json_text, bytes(scanner.buffer)
+
+
+def extract_conf_data_text(html: str) -> Optional[str]:
+    """
+    Extract the confData JSON text from a complete page.
+
+    Args:
+        html (str): Page content
+
+    Returns:
+        Optional[str]: confData JSON text, or None if not found
+    """
+    json_text, _ = scan_conf_data([html.encode("utf-8")])
+    return json_text
+
+
+def compact_conf_data(conf_data: dict) -> dict:
+    """
+    Keep only CONF_DATA_FIELDS of a confData object.
+    Time strings are interned: the same "HH:MM" values repeat across days and mosques,
+    so every cached calendar shares a single copy of each of them.
+    Compacting an already compact object returns an equal object.
+
+    Args:
+        conf_data (dict): confData object
+
+    Returns:
+        dict: confData object with the used fields only
+    """
+    compact = {key: conf_data[key] for key in CONF_DATA_FIELDS if key in conf_data}
+    if isinstance(compact.get("times"), list):
+        compact["times"] = [_intern(t) for t in compact["times"]]
+    if "shuruq" in compact:
+        compact["shuruq"] = _intern(compact["shuruq"])
+    if isinstance(compact.get("calendar"), list):
+        compact["calendar"] = [
+            {
+                _intern(day): [_intern(t) for t in times]
+                if isinstance(times, list)
+                else times
+                for day, times in month.items()
+            }
+            if isinstance(month, dict)
+            else month
+            for month in compact["calendar"]
+        ]
+    return compact
+
+
+def _intern(value):
+    """Intern strings, return other values unchanged."""
+    return sys.intern(value) if isinstance(value, str) else value
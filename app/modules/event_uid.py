@@ -0,0 +1,27 @@
+"""
+Event UID module.
+This module derives the UID of an ICS event from what identifies the event (its kind,
+date and position), instead of drawing a random one. A regenerated file keeps the UIDs
+of its events, and files of different cache keys with the same events have identical
+bodies, which the content-addressed cache stores once.
+"""
+
+from uuid import NAMESPACE_URL, uuid5
+
+# Namespace of the UIDs of the events generated by this application
+UID_NAMESPACE = uuid5(NAMESPACE_URL, "https://github.com/IAM-B/Mawaqit_API_to_ics")
+
+
+def event_uid(kind: str, *parts) -> str:
+    """
+    Get the deterministic UID of an event.
+
+    Args:
+        kind (str): Kind of event (e.g. "prayer", "slot")
+        *parts: Values identifying the event among those of its kind (date, prayer
+            name, index...), converted with str()
+
+    Returns:
+        str: UUID (version 5) of the kind and parts
+    """
+    return str(uuid5(UID_NAMESPACE, "|".join([kind, *map(str, parts)])))
@@ -0,0 +1,147 @@
+"""
+Advisory file lock module.
+This module provides an inter-process lock based on flock(2) so that several worker
+processes can coordinate through a shared directory, and the removal of lock files that
+are no longer needed.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+# Delay between two attempts of a lock acquisition with a timeout
+POLL_INTERVAL = 0.05
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file, usable as a context manager.
+    On platforms without fcntl the lock is a no-op and only thread-level
+    coordination applies.
+    """
+
+    def __init__(self, path: Union[str, Path], shared: bool = False):
+        """
+        Initialize the lock.
+
+        Args:
+            path (str | Path): Path of the lock file (created if missing)
+            shared (bool): Take a shared (read) lock instead of an exclusive one
+        """
+        self.path = Path(path)
+        self.shared = shared
+        self._fd: Optional[int] = None
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take the lock, waiting at most `timeout` seconds.
+        A lock file unlinked by remove_lock_file while this process was waiting is
+        opened again, so that both never hold locks on different files.
+
+        Args:
+            timeout (float, optional): Maximum wait in seconds, 0 for a single
+                attempt; None blocks until the lock is held
+
+        Returns:
+            bool: Whether the lock is held
+        """
+        if fcntl is None:
+            return True
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if not self._flock(fd, operation, deadline):
+                    os.close(fd)
+                    return False
+                if _same_file(fd, self.path):
+                    self._fd = fd
+                    return True
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    @staticmethod
+    def _flock(fd: int, operation: int, deadline: Optional[float]) -> bool:
+        """
+        Lock an open file, blocking without deadline, polling until it otherwise.
+
+        Args:
+            fd (int): Open lock file
+            operation (int): LOCK_SH or LOCK_EX
+            deadline (float, optional): time.monotonic() value to give up at
+
+        Returns:
+            bool: Whether the lock is held
+        """
+        if deadline is None:
+            fcntl.flock(fd, operation)
+            return True
+        while True:
+            try:
+                fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(POLL_INTERVAL, remaining))
+
+    def release(self):
+        """Release the lock if it is held."""
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def _same_file(fd: int, path: Path) -> bool:
+    """Whether an open file is still the one found at path."""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(fd)
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+
+def remove_lock_file(path: Union[str, Path]) -> bool:
+    """
+    Remove a lock file nobody holds. The exclusive lock is taken without waiting
+    first: a lock file in use is left in place.
+
+    Args:
+        path (str | Path): Path of the lock file
+
+    Returns:
+        bool: Whether the file was removed (or already missing)
+    """
+    lock = FileLock(path)
+    if not lock.path.exists():
+        return True
+    if not lock.acquire(timeout=0):
+        return False
+    try:
+        lock.path.unlink(missing_ok=True)
+    finally:
+        lock.release()
+    return True
@@ -0,0 +1,101 @@
+"""
+Shared HTTP client module for upstream calls to mawaqit.net.
+This module keeps a single pooled, keep-alive requests session per process so that
+repeated fetches reuse TCP/TLS connections instead of paying a new handshake each time.
+"""
+
+import os
+import threading
+from typing import Optional
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+# Default pool settings, overridable through the MAWAQIT_* configuration keys
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_POOL_BLOCK = False
+DEFAULT_KEEPALIVE = True
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def get_pool_settings() -> dict:
+    """
+    Read the connection pool settings from the application configuration.
+    Falls back to module defaults when called outside an application context.
+
+    Returns:
+        dict: Pool settings (pool_connections, pool_maxsize, pool_block, keepalive)
+    """
+    config = current_app.config if has_app_context() else {}
+    return {
+        "pool_connections": int(
+            config.get("MAWAQIT_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS)
+        ),
+        "pool_maxsize": int(config.get("MAWAQIT_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)),
+        "pool_block": bool(config.get("MAWAQIT_POOL_BLOCK", DEFAULT_POOL_BLOCK)),
+        "keepalive": bool(config.get("MAWAQIT_KEEPALIVE", DEFAULT_KEEPALIVE)),
+    }
+
+
+def _build_session(settings: dict) -> requests.Session:
+    """
+    Build a requests session with a tuned connection pool.
+
+    Args:
+        settings (dict): Pool settings as returned by get_pool_settings()
+
+    Returns:
+        requests.Session: Configured session
+    """
+    session = requests.Session()
+    # Retries are handled by the callers, never by urllib3
+    adapter = HTTPAdapter(
+        pool_connections=settings["pool_connections"],
+        pool_maxsize=settings["pool_maxsize"],
+        pool_block=settings["pool_block"],
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive" if settings["keepalive"] else "close"
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the process-wide pooled session used for all mawaqit.net traffic.
+    The session is rebuilt after a fork so that worker processes never share sockets.
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session(get_pool_settings())
+            _session_pid = pid
+        return _session
+
+
+def reset_http_session():
+    """
+    Close and drop the shared session.
+    The next call to get_http_session() builds a new one with the current settings.
+    """
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
@@ -3,17 +3,58 @@ Mawaqit data fetcher module for retrieving prayer times from the Mawaqit website
 This module handles web scraping and data extraction from the Mawaqit platform.
 """
 
+import contextlib
 import json
+import os
 import re
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
 
 import requests
 from bs4 import BeautifulSoup
 from flask import current_app
 
-# Cache to store retrieved data
-_data_cache = {}
+from .cache_manager import cache_manager, local_now
+from .conf_store import ConfStore
+from .confdata_extractor import CONF_DATA_FIELDS, compact_conf_data, scan_conf_data
+from .http_client import get_http_session
+from .prayer_table import PrayerTable
+from .rate_limiter import RateLimitTimeout, get_rate_limiter
+from .retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+from .single_flight import SingleFlight
+from .ttl_cache import TTLCache
+
+# Bounded LRU cache of retrieved confData, sized from the MAWAQIT_CACHE_* settings
+_data_cache = TTLCache(max_entries=1000, max_bytes=64 * 1024 * 1024, ttl=6 * 3600)
+
+# PrayerTable of each cached confData, built once per fetched object
+_prayer_tables = TTLCache(max_entries=1000, max_bytes=16 * 1024 * 1024, ttl=6 * 3600)
+
+# PrayerTables by fingerprint: mosques publishing the same timetable share one table
+_shared_tables = TTLCache(max_entries=1000, max_bytes=16 * 1024 * 1024, ttl=6 * 3600)
+
+# Streaming read settings for mosque pages
+RESPONSE_CHUNK_SIZE = 16 * 1024
+DRAIN_LIMIT_BYTES = 64 * 1024
+
+# One in-flight upstream fetch per masjid_id (threads, and processes via MAWAQIT_LOCK_DIR)
+_fetch_flight = SingleFlight()
+
+# Fail fast while mawaqit.net keeps failing (MAWAQIT_BREAKER_*)
+_breaker = CircuitBreaker()
+
+# confData shared by every worker process (MAWAQIT_STORE_PATH), None when disabled
+_conf_store: Optional[ConfStore] = None
+
+# Background refreshes of stale confData, one per masjid_id
+_refresh_lock = threading.Lock()
+_refreshing: dict[str, Future] = {}
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_pid: Optional[int] = None
+REFRESH_WORKERS = 4
 
 
 def clear_mawaqit_cache():
@@ -22,6 +63,71 @@ def clear_mawaqit_cache():
     À utiliser dans les tests pour garantir un comportement sans cache.
     """
     _data_cache.clear()
+    _prayer_tables.clear()
+    _shared_tables.clear()
+    _breaker.reset()
+    if _conf_store is not None:
+        _conf_store.clear()
+
+
+def get_mawaqit_cache_stats() -> dict:
+    """
+    Get statistics of the confData cache.
+
+    Returns:
+        dict: Entry count, size and hit/miss/eviction counters, the circuit breaker
+        state, the upstream rate limiter wait times, and the persistent store
+        statistics when enabled
+    """
+    stats = _data_cache.stats()
+    stats["circuit_breaker"] = _breaker.stats()
+    stats["rate_limiter"] = get_rate_limiter().stats()
+    if _conf_store is not None:
+        stats["store"] = _conf_store.stats()
+    return stats
+
+
+def configure_fetcher():
+    """
+    Apply the MAWAQIT_CACHE_*, MAWAQIT_LOCK_*, MAWAQIT_STORE_PATH,
+    MAWAQIT_BREAKER_* and MAWAQIT_RATE_* settings of the current app.
+    """
+    global _conf_store
+    config = current_app.config
+    _data_cache.configure(
+        max_entries=config.get("MAWAQIT_CACHE_MAX_ENTRIES", _data_cache.max_entries),
+        max_bytes=config.get("MAWAQIT_CACHE_MAX_BYTES", _data_cache.max_bytes),
+        ttl=config.get("MAWAQIT_CACHE_TTL", _data_cache.ttl),
+    )
+    _prayer_tables.configure(
+        max_entries=_data_cache.max_entries,
+        max_bytes=_prayer_tables.max_bytes,
+        ttl=_data_cache.ttl,
+    )
+    _shared_tables.configure(
+        max_entries=_data_cache.max_entries,
+        max_bytes=_shared_tables.max_bytes,
+        ttl=_data_cache.ttl,
+    )
+    lock_dir = config.get("MAWAQIT_LOCK_DIR")
+    _fetch_flight.lock_dir = Path(lock_dir) if lock_dir else None
+    _fetch_flight.lock_timeout = config.get(
+        "MAWAQIT_LOCK_TIMEOUT", _fetch_flight.lock_timeout
+    )
+
+    _breaker.failure_threshold = config.get(
+        "MAWAQIT_BREAKER_THRESHOLD", _breaker.failure_threshold
+    )
+    _breaker.cooldown = config.get("MAWAQIT_BREAKER_COOLDOWN", _breaker.cooldown)
+
+    store_path = config.get("MAWAQIT_STORE_PATH")
+    if not store_path:
+        _conf_store = None
+    elif _conf_store is None or _conf_store.path != Path(store_path):
+        _conf_store = ConfStore(store_path)
+
+    # Built here so that worker threads without app context share the same limiter
+    get_rate_limiter()
 
 
 def fetch_mawaqit_data(
@@ -30,11 +136,15 @@ def fetch_mawaqit_data(
     """
     Main function to fetch confData from the Mawaqit website.
     Scrapes the mosque's page and extracts the configuration data containing prayer times.
+    Data past MAWAQIT_CACHE_TTL is served stale while it is refreshed in the background
+    (MAWAQIT_STALE_WHILE_REVALIDATE), or when upstream fails (MAWAQIT_STALE_IF_ERROR),
+    up to MAWAQIT_STALE_MAX_AGE.
 
     Args:
         masjid_id (str): Mosque identifier from Mawaqit
         max_retries (int): Maximum number of retry attempts (default: 1)
-        retry_delay (float): Delay in seconds between retries (default: 2.0)
+        retry_delay (float): Delay in seconds before the first retry, doubled at each
+            retry (default: 2.0)
 
     Returns:
         dict: Configuration data containing prayer times and mosque information
@@ -44,72 +154,570 @@ def fetch_mawaqit_data(
         RuntimeError: If HTTP request fails after all retries
     """
     # Check if data is in cache
-    if masjid_id in _data_cache:
-        return _data_cache[masjid_id]
+    cached = _data_cache.get(masjid_id)
+    if cached is not None:
+        return cached
+
+    configure_fetcher()
+
+    # Another worker may already have stored it
+    cached = get_cached_conf_data(masjid_id)
+    if cached is not None:
+        return cached
+
+    # Past the soft TTL: serve the last known confData up to MAWAQIT_STALE_MAX_AGE
+    config = current_app.config
+    stale = get_stale_conf_data(masjid_id, config.get("MAWAQIT_STALE_MAX_AGE"))
+    if stale is not None and config.get("MAWAQIT_STALE_WHILE_REVALIDATE", False):
+        print(f"♻️ Données périmées servies pour {masjid_id}, rafraîchissement en cours")
+        _serve_stale(masjid_id, stale)
+        schedule_refresh(masjid_id, *_upstream_request(masjid_id))
+        return stale["conf_data"]
+
+    # Coalesce concurrent misses: a single upstream fetch per masjid_id
+    try:
+        return refresh_conf_data(masjid_id, max_retries, retry_delay)
+    except (requests.RequestException, RuntimeError):
+        if stale is None or not config.get("MAWAQIT_STALE_IF_ERROR", False):
+            raise
+        print(f"⚠️ mawaqit.net indisponible, données périmées servies pour {masjid_id}")
+        _serve_stale(masjid_id, stale)
+        return stale["conf_data"]
+
+
+def refresh_conf_data(
+    masjid_id: str,
+    max_retries: int = 2,
+    retry_delay: float = 2.0,
+    force: bool = False,
+) -> dict:
+    """
+    Fetch a mosque's confData from upstream through the fetcher's guards: concurrent
+    misses are coalesced into a single fetch per masjid_id across threads and
+    workers, retried by the RetryPolicy behind the circuit breaker and the shared
+    rate limiter. Must be called inside an application context, after
+    configure_fetcher.
+
+    Args:
+        masjid_id (str): Mosque identifier from Mawaqit
+        max_retries (int): Maximum number of retry attempts
+        retry_delay (float): Delay in seconds before the first retry, then doubled
+        force (bool): Fetch even if another worker stored fresh confData meanwhile
+
+    Returns:
+        dict: Configuration data containing prayer times and mosque information
 
-    base_url = current_app.config["MAWAQIT_BASE_URL"]
-    timeout = current_app.config["MAWAQIT_REQUEST_TIMEOUT"]
-    user_agent = current_app.config["MAWAQIT_USER_AGENT"]
+    Raises:
+        ValueError: If mosque not found or data extraction fails
+        RuntimeError: If HTTP request fails after all retries
+        CircuitOpenError: If upstream is failing and the circuit breaker is open
+    """
+    return _fetch_flight.do(
+        masjid_id,
+        lambda: _fetch_from_upstream(masjid_id, max_retries, retry_delay),
+        recheck=None if force else lambda: get_cached_conf_data(masjid_id),
+    )
 
-    url = f"{base_url}/{masjid_id}"
-    headers = {"User-Agent": user_agent}
 
-    last_exception = None
+def _upstream_request(masjid_id: str) -> tuple[str, dict, float]:
+    """
+    Build the upstream request of a mosque page from the current app settings.
 
-    for attempt in range(max_retries + 1):
-        try:
-            print(f"🔄 Tentative {attempt + 1}/{max_retries + 1} pour {masjid_id}")
+    Args:
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        tuple: (url, headers, timeout)
+    """
+    config = current_app.config
+    url = f"{config['MAWAQIT_BASE_URL']}/{masjid_id}"
+    headers = {"User-Agent": config["MAWAQIT_USER_AGENT"]}
+    return url, headers, config["MAWAQIT_REQUEST_TIMEOUT"]
+
+
+def _serve_stale(masjid_id: str, entry: dict):
+    """
+    Keep serving a stale entry from memory until the next refresh attempt.
 
-            r = requests.get(url, headers=headers, timeout=timeout)
+    Args:
+        masjid_id (str): Mosque identifier
+        entry (dict): Stored entry (see ConfStore.get)
+    """
+    retry_interval = current_app.config.get("MAWAQIT_STALE_RETRY_INTERVAL", 60)
+    _data_cache.set(
+        masjid_id, entry["conf_data"], size=entry["size"], ttl=retry_interval
+    )
 
-            if r.status_code == 404:
-                raise ValueError(f"Mosque not found for masjid_id: {masjid_id}")
-            elif r.status_code != 200:
-                raise RuntimeError(
-                    f"HTTP error {r.status_code} when requesting {masjid_id}"
-                )
 
-            soup = BeautifulSoup(r.text, "html.parser")
-            script = soup.find("script", string=re.compile(r"var\s+confData\s*=\s*{"))
+def get_stale_conf_data(masjid_id: str, max_age: Optional[float]) -> Optional[dict]:
+    """
+    Get the stored entry of a mosque if it is younger than max_age.
 
-            if not script:
-                raise ValueError(f"No <script> tag containing confData for {masjid_id}")
+    Args:
+        masjid_id (str): Mosque identifier
+        max_age (float, optional): Hard limit in seconds. None or 0 disables stale data
 
-            match = re.search(
-                r"var\s+confData\s*=\s*({.*?});\s*", script.string, re.DOTALL
-            )
-            if not match:
-                raise ValueError(f"Unable to extract confData JSON for {masjid_id}")
-
-            try:
-                conf_data = json.loads(match.group(1))
-                # Cache the data
-                _data_cache[masjid_id] = conf_data
-                print(f"✅ Données récupérées avec succès pour {masjid_id}")
-                return conf_data
-            except json.JSONDecodeError as e:
-                raise ValueError(f"JSON error in confData: {e}") from e
+    Returns:
+        Optional[dict]: Stored entry (see ConfStore.get), or None
+    """
+    if not max_age or _conf_store is None:
+        return None
+    entry = _get_store_entry(masjid_id)
+    if entry is None or time.time() - entry["fetched_at"] > max_age:
+        return None
+    return entry
+
+
+def schedule_refresh(
+    masjid_id: str, url: str, headers: dict, timeout: float
+) -> Optional[Future]:
+    """
+    Refresh a mosque's confData in the background.
+    At most one refresh per masjid_id is queued; it shares the single-flight of
+    foreground fetches, so it never duplicates an upstream request.
 
+    Args:
+        masjid_id (str): Mosque identifier
+        url (str): Mosque page URL
+        headers (dict): Request headers
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        Optional[Future]: The refresh future (None if one was already queued)
+    """
+    global _refresh_executor, _refresh_executor_pid
+
+    def refresh():
+        try:
+            _fetch_flight.do(
+                masjid_id,
+                lambda: RetryPolicy(max_retries=0).call(
+                    lambda _remaining: revalidate_conf_data(
+                        url, masjid_id, headers, timeout
+                    ),
+                    retry_on=(requests.RequestException, RuntimeError),
+                    breaker=_breaker,
+                    no_retry=(RateLimitTimeout,),
+                ),
+                # The memory cache holds the stale copy: only the store tells
+                # whether another worker refreshed it
+                recheck=lambda: _load_fresh_from_store(masjid_id),
+            )
+            print(f"✅ confData rafraîchi en arrière-plan pour {masjid_id}")
         except (requests.RequestException, RuntimeError, ValueError) as e:
-            last_exception = e
-            if attempt < max_retries:
-                print(f"⚠️ Tentative {attempt + 1} échouée pour {masjid_id}: {e}")
-                print(
-                    f"⏳ Attente de {retry_delay} secondes avant la prochaine tentative..."
-                )
-                time.sleep(retry_delay)
-            else:
-                print(f"❌ Toutes les tentatives ont échoué pour {masjid_id}")
-                break
-
-    # If we reach here, all attempts have failed
-    if last_exception:
-        raise last_exception
+            print(f"⚠️ Rafraîchissement échoué pour {masjid_id}: {e}")
+        finally:
+            with _refresh_lock:
+                _refreshing.pop(masjid_id, None)
+
+    with _refresh_lock:
+        if masjid_id in _refreshing:
+            return None
+        # Executor threads do not survive a fork: start a new pool in each worker
+        if _refresh_executor is None or _refresh_executor_pid != os.getpid():
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=REFRESH_WORKERS, thread_name_prefix="mawaqit-refresh"
+            )
+            _refresh_executor_pid = os.getpid()
+        future = _refresh_executor.submit(refresh)
+        _refreshing[masjid_id] = future
+        return future
+
+
+def _fetch_from_upstream(masjid_id: str, max_retries: int, retry_delay: float) -> dict:
+    """
+    Scrape the mosque's page on mawaqit.net and extract its confData.
+    Network and HTTP errors are retried with jittered exponential backoff within
+    MAWAQIT_RETRY_DEADLINE; a missing mosque or an unreadable page is not retried,
+    nor a request refused by the local rate limiter.
+
+    Args:
+        masjid_id (str): Mosque identifier from Mawaqit
+        max_retries (int): Maximum number of retry attempts
+        retry_delay (float): Delay in seconds before the first retry, then doubled
+
+    Returns:
+        dict: Configuration data containing prayer times and mosque information
+
+    Raises:
+        ValueError: If mosque not found or data extraction fails
+        RuntimeError: If HTTP request fails after all retries
+        CircuitOpenError: If upstream is failing and the circuit breaker is open
+    """
+    url, headers, timeout = _upstream_request(masjid_id)
+    config = current_app.config
+    policy = RetryPolicy(
+        max_retries=max_retries,
+        base_delay=retry_delay,
+        max_delay=config.get("MAWAQIT_RETRY_MAX_DELAY", 8.0),
+        jitter=config.get("MAWAQIT_RETRY_JITTER", 0.5),
+        deadline=config.get("MAWAQIT_RETRY_DEADLINE"),
+    )
+
+    def attempt(remaining: Optional[float]) -> dict:
+        attempt_timeout = timeout if remaining is None else min(timeout, remaining)
+        return revalidate_conf_data(url, masjid_id, headers, attempt_timeout)
+
+    def on_retry(attempt_index: int, error: Exception, delay: float):
+        print(f"⚠️ Tentative {attempt_index + 1} échouée pour {masjid_id}: {error}")
+        print(f"⏳ Attente de {delay:.1f} secondes avant la prochaine tentative...")
+
+    try:
+        conf_data = policy.call(
+            attempt,
+            retry_on=(requests.RequestException, RuntimeError),
+            breaker=_breaker,
+            on_retry=on_retry,
+            no_retry=(RateLimitTimeout,),
+        )
+    except CircuitOpenError as e:
+        print(f"⛔ {e} ({masjid_id})")
+        raise
+    except (requests.RequestException, RuntimeError, ValueError):
+        print(f"❌ Toutes les tentatives ont échoué pour {masjid_id}")
+        raise
+
+    print(f"✅ Données récupérées avec succès pour {masjid_id}")
+    return conf_data
+
+
+def cache_conf_data(
+    masjid_id: str,
+    conf_data: dict,
+    size: Optional[int] = None,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+):
+    """
+    Store freshly fetched confData in the cache and in the persistent store.
+
+    Args:
+        masjid_id (str): Mosque identifier
+        conf_data (dict): confData object
+        size (int, optional): Size of the confData JSON text in bytes
+        etag (str, optional): ETag header of the upstream response
+        last_modified (str, optional): Last-Modified header of the upstream response
+    """
+    _data_cache.set(masjid_id, conf_data, size=size)
+    if _conf_store is not None:
+        _conf_store.put(masjid_id, conf_data, etag=etag, last_modified=last_modified)
+
+
+def get_cached_conf_data(masjid_id: str) -> Optional[dict]:
+    """
+    Get unexpired confData from the memory cache, then from the persistent store.
+    Store entries younger than the cache TTL are promoted to the memory cache.
+
+    Args:
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        Optional[dict]: confData, or None if it has to be fetched
+    """
+    data = _data_cache.get(masjid_id)
+    if data is not None:
+        return data
+    return _load_fresh_from_store(masjid_id)
+
+
+def _load_fresh_from_store(masjid_id: str) -> Optional[dict]:
+    """
+    Promote a store entry younger than the cache TTL to the memory cache.
+
+    Args:
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        Optional[dict]: confData, or None if the store has no fresh entry
+    """
+    if _conf_store is None:
+        return None
+    entry = _get_store_entry(masjid_id)
+    if entry is None:
+        return None
+    if _data_cache.ttl is None:
+        remaining = None
     else:
-        raise RuntimeError(
-            f"Unknown error occurred while fetching data for {masjid_id}"
+        remaining = _data_cache.ttl - (time.time() - entry["fetched_at"])
+        if remaining <= 0:
+            return None
+    _data_cache.set(masjid_id, entry["conf_data"], size=entry["size"], ttl=remaining)
+    return entry["conf_data"]
+
+
+def _get_store_entry(masjid_id: str) -> Optional[dict]:
+    """
+    Read a store entry, compacting confData written with fields that are no longer kept.
+
+    Args:
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        Optional[dict]: Stored entry (see ConfStore.get), or None
+    """
+    if _conf_store is None:
+        return None
+    entry = _conf_store.get(masjid_id)
+    if entry is not None and not set(entry["conf_data"]) <= set(CONF_DATA_FIELDS):
+        entry["conf_data"] = compact_conf_data(entry["conf_data"])
+        entry["size"] = _json_size(entry["conf_data"])
+    return entry
+
+
+def revalidate_conf_data(
+    url: str, masjid_id: str, headers: dict, timeout: float
+) -> dict:
+    """
+    Fetch confData from upstream, as a conditional GET when the store has validators
+    for the mosque. A 304 answer reuses the stored confData and only renews its
+    fetch time. A new timetable invalidates the ICS files built from the previous one
+    (see ICSCacheManager.invalidate_outdated). Does not need an application context,
+    so it can run in worker threads.
+
+    Args:
+        url (str): Mosque page URL
+        masjid_id (str): Mosque identifier
+        headers (dict): Request headers
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        dict: confData object, also cached and stored
+
+    Raises:
+        ValueError: If mosque not found or data extraction fails
+        RuntimeError: If the upstream answers with an HTTP error
+        requests.RequestException: On network errors
+    """
+    entry = _get_store_entry(masjid_id)
+    request_headers = dict(headers)
+    if entry is not None:
+        if entry["etag"]:
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+
+    conf_data, size, validators = download_conf_data(
+        url, masjid_id, request_headers, timeout
+    )
+    if conf_data is None:
+        if entry is None:
+            raise RuntimeError(f"HTTP error 304 when requesting {masjid_id}")
+        print(f"♻️ confData inchangé pour {masjid_id} (304)")
+        _conf_store.touch(masjid_id, **validators)
+        _data_cache.set(masjid_id, entry["conf_data"], size=entry["size"])
+        return entry["conf_data"]
+
+    cache_conf_data(masjid_id, conf_data, size, **validators)
+    # New timetable: the ICS files generated from the previous one are obsolete
+    table = _build_prayer_table(masjid_id, conf_data)
+    cache_manager.invalidate_outdated(masjid_id, table.fingerprint)
+    return conf_data
+
+
+def download_conf_data(
+    url: str, masjid_id: str, headers: dict, timeout: float
+) -> tuple[Optional[dict], int, dict]:
+    """
+    Download a mosque page with the shared session and extract its confData.
+    The request waits for a slot of the shared upstream rate limiter first.
+
+    Args:
+        url (str): Mosque page URL
+        masjid_id (str): Mosque identifier
+        headers (dict): Request headers
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        tuple: (compact confData dict or None on 304 Not Modified, size of its JSON
+        text, validators dict with the etag and last_modified response headers)
+
+    Raises:
+        ValueError: If mosque not found or data extraction fails
+        RuntimeError: If the upstream answers with an HTTP error
+        RateLimitTimeout: If no rate limiter slot is available within the queue timeout
+        requests.RequestException: On network errors
+    """
+    get_rate_limiter().acquire()
+    r = get_http_session().get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        validators = {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+        if r.status_code == 304:
+            return None, 0, validators
+        check_response_status(r, masjid_id)
+        conf_data, size = parse_conf_data_response(r, masjid_id)
+        return conf_data, size, validators
+    finally:
+        r.close()
+
+
+def check_response_status(r, masjid_id: str):
+    """
+    Check the HTTP status of a mosque page response.
+
+    Args:
+        r (requests.Response): Upstream response
+        masjid_id (str): Mosque identifier
+
+    Raises:
+        ValueError: If the mosque does not exist (404)
+        RuntimeError: For any other non-200 status
+    """
+    if r.status_code == 404:
+        raise ValueError(f"Mosque not found for masjid_id: {masjid_id}")
+    elif r.status_code != 200:
+        raise RuntimeError(f"HTTP error {r.status_code} when requesting {masjid_id}")
+
+
+def parse_conf_data_response(r, masjid_id: str) -> tuple[dict, int]:
+    """
+    Extract confData from a streamed mosque page response.
+    The body is scanned chunk by chunk and reading stops once the confData object is
+    closed. Pages where the fast scan fails are parsed with BeautifulSoup as a fallback.
+
+    Args:
+        r (requests.Response): Upstream response opened with stream=True
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        tuple: (confData dict with CONF_DATA_FIELDS only, size of its JSON text)
+
+    Raises:
+        ValueError: If confData cannot be found or is not valid JSON
+    """
+    json_text, body = scan_conf_data(r.iter_content(chunk_size=RESPONSE_CHUNK_SIZE))
+    if json_text is not None:
+        _release_response(r)
+    else:
+        encoding = r.encoding if isinstance(r.encoding, str) else "utf-8"
+        json_text = _extract_conf_data_with_soup(
+            body.decode(encoding, errors="replace"), masjid_id
         )
 
+    try:
+        conf_data = compact_conf_data(json.loads(json_text))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON error in confData: {e}") from e
+    return conf_data, _json_size(conf_data)
+
+
+def _json_size(conf_data: dict) -> int:
+    """Size in bytes of the compact JSON text of a confData object."""
+    return len(json.dumps(conf_data, ensure_ascii=False, separators=(",", ":")))
+
+
+def _extract_conf_data_with_soup(html: str, masjid_id: str) -> str:
+    """
+    Fallback extraction of the confData JSON text through a full HTML parse.
+
+    Args:
+        html (str): Page content
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        str: confData JSON text
+
+    Raises:
+        ValueError: If no script contains confData
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    script = soup.find("script", string=re.compile(r"var\s+confData\s*=\s*{"))
+
+    if not script:
+        raise ValueError(f"No <script> tag containing confData for {masjid_id}")
+
+    match = re.search(r"var\s+confData\s*=\s*({.*?});\s*", script.string, re.DOTALL)
+    if not match:
+        raise ValueError(f"Unable to extract confData JSON for {masjid_id}")
+    return match.group(1)
+
+
+def _release_response(r):
+    """
+    Stop reading a streamed response once confData has been extracted.
+    A short unread remainder is drained so the connection can go back to the pool;
+    otherwise the connection is closed without downloading the rest of the page.
+
+    Args:
+        r (requests.Response): Streamed response
+    """
+    try:
+        remaining = int(r.headers.get("Content-Length", "")) - r.raw.tell()
+    except (TypeError, ValueError, AttributeError):
+        remaining = None
+
+    if remaining is not None and 0 <= remaining <= DRAIN_LIMIT_BYTES:
+        with contextlib.suppress(Exception):
+            r.raw.drain_conn()
+    r.close()
+
+
+def get_prayer_table(masjid_id: str, fetch: bool = True) -> Optional[PrayerTable]:
+    """
+    Get the PrayerTable of a mosque, parsed once from its cached confData.
+    Mosques whose timetables are equal get the same table object.
+
+    Args:
+        masjid_id (str): Mosque identifier
+        fetch (bool): Fetch the confData if it is not cached
+
+    Returns:
+        Optional[PrayerTable]: The table, or None if not cached and fetch is False
+    """
+    data = fetch_mawaqit_data(masjid_id) if fetch else _data_cache.get(masjid_id)
+    if data is None:
+        return None
+
+    # Tables are tied to the confData object they were built from
+    cached = _prayer_tables.get(masjid_id)
+    if cached is not None and cached[0] is data:
+        return cached[1]
+    return _build_prayer_table(masjid_id, data)
+
+
+def _build_prayer_table(masjid_id: str, data: dict) -> PrayerTable:
+    """
+    Parse the PrayerTable of a mosque's confData and cache it, sharing the table
+    object with the mosques whose timetables are equal.
+
+    Args:
+        masjid_id (str): Mosque identifier
+        data (dict): confData object of the mosque
+
+    Returns:
+        PrayerTable: The table
+    """
+    today = local_now(data.get("timezone", "Europe/Paris")).date()
+    table = PrayerTable.from_conf_data(data, today)
+    shared = _shared_tables.get(table.fingerprint)
+    if shared is not None and shared == table:
+        table = shared
+    else:
+        _shared_tables.set(table.fingerprint, table, size=table.nbytes)
+    _prayer_tables.set(masjid_id, (data, table), size=table.nbytes)
+    return table
+
+
+def get_timetable_fingerprint(masjid_id: str) -> Optional[str]:
+    """
+    Get the fingerprint of the timetable of a mosque (see timetable_fingerprint),
+    without fetching its confData: it is read from the memory cache, then from the
+    persistent store. Must be called inside an application context.
+
+    Args:
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        Optional[str]: The fingerprint, or None if no fresh confData is cached
+    """
+    configure_fetcher()
+    if get_cached_conf_data(masjid_id) is None:
+        return None
+    table = get_prayer_table(masjid_id, fetch=False)
+    return None if table is None else table.fingerprint
+
 
 def fetch_mosques_data(masjid_id: str, scope: str):
     """
@@ -131,7 +739,8 @@ def fetch_mosques_data(masjid_id: str, scope: str):
     if scope == "today":
         return get_prayer_times_of_the_day(masjid_id), tz_str
     elif scope == "month":
-        month_number = datetime.now().month
+        # Month of the mosque, which may not be the server's month
+        month_number = local_now(tz_str).month
         return get_month(masjid_id, month_number), tz_str
     elif scope == "year":
         return get_calendar(masjid_id), tz_str
@@ -154,9 +763,8 @@ def get_prayer_times_of_the_day(masjid_id: str) -> dict:
         ValueError: If prayer time data is incomplete
     """
     # Use cached data if available
-    if masjid_id in _data_cache:
-        data = _data_cache[masjid_id]
-    else:
+    data = _data_cache.get(masjid_id)
+    if data is None:
         data = fetch_mawaqit_data(masjid_id)
 
     times = data.get("times", [])
@@ -194,9 +802,8 @@ def get_month(masjid_id: str, month_number: int):
         raise ValueError("Month must be between 1 and 12.")
 
     # Use cached data if available
-    if masjid_id in _data_cache:
-        data = _data_cache[masjid_id]
-    else:
+    data = _data_cache.get(masjid_id)
+    if data is None:
         data = fetch_mawaqit_data(masjid_id)
 
     calendar = data.get("calendar", [])
@@ -219,9 +826,8 @@ def get_calendar(masjid_id: str):
         list: List of monthly prayer times for the year
     """
     # Use cached data if available
-    if masjid_id in _data_cache:
-        data = _data_cache[masjid_id]
-    else:
+    data = _data_cache.get(masjid_id)
+    if data is None:
         data = fetch_mawaqit_data(masjid_id)
 
     calendar = data.get("calendar", [])
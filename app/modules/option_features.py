@@ -5,10 +5,11 @@ This module handles options events, voluntary fasts, Jummah prayers, Hijri dates
 
 from datetime import date, datetime, timedelta
 from typing import Optional
-from uuid import uuid4
 
 from icalendar import Calendar, Event
 
+from .event_uid import event_uid
+
 
 class OptionFeatures:
     """Class to handle options calendar features and events."""
@@ -282,7 +283,15 @@ class OptionFeatures:
             event_data (Dict): Event data dictionary
         """
         event = Event()
-        event.add("uid", str(uuid4()))
+        event.add(
+            "uid",
+            event_uid(
+                event_data.get("type", "feature"),
+                event_data["date"].isoformat(),
+                event_data.get("time", ""),
+                event_data["name"],
+            ),
+        )
 
         # Set event time
         if "time" in event_data:
@@ -0,0 +1,375 @@
+"""
+Prayer table module.
+This module stores a mosque's yearly timetable as a compact matrix of minutes since
+midnight (uint16), indexed by day of year and prayer, together with the mosque timezone.
+Time strings are parsed once when the table is built; generators and the segmenter then
+read integers instead of parsing "HH:MM" strings for every event.
+"""
+
+import calendar as calendar_module
+import contextlib
+import hashlib
+import json
+from array import array
+from collections.abc import Iterator
+from datetime import date, datetime
+from typing import Optional, Union
+
+# Column order, which is also the order of the lists in confData's calendar
+PRAYER_NAMES = ("fajr", "sunset", "dohr", "asr", "maghreb", "icha")
+PRAYER_INDEX = {name: i for i, name in enumerate(PRAYER_NAMES)}
+
+# Marks a missing time in the matrix
+MISSING = 0xFFFF
+
+# Rows follow a leap year so that 29 February always has a slot
+DAYS_PER_TABLE = 366
+_MONTH_OFFSETS = [0]
+for _month in range(1, 12):
+    _MONTH_OFFSETS.append(
+        _MONTH_OFFSETS[-1] + calendar_module.monthrange(2024, _month)[1]
+    )
+
+
+def parse_minutes(value: str) -> int:
+    """
+    Parse an "HH:MM" string into minutes since midnight.
+
+    Args:
+        value (str): Time string
+
+    Returns:
+        int: Minutes since midnight
+
+    Raises:
+        ValueError: If the string is not a valid time
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"Expected string, got {type(value)}")
+    hours, sep, minutes = value.strip().partition(":")
+    if not sep:
+        raise ValueError(f"Invalid time format: {value}")
+    h, m = int(hours), int(minutes)
+    if not (0 <= h <= 23 and 0 <= m <= 59):
+        raise ValueError(f"Time out of range: {value}")
+    return h * 60 + m
+
+
+def format_minutes(minutes: int) -> str:
+    """
+    Format minutes since midnight as "HH:MM".
+
+    Args:
+        minutes (int): Minutes since midnight
+
+    Returns:
+        str: Time string
+    """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def timetable_fingerprint(
+    calendar: list, timezone: str, override: Optional[dict] = None
+) -> str:
+    """
+    Hash a confData calendar and timezone, the timetable the ICS files are generated
+    from: mosques publishing the same timetable share a fingerprint, which does not
+    change from one day to the next. Today's times, when they differ from the
+    calendar, are folded in as an override and give a fingerprint of their own.
+
+    Args:
+        calendar (list): confData calendar
+        timezone (str): Mosque timezone
+        override (dict, optional): Day ("MM-DD") and minutes of a row that replaces
+            the calendar's
+
+    Returns:
+        str: SHA-256 of the calendar, timezone and override
+    """
+    timetable = {"calendar": calendar, "timezone": timezone}
+    if override is not None:
+        timetable["override"] = override
+    payload = json.dumps(timetable, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _row(month: int, day: int) -> int:
+    """Row of a (month, day) pair in the matrix."""
+    if not 1 <= month <= 12 or not 1 <= day <= 31:
+        raise ValueError(f"Invalid date {day}/{month}")
+    return _MONTH_OFFSETS[month - 1] + day - 1
+
+
+class PrayerTable:
+    """
+    Yearly prayer timetable of a mosque: 366 rows x 6 prayers of uint16 minutes.
+    """
+
+    __slots__ = ("_minutes", "fingerprint", "timezone")
+
+    def __init__(self, timezone: str, minutes: Optional[array] = None):
+        """
+        Initialize an empty table, or wrap an existing matrix.
+
+        Args:
+            timezone (str): Mosque timezone (e.g. "Europe/Paris")
+            minutes (array, optional): uint16 matrix of DAYS_PER_TABLE x 6 values
+        """
+        self.timezone = timezone
+        # Fingerprint of the calendar (and override of today) the table was built
+        # from (see timetable_fingerprint), None if not built from a calendar
+        self.fingerprint: Optional[str] = None
+        if minutes is None:
+            minutes = array("H", [MISSING]) * (DAYS_PER_TABLE * len(PRAYER_NAMES))
+        self._minutes = minutes
+
+    @classmethod
+    def from_calendar(cls, calendar: list, timezone: str) -> "PrayerTable":
+        """
+        Build a table from confData's calendar (12 dicts of day → 6 "HH:MM" strings).
+        Days missing at the end of a month are filled with the last available day.
+
+        Args:
+            calendar (list): confData calendar
+            timezone (str): Mosque timezone
+
+        Returns:
+            PrayerTable: The table
+        """
+        table = cls(timezone)
+        for month, month_days in enumerate(calendar[:12], start=1):
+            if not isinstance(month_days, dict):
+                continue
+            for day_str, times in month_days.items():
+                try:
+                    table.set_day(month, int(day_str), times)
+                except (TypeError, ValueError):
+                    continue
+            table._fill_month(month)
+        table.fingerprint = timetable_fingerprint(calendar, timezone)
+        return table
+
+    @classmethod
+    def from_conf_data(
+        cls, conf_data: dict, today: Optional[date] = None
+    ) -> "PrayerTable":
+        """
+        Build a table from a confData object. Today's row is taken from `times` and
+        `shuruq`, which are the times displayed by the mosque for the current day;
+        when they differ from the calendar, they are part of the fingerprint.
+
+        Args:
+            conf_data (dict): confData object
+            today (date, optional): Date of the `times` field, defaults to today
+
+        Returns:
+            PrayerTable: The table
+        """
+        table = cls.from_calendar(
+            conf_data.get("calendar") or [], conf_data.get("timezone", "Europe/Paris")
+        )
+        times = conf_data.get("times") or []
+        if len(times) >= 5:
+            today = today or date.today()
+            row = {
+                "fajr": times[0],
+                "sunset": conf_data.get("shuruq"),
+                "dohr": times[1],
+                "asr": times[2],
+                "maghreb": times[3],
+                "icha": times[4],
+            }
+            start = _row(today.month, today.day) * len(PRAYER_NAMES)
+            end = start + len(PRAYER_NAMES)
+            calendar_row = table._minutes[start:end]
+            with contextlib.suppress(TypeError, ValueError):
+                table.set_day(today.month, today.day, row)
+            if table._minutes[start:end] != calendar_row:
+                table.fingerprint = timetable_fingerprint(
+                    conf_data.get("calendar") or [],
+                    table.timezone,
+                    {
+                        "day": f"{today.month:02d}-{today.day:02d}",
+                        "minutes": table._minutes[start:end].tolist(),
+                    },
+                )
+        return table
+
+    @classmethod
+    def from_scope_data(
+        cls,
+        prayer_times: Union[list, dict],
+        scope: str,
+        timezone: str,
+        today: Optional[date] = None,
+    ) -> "PrayerTable":
+        """
+        Build a table from the per-scope data used by the planner views: a dict of
+        prayer → time for today, a list of daily dicts for the month, or 12 dicts of
+        day → dict (or list) for the year.
+
+        Args:
+            prayer_times (list | dict): Prayer time data for the scope
+            scope (str): Time scope (today/month/year)
+            timezone (str): Mosque timezone
+            today (date, optional): Reference date, defaults to today
+
+        Returns:
+            PrayerTable: The table, with only the days of the scope filled
+        """
+        today = today or date.today()
+        table = cls(timezone)
+        if scope == "today" and isinstance(prayer_times, dict):
+            entries = [(today.month, today.day, prayer_times)]
+        elif scope == "month" and isinstance(prayer_times, list):
+            entries = [
+                (today.month, i + 1, daily) for i, daily in enumerate(prayer_times)
+            ]
+        elif scope == "month" and isinstance(prayer_times, dict):
+            entries = [(today.month, d, t) for d, t in prayer_times.items()]
+        elif scope == "year" and isinstance(prayer_times, list):
+            entries = [
+                (month, day, times)
+                for month, month_days in enumerate(prayer_times, start=1)
+                if isinstance(month_days, dict)
+                for day, times in month_days.items()
+            ]
+        else:
+            entries = []
+        for month, day, times in entries:
+            try:
+                table.set_day(month, int(day), times)
+            except (TypeError, ValueError):
+                continue
+        return table
+
+    def set_day(self, month: int, day: int, times: Union[list, dict]):
+        """
+        Set the times of a day.
+
+        Args:
+            month (int): Month (1-12)
+            day (int): Day of the month
+            times (list | dict): 6 "HH:MM" strings in PRAYER_NAMES order, or a dict of
+                prayer name → "HH:MM" (missing prayers stay empty)
+
+        Raises:
+            ValueError: If the date or a time is invalid
+        """
+        if isinstance(times, dict):
+            values = [times.get(name) for name in PRAYER_NAMES]
+        elif isinstance(times, (list, tuple)) and len(times) >= len(PRAYER_NAMES):
+            values = times[: len(PRAYER_NAMES)]
+        else:
+            raise ValueError(f"Unexpected times format: {times}")
+        parsed = [MISSING if not v else parse_minutes(v) for v in values]
+        start = _row(month, day) * len(PRAYER_NAMES)
+        self._minutes[start : start + len(PRAYER_NAMES)] = array("H", parsed)
+
+    def _fill_month(self, month: int):
+        """Copy the last available day of a month into the missing days after it."""
+        width = len(PRAYER_NAMES)
+        last = None
+        for day in range(1, calendar_module.monthrange(2024, month)[1] + 1):
+            start = _row(month, day) * width
+            if self._minutes[start] != MISSING or self._minutes[start + 2] != MISSING:
+                last = start
+            elif last is not None:
+                self._minutes[start : start + width] = self._minutes[
+                    last : last + width
+                ]
+
+    def has_day(self, month: int, day: int) -> bool:
+        """Whether any time is set for a day."""
+        start = _row(month, day) * len(PRAYER_NAMES)
+        return any(
+            m != MISSING for m in self._minutes[start : start + len(PRAYER_NAMES)]
+        )
+
+    def day_minutes(
+        self, month: int, day: int, prayers: tuple = PRAYER_NAMES
+    ) -> dict[str, int]:
+        """
+        Get the times of a day in minutes since midnight.
+
+        Args:
+            month (int): Month (1-12)
+            day (int): Day of the month
+            prayers (tuple): Prayer names to return, in order
+
+        Returns:
+            dict: prayer name → minutes, without the missing prayers
+        """
+        start = _row(month, day) * len(PRAYER_NAMES)
+        result = {}
+        for name in prayers:
+            value = self._minutes[start + PRAYER_INDEX[name]]
+            if value != MISSING:
+                result[name] = value
+        return result
+
+    def day_times(
+        self, month: int, day: int, prayers: tuple = PRAYER_NAMES
+    ) -> dict[str, str]:
+        """
+        Get the times of a day as "HH:MM" strings.
+
+        Args:
+            month (int): Month (1-12)
+            day (int): Day of the month
+            prayers (tuple): Prayer names to return, in order
+
+        Returns:
+            dict: prayer name → "HH:MM", without the missing prayers
+        """
+        return {
+            name: format_minutes(value)
+            for name, value in self.day_minutes(month, day, prayers).items()
+        }
+
+    def scope_days(
+        self, scope: str, today: Optional[date] = None
+    ) -> Iterator[datetime]:
+        """
+        Iterate over the days of a scope that have times in the table.
+
+        Args:
+            scope (str): Time scope (today/month/year)
+            today (date, optional): Reference date, defaults to today
+
+        Yields:
+            datetime: Midnight of each day, in calendar order
+
+        Raises:
+            ValueError: If scope is invalid
+        """
+        today = today or date.today()
+        if scope == "today":
+            months = [(today.month, [today.day])]
+        elif scope == "month":
+            days = calendar_module.monthrange(today.year, today.month)[1]
+            months = [(today.month, range(1, days + 1))]
+        elif scope == "year":
+            months = [
+                (m, range(1, calendar_module.monthrange(today.year, m)[1] + 1))
+                for m in range(1, 13)
+            ]
+        else:
+            raise ValueError("Scope must be 'today', 'month', or 'year'")
+        for month, days in months:
+            for day in days:
+                if self.has_day(month, day):
+                    yield datetime(today.year, month, day)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the minutes matrix in bytes."""
+        return self._minutes.itemsize * len(self._minutes)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PrayerTable):
+            return NotImplemented
+        return self.timezone == other.timezone and self._minutes == other._minutes
+
+    def __repr__(self) -> str:
+        return f"PrayerTable(timezone={self.timezone!r})"
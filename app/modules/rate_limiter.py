@@ -0,0 +1,225 @@
+"""
+Upstream rate limiter module.
+This module spaces out every request sent to mawaqit.net with a token bucket shared by
+the threads of a process and, through a small state file guarded by an advisory lock,
+by every worker process. Callers reserve a token and wait for their turn, or give up
+once the queue timeout would be exceeded.
+"""
+
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from flask import current_app, has_app_context
+
+from .file_lock import FileLock
+
+# Default settings, overridable through the MAWAQIT_RATE_* configuration keys
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+DEFAULT_QUEUE_TIMEOUT = 5.0
+
+# Bucket state on disk: available tokens and time of the last update (epoch seconds)
+_STATE = struct.Struct("<dd")
+
+_limiter: Optional["TokenBucket"] = None
+_limiter_key: Optional[tuple] = None
+_limiter_lock = threading.Lock()
+
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when a request would wait longer than the queue timeout."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `burst` tokens.
+    Each acquire() reserves a token; when the bucket is empty the reservation is taken
+    on future tokens and the caller sleeps until it is due, so waiting callers are
+    served in order. Without a state file the bucket is shared by threads only.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float],
+        burst: int = DEFAULT_BURST,
+        queue_timeout: Optional[float] = DEFAULT_QUEUE_TIMEOUT,
+        path: Union[str, Path, None] = None,
+    ):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float, optional): Requests per second. None or 0 disables limiting
+            burst (int): Bucket capacity, i.e. requests allowed at once after idling
+            queue_timeout (float, optional): Longest wait for a token, None for no limit
+            path (str | Path, optional): State file shared by worker processes
+        """
+        self.rate = rate or 0.0
+        self.burst = max(1, int(burst))
+        self.queue_timeout = queue_timeout
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.time()
+        self._metrics_lock = threading.Lock()
+        self.acquired = 0
+        self.delayed = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a token.
+
+        Args:
+            timeout (float, optional): Longest wait, defaults to the queue timeout
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            RateLimitTimeout: If the token would arrive after the timeout
+        """
+        if not self.rate:
+            return 0.0
+        if timeout is None:
+            timeout = self.queue_timeout
+        with self._lock:
+            if self.path is None:
+                wait = self._reserve(timeout)
+            else:
+                with FileLock(self.path.with_name(self.path.name + ".lock")):
+                    wait = self._reserve_shared(timeout)
+        if wait is None:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise RateLimitTimeout(
+                f"Upstream rate limit: no request slot within {timeout:.1f}s"
+            )
+        if wait > 0:
+            time.sleep(wait)
+        self._record(wait)
+        return wait
+
+    def _reserve(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        Take a token from the in-memory state.
+
+        Returns:
+            Optional[float]: Seconds to wait, or None if over the timeout
+        """
+        now = time.time()
+        tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        wait = max(0.0, (1 - tokens) / self.rate)
+        if timeout is not None and wait > timeout:
+            self._tokens, self._updated = tokens, now
+            return None
+        self._tokens, self._updated = tokens - 1, now
+        return wait
+
+    def _reserve_shared(self, timeout: Optional[float]) -> Optional[float]:
+        """Take a token from the state file (the file lock is held)."""
+        try:
+            self._tokens, self._updated = _STATE.unpack(self.path.read_bytes())
+        except (OSError, struct.error):
+            # Missing or corrupted state: start with a full bucket
+            self._tokens, self._updated = float(self.burst), time.time()
+        wait = self._reserve(timeout)
+        with open(self.path, "wb") as f:
+            f.write(_STATE.pack(self._tokens, self._updated))
+        return wait
+
+    def _record(self, wait: float):
+        """Update the wait time metrics."""
+        with self._metrics_lock:
+            self.acquired += 1
+            if wait > 0:
+                self.delayed += 1
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def stats(self) -> dict:
+        """
+        Get the limiter settings and the wait time metrics of this process.
+
+        Returns:
+            dict: Rate, burst, queue timeout, acquired, delayed and timed-out requests,
+            total, mean and max wait in seconds
+        """
+        with self._metrics_lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "queue_timeout": self.queue_timeout,
+                "shared": self.path is not None,
+                "acquired": self.acquired,
+                "delayed": self.delayed,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 4),
+                "wait_seconds_mean": round(
+                    self.wait_seconds_total / self.acquired if self.acquired else 0.0,
+                    4,
+                ),
+                "wait_seconds_max": round(self.wait_seconds_max, 4),
+            }
+
+
+def get_limiter_settings() -> dict:
+    """
+    Read the limiter settings from the application configuration.
+    Falls back to module defaults when called outside an application context.
+
+    Returns:
+        dict: Limiter settings (rate, burst, queue_timeout, path)
+    """
+    config = current_app.config if has_app_context() else {}
+    return {
+        "rate": config.get("MAWAQIT_RATE_LIMIT", DEFAULT_RATE),
+        "burst": config.get("MAWAQIT_RATE_BURST", DEFAULT_BURST),
+        "queue_timeout": config.get(
+            "MAWAQIT_RATE_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT
+        ),
+        "path": config.get("MAWAQIT_RATE_LIMIT_PATH"),
+    }
+
+
+def get_rate_limiter() -> TokenBucket:
+    """
+    Get the process-wide limiter used for all mawaqit.net traffic.
+    Inside an application context the limiter is rebuilt when its settings change;
+    worker threads without a context reuse the current one.
+
+    Returns:
+        TokenBucket: Shared limiter
+    """
+    global _limiter, _limiter_key
+
+    if _limiter is not None and not has_app_context():
+        return _limiter
+    settings = get_limiter_settings()
+    key = (os.getpid(), *settings.values())
+    if _limiter is not None and _limiter_key == key:
+        return _limiter
+
+    with _limiter_lock:
+        if _limiter is None or _limiter_key != key:
+            _limiter = TokenBucket(**settings)
+            _limiter_key = key
+        return _limiter
+
+
+def reset_rate_limiter():
+    """
+    Drop the shared limiter.
+    The next call to get_rate_limiter() builds a new one with the current settings.
+    """
+    global _limiter, _limiter_key
+
+    with _limiter_lock:
+        _limiter = None
+        _limiter_key = None
@@ -0,0 +1,247 @@
+"""
+Retry policy and circuit breaker module.
+This module bounds the time a request thread can spend retrying upstream calls:
+exponential backoff with jitter inside a total deadline budget, and a circuit breaker
+that fails fast for a cool-down period after repeated failures.
+"""
+
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    closed: calls go through. open: calls fail fast until the cool-down has elapsed.
+    half_open: a single trial call decides whether to close or re-open the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            cooldown (float): Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._opened = threading.Event()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open."""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def before_call(self):
+        """
+        Check that a call may go upstream.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or a half-open trial is running
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._opened.clear()
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(f"Upstream circuit open, retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+            self._opened.clear()
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    self.trips += 1
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self._opened.set()
+
+    def release_trial(self):
+        """Give back a half-open trial whose call never reached upstream."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def wait_open(self, timeout: float) -> bool:
+        """
+        Sleep up to timeout seconds, waking up early if the circuit opens.
+
+        Args:
+            timeout (float): Maximum sleep in seconds
+
+        Returns:
+            bool: True if the circuit is open
+        """
+        return self._opened.wait(timeout)
+
+    def reset(self):
+        """Close the circuit and reset the counters."""
+        self.record_success()
+        with self._lock:
+            self.rejected = 0
+            self.trips = 0
+
+    def stats(self) -> dict:
+        """
+        Get the breaker state and counters.
+
+        Returns:
+            dict: State, consecutive failures, trips and rejected calls
+        """
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter, bounded by a retry count and a deadline budget.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        jitter: float = 0.5,
+        deadline: Optional[float] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            max_retries (int): Retries after the first attempt
+            base_delay (float): Delay before the first retry, doubled at each retry
+            max_delay (float): Upper bound of a single delay
+            jitter (float): Fraction of each delay that is randomized (0 to 1)
+            deadline (float, optional): Total budget in seconds for all attempts
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before the retry following a failed attempt.
+
+        Args:
+            attempt (int): Index of the failed attempt (0 for the first one)
+
+        Returns:
+            float: Delay in seconds
+        """
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay * (1 - self.jitter * random.random())
+
+    def call(
+        self,
+        fn: Callable[[Optional[float]], Any],
+        retry_on: tuple = (Exception,),
+        breaker: Optional[CircuitBreaker] = None,
+        on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+        no_retry: tuple = (),
+    ) -> Any:
+        """
+        Call fn until it succeeds, the retries are exhausted or the budget is spent.
+        Errors outside retry_on are raised at once and do not count as upstream failures.
+
+        Args:
+            fn (Callable): Called with the remaining budget in seconds (None if unbounded)
+            retry_on (tuple): Exception types that are retried
+            breaker (CircuitBreaker, optional): Breaker checked before every attempt
+            on_retry (Callable, optional): Called with (attempt, error, delay) before
+                waiting
+            no_retry (tuple): Exception types raised at once even if they are in
+                retry_on, without telling the breaker anything: the call never
+                reached upstream (e.g. local rate limiting)
+
+        Returns:
+            The result of fn
+
+        Raises:
+            CircuitOpenError: If the breaker is or becomes open
+            Exception: The last error of fn
+        """
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            if breaker is not None:
+                breaker.before_call()
+            try:
+                result = fn(self._remaining(started))
+            except no_retry:
+                if breaker is not None:
+                    breaker.release_trial()
+                raise
+            except retry_on as e:
+                if breaker is not None:
+                    breaker.record_failure()
+                delay = self.backoff(attempt)
+                remaining = self._remaining(started)
+                if attempt >= self.max_retries or (
+                    remaining is not None and delay >= remaining
+                ):
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                if breaker is None:
+                    time.sleep(delay)
+                elif breaker.wait_open(delay):
+                    raise CircuitOpenError(
+                        f"Upstream circuit opened while retrying: {e}"
+                    ) from e
+                continue
+            except Exception:
+                # Upstream answered (404, bad page...): not an availability failure
+                if breaker is not None:
+                    breaker.record_success()
+                raise
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+    def _remaining(self, started: float) -> Optional[float]:
+        """Seconds left in the deadline budget, or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - (time.monotonic() - started))
@@ -0,0 +1,150 @@
+"""
+Single-flight module for coalescing concurrent work on the same key.
+Only one caller runs the work for a given key; concurrent callers wait for its result
+or its exception. A lock file optionally extends the coalescing across processes, with
+a bounded wait: past it, the work runs locally rather than behind a stuck process.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from .file_lock import FileLock, remove_lock_file
+
+# Maximum wait in seconds for the lock file held by another process
+DEFAULT_LOCK_TIMEOUT = 30.0
+
+
+class _Call:
+    """In-flight call shared by the leader and its waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls per key: one in-flight call, every other caller waits.
+    """
+
+    def __init__(
+        self,
+        lock_dir: Optional[Union[str, Path]] = None,
+        lock_timeout: Optional[float] = DEFAULT_LOCK_TIMEOUT,
+    ):
+        """
+        Initialize the single-flight group.
+
+        Args:
+            lock_dir (str | Path, optional): Directory for per-key lock files.
+                If None, coalescing only applies to threads of this process.
+            lock_timeout (float, optional): Maximum wait in seconds for a lock file
+                held by another process, after which the work runs without it;
+                None waits for as long as the lock is held
+        """
+        self.lock_dir = Path(lock_dir) if lock_dir else None
+        self.lock_timeout = lock_timeout
+        self._calls: dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.lock_timeouts = 0
+
+    def _lock_path(self, key) -> Path:
+        """Get the lock file path for a key."""
+        digest = hashlib.sha1(str(key).encode()).hexdigest()
+        return self.lock_dir / f"{digest}.lock"
+
+    def do(
+        self,
+        key,
+        fn: Callable[[], Any],
+        recheck: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        Run fn once for all concurrent callers of the same key.
+
+        Args:
+            key: Coalescing key
+            fn (Callable): Work to run, without arguments
+            recheck (Callable, optional): Called once the cross-process lock is held
+                or its wait timed out; a non-None result is returned instead of
+                running fn (another process may have completed the work while this
+                one was waiting)
+
+        Returns:
+            The result of fn (or recheck), shared by every caller
+
+        Raises:
+            Exception: The exception raised by fn, re-raised in every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_dir is not None:
+                lock = FileLock(self._lock_path(key))
+                if not lock.acquire(timeout=self.lock_timeout):
+                    # The process holding the lock is slow or stuck: do the work
+                    # here rather than queueing every request behind it
+                    print(
+                        f"⚠️ Lock {lock.path.name} still held, running the work locally"
+                    )
+                    with self._lock:
+                        self.lock_timeouts += 1
+                try:
+                    result = recheck() if recheck else None
+                    if result is None:
+                        result = fn()
+                finally:
+                    lock.release()
+            else:
+                result = fn()
+            call.result = result
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def remove_lock(self, key) -> bool:
+        """
+        Remove the lock file of a key, unless it is in flight or held by another
+        process.
+
+        Args:
+            key: Coalescing key
+
+        Returns:
+            bool: Whether no lock file is left for the key
+        """
+        if self.lock_dir is None:
+            return True
+        with self._lock:
+            if key in self._calls:
+                return False
+        return remove_lock_file(self._lock_path(key))
+
+    def in_flight(self) -> int:
+        """Get the number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
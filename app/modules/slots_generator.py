@@ -3,34 +3,38 @@ Available slots generator module for creating ICS calendar files with time slots
 This module handles the generation of calendar events for available time slots between prayer times.
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from pathlib import Path
 from typing import Optional
-from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 from flask import current_app
 from icalendar import Calendar, Event
 
-from .cache_manager import cache_manager
+from .cache_manager import cache_manager, local_now
+from .event_uid import event_uid
+from .prayer_table import PrayerTable
 
 # Order of prayers in the day
 PRAYERS_ORDER = ["fajr", "dohr", "asr", "maghreb", "icha"]
 
 
-def to_datetime(time_str: str, base_date: datetime, tz: ZoneInfo) -> datetime:
+def to_datetime(time_str: str | int, base_date: datetime, tz: ZoneInfo) -> datetime:
     """
     Convert a time string to a datetime object with timezone.
 
     Args:
-        time_str (str): Time string in format "HH:MM"
+        time_str (str | int): Time string in format "HH:MM", or minutes since midnight
         base_date (datetime): Base date to combine with the time
         tz (ZoneInfo): Timezone information
 
     Returns:
         datetime: Datetime object with timezone
     """
-    t = datetime.strptime(time_str, "%H:%M").time()
+    if isinstance(time_str, int):
+        t = time(*divmod(time_str, 60))
+    else:
+        t = datetime.strptime(time_str, "%H:%M").time()
     return datetime.combine(base_date.date(), t).replace(tzinfo=tz)
 
 
@@ -52,40 +56,31 @@ def format_duration(duration: timedelta) -> str:
     return f"{hours}h{minutes:02d}"
 
 
-def generate_slot_ics_file(
+def slot_events(
     prayer_times: dict,
     base_date: datetime,
-    filename: str,
     timezone_str: str,
     padding_before: int,
     padding_after: int,
     PRAYERS_ORDER: Optional[list] = None,
     prayer_paddings: Optional[dict] = None,
-) -> str:
+) -> list[Event]:
     """
-    Generate calendar events for available slots between prayers for a single day.
+    Build the events of the available slots between prayers for a single day.
 
     Args:
         prayer_times (dict): Dictionary of prayer times
         base_date (datetime): Base date for the events
-        filename (str): Output ICS file path
         timezone_str (str): Timezone string
         padding_before (int): Minutes to add before prayer times
         padding_after (int): Minutes to add after prayer times
         PRAYERS_ORDER (list): List of prayer times in order
 
     Returns:
-        str: Path to the generated ICS file
+        list[Event]: Slot events, in order
     """
     tz = ZoneInfo(timezone_str)
-    calendar = Calendar()
-    calendar.add(
-        "prodid",
-        f"-//{current_app.config.get('ICS_CALENDAR_NAME', 'Prayer Times')}//FR",
-    )
-    calendar.add("version", "2.0")
-    calendar.add("name", current_app.config.get("ICS_CALENDAR_NAME", "Prayer Times"))
-    calendar.add("description", current_app.config["ICS_CALENDAR_DESCRIPTION"])
+    events = []
 
     if PRAYERS_ORDER is None:
         PRAYERS_ORDER = ["fajr", "dohr", "asr", "maghreb", "icha"]
@@ -97,7 +92,7 @@ def generate_slot_ics_file(
 
         t1 = prayer_times.get(current_prayer)
         t2 = prayer_times.get(next_prayer)
-        if not t1 or not t2:
+        if t1 in (None, "") or t2 in (None, ""):
             continue
 
         # Get individual paddings for current and next prayer
@@ -127,7 +122,7 @@ def generate_slot_ics_file(
         formatted = format_duration(duration)
 
         event = Event()
-        event.add("uid", str(uuid4()))
+        event.add("uid", event_uid("slot", start.isoformat(), i))
         event.add("dtstart", start)
         event.add("dtend", end)
         event.add("transp", "TRANSPARENT")
@@ -137,13 +132,13 @@ def generate_slot_ics_file(
             "description",
             f"Free slot between {PRAYERS_ORDER[i]} and {PRAYERS_ORDER[i + 1]} — Duration: {formatted}",
         )
-        calendar.add_component(event)
+        events.append(event)
 
     # Add slot between icha and fajr (night slot)
     icha_time = prayer_times.get("icha")
     fajr_time = prayer_times.get("fajr")
 
-    if icha_time and fajr_time:
+    if icha_time not in (None, "") and fajr_time not in (None, ""):
         icha_dt = to_datetime(icha_time, base_date, tz)
         fajr_dt = to_datetime(fajr_time, base_date, tz)
 
@@ -174,7 +169,7 @@ def generate_slot_ics_file(
             formatted = format_duration(duration)
 
             event = Event()
-            event.add("uid", str(uuid4()))
+            event.add("uid", event_uid("night-slot", night_start.isoformat()))
             event.add("dtstart", night_start)
             event.add("dtend", night_end)
             event.add("transp", "TRANSPARENT")
@@ -184,7 +179,55 @@ def generate_slot_ics_file(
                 "description",
                 f"Free slot between icha and fajr (night) — Duration: {formatted}",
             )
-            calendar.add_component(event)
+            events.append(event)
+
+    return events
+
+
+def generate_slot_ics_file(
+    prayer_times: dict,
+    base_date: datetime,
+    filename: str,
+    timezone_str: str,
+    padding_before: int,
+    padding_after: int,
+    PRAYERS_ORDER: Optional[list] = None,
+    prayer_paddings: Optional[dict] = None,
+) -> str:
+    """
+    Generate calendar events for available slots between prayers for a single day.
+
+    Args:
+        prayer_times (dict): Dictionary of prayer times
+        base_date (datetime): Base date for the events
+        filename (str): Output ICS file path
+        timezone_str (str): Timezone string
+        padding_before (int): Minutes to add before prayer times
+        padding_after (int): Minutes to add after prayer times
+        PRAYERS_ORDER (list): List of prayer times in order
+
+    Returns:
+        str: Path to the generated ICS file
+    """
+    calendar = Calendar()
+    calendar.add(
+        "prodid",
+        f"-//{current_app.config.get('ICS_CALENDAR_NAME', 'Prayer Times')}//FR",
+    )
+    calendar.add("version", "2.0")
+    calendar.add("name", current_app.config.get("ICS_CALENDAR_NAME", "Prayer Times"))
+    calendar.add("description", current_app.config["ICS_CALENDAR_DESCRIPTION"])
+
+    for event in slot_events(
+        prayer_times,
+        base_date,
+        timezone_str,
+        padding_before,
+        padding_after,
+        PRAYERS_ORDER,
+        prayer_paddings,
+    ):
+        calendar.add_component(event)
 
     with open(filename, "wb") as f:
         f.write(calendar.to_ical())
@@ -198,7 +241,7 @@ def generate_slots_by_scope(
     timezone_str: str,
     padding_before: int,
     padding_after: int,
-    prayer_times: list | dict,
+    prayer_times: list | dict | PrayerTable,
     include_sunset: bool = False,
     prayer_paddings: Optional[dict] = None,
     features_options: Optional[dict] = None,
@@ -213,7 +256,8 @@ def generate_slots_by_scope(
         timezone_str (str): Timezone string
         padding_before (int): Minutes to add before prayer times
         padding_after (int): Minutes to add after prayer times
-        prayer_times (list | dict): Prayer time data for the specified scope
+        prayer_times (list | dict | PrayerTable): Prayer time data for the specified
+            scope, or the mosque's PrayerTable
         include_sunset (bool): Whether to include 'sunset' in the prayer order
 
     Returns:
@@ -224,157 +268,133 @@ def generate_slots_by_scope(
     """
     print(f"🔄 Generating slots ICS file for {masjid_id} ({scope})")
 
-    # Check cache first
-    cached_path = cache_manager.get_cached_file_path(
-        masjid_id,
-        scope,
-        padding_before,
-        padding_after,
-        include_sunset,
-        "slots",
-        prayer_paddings,
-        features_options,
-    )
+    # Date of the mosque, which may not be the server's date
+    local = local_now(timezone_str)
 
-    if cached_path:
-        print(f"✅ Using cached slots file: {cached_path}")
-        # Copy cached file to destination
+    # Destination of the file, published from cache or freshly generated
+    output_path = (
+        Path(current_app.static_folder) / "ics" / f"slots_{masjid_id}_{local.year}.ics"
+    )
+    if scope == "today":
         output_path = (
             Path(current_app.static_folder)
             / "ics"
-            / f"slots_{masjid_id}_{datetime.now().year}.ics"
+            / f"slots_{masjid_id}_{local.date()}.ics"
         )
-        if scope == "today":
-            output_path = (
-                Path(current_app.static_folder)
-                / "ics"
-                / f"slots_{masjid_id}_{datetime.now().date()}.ics"
-            )
-        elif scope == "month":
-            output_path = (
-                Path(current_app.static_folder)
-                / "ics"
-                / f"slots_{masjid_id}_{datetime.now().year}_{datetime.now().month:02d}.ics"
-            )
-
-        cache_manager.copy_cached_to_destination(
-            masjid_id,
-            scope,
-            padding_before,
-            padding_after,
-            include_sunset,
-            "slots",
-            str(output_path),
-            prayer_paddings,
-            features_options,
+    elif scope == "month":
+        output_path = (
+            Path(current_app.static_folder)
+            / "ics"
+            / f"slots_{masjid_id}_{local.year}_{local.month:02d}.ics"
         )
-        return str(output_path)
-
-    print("🔄 Cache miss, generating new slots file...")
 
-    # Generate the file (existing logic)
-    YEAR = datetime.now().year
-    now = datetime.now()
-    cal = Calendar()
-    cal.add(
-        "prodid",
-        f"-//{current_app.config.get('ICS_CALENDAR_NAME', 'Prayer Times')}//FR",
-    )
-    cal.add("version", "2.0")
-    cal.add("name", current_app.config.get("ICS_CALENDAR_NAME", "Prayer Times"))
-    cal.add("description", current_app.config["ICS_CALENDAR_DESCRIPTION"])
-
-    # Order of prayers in the day (dynamique)
-    PRAYERS_ORDER = ["fajr"]
-    if include_sunset:
-        PRAYERS_ORDER.append("sunset")
-    PRAYERS_ORDER += ["dohr", "asr", "maghreb", "icha"]
-
-    def append_day_to_calendar(base_date, day_times: dict):
-        """
-        Generate and append available slot events for a single day to the calendar.
-
-        Args:
-            base_date (datetime): Base date for the events
-            day_times (dict): Dictionary of prayer times for the day
-        """
-        tmp_file = Path("tmp.ics")
-        generate_slot_ics_file(
-            day_times,
-            base_date,
-            tmp_file,
-            timezone_str,
-            padding_before,
-            padding_after,
-            PRAYERS_ORDER,
-            prayer_paddings,
+    def generate() -> bytes:
+        """Build the slots ICS content (on a cache miss)."""
+        print("🔄 Cache miss, generating new slots file...")
+
+        # Generate the file (existing logic)
+        YEAR = local.year
+        now = local
+        cal = Calendar()
+        cal.add(
+            "prodid",
+            f"-//{current_app.config.get('ICS_CALENDAR_NAME', 'Prayer Times')}//FR",
         )
-        with open(tmp_file, "rb") as f:
-            sub_cal = Calendar.from_ical(f.read())
-            for component in sub_cal.walk():
-                if component.name == "VEVENT":
-                    cal.add_component(component)
-        tmp_file.unlink(missing_ok=True)
-
-    # Handle different time scopes
-    if scope == "today":
-        append_day_to_calendar(now, prayer_times)
-        filename = f"slots_{masjid_id}_{now.date()}.ics"
+        cal.add("version", "2.0")
+        cal.add("name", current_app.config.get("ICS_CALENDAR_NAME", "Prayer Times"))
+        cal.add("description", current_app.config["ICS_CALENDAR_DESCRIPTION"])
+
+        # Order of prayers in the day (dynamique)
+        PRAYERS_ORDER = ["fajr"]
+        if include_sunset:
+            PRAYERS_ORDER.append("sunset")
+        PRAYERS_ORDER += ["dohr", "asr", "maghreb", "icha"]
+
+        def append_day_to_calendar(base_date, day_times: dict):
+            """
+            Generate and append available slot events for a single day to the calendar.
+
+            Args:
+                base_date (datetime): Base date for the events
+                day_times (dict): Dictionary of prayer times for the day
+            """
+            for event in slot_events(
+                day_times,
+                base_date,
+                timezone_str,
+                padding_before,
+                padding_after,
+                PRAYERS_ORDER,
+                prayer_paddings,
+            ):
+                cal.add_component(event)
+
+        # Handle different time scopes
+        if isinstance(prayer_times, PrayerTable):
+            for date_obj in prayer_times.scope_days(scope, now.date()):
+                append_day_to_calendar(
+                    date_obj,
+                    prayer_times.day_minutes(
+                        date_obj.month, date_obj.day, tuple(PRAYERS_ORDER)
+                    ),
+                )
+
+        elif scope == "today":
+            append_day_to_calendar(now, prayer_times)
 
-    elif scope == "month":
-        month = now.month
-        for i, daily_times in enumerate(prayer_times):
-            date_obj = datetime(YEAR, month, i + 1)
-            append_day_to_calendar(date_obj, daily_times)
-        filename = f"slots_{masjid_id}_{YEAR}_{month:02d}.ics"
-
-    elif scope == "year":
-        for month_index, month_days in enumerate(prayer_times, start=1):
-            if not isinstance(month_days, dict):
-                continue
-            for day_str, times_dict in month_days.items():
-                try:
-                    date_obj = datetime(YEAR, month_index, int(day_str))
-                    # Compatibility: also accepts the old format (list)
-                    if isinstance(times_dict, list) and len(times_dict) >= 6:
-                        keys = ["fajr"]
-                        if "sunset" in PRAYERS_ORDER:
-                            keys.append("sunset")
-                        keys += ["dohr", "asr", "maghreb", "icha"]
-                        times_dict = dict(zip(keys, times_dict))
-                    if isinstance(times_dict, dict):
-                        append_day_to_calendar(date_obj, times_dict)
-                except Exception as e:
-                    print(f"⚠️ Error {day_str}/{month_index}: {e}")
-        filename = f"slots_{masjid_id}_{YEAR}.ics"
-
-    else:
-        raise ValueError("Scope must be 'today', 'month' or 'year'")
-
-    # Use the relative path to the static folder of the application
-    output_path = Path(current_app.static_folder) / "ics" / filename
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Generate the file content
-    file_content = cal.to_ical()
-
-    # Save to destination
-    with open(output_path, "wb") as f:
-        f.write(file_content)
+        elif scope == "month":
+            month = now.month
+            for i, daily_times in enumerate(prayer_times):
+                date_obj = datetime(YEAR, month, i + 1)
+                append_day_to_calendar(date_obj, daily_times)
+
+        elif scope == "year":
+            for month_index, month_days in enumerate(prayer_times, start=1):
+                if not isinstance(month_days, dict):
+                    continue
+                for day_str, times_dict in month_days.items():
+                    try:
+                        date_obj = datetime(YEAR, month_index, int(day_str))
+                        # Compatibility: also accepts the old format (list)
+                        if isinstance(times_dict, list) and len(times_dict) >= 6:
+                            keys = ["fajr"]
+                            if "sunset" in PRAYERS_ORDER:
+                                keys.append("sunset")
+                            keys += ["dohr", "asr", "maghreb", "icha"]
+                            times_dict = dict(zip(keys, times_dict))
+                        if isinstance(times_dict, dict):
+                            append_day_to_calendar(date_obj, times_dict)
+                    except Exception as e:
+                        print(f"⚠️ Error {day_str}/{month_index}: {e}")
+
+        else:
+            raise ValueError("Scope must be 'today', 'month' or 'year'")
+
+        return cal.to_ical()
+
+    # Timetable the file is generated from: mosques publishing the same timetable
+    # share the cached file, and an entry past its TTL is only rebuilt if it changed
+    fingerprint = (
+        prayer_times.fingerprint if isinstance(prayer_times, PrayerTable) else None
+    )
 
-    # Save to cache for future use
-    cache_manager.save_to_cache(
+    # Check the cache first: a hit is published straight to the destination, a
+    # miss is generated once for all concurrent requests, cached and published
+    if cache_manager.publish_or_generate(
         masjid_id,
         scope,
         padding_before,
         padding_after,
         include_sunset,
         "slots",
-        file_content,
         str(output_path),
+        generate,
         prayer_paddings,
         features_options,
-    )
-
-    print(f"✅ Generated and cached slots file: {output_path}")
+        timezone_str=timezone_str,
+        fingerprint=fingerprint,
+    ):
+        print(f"✅ Using cached slots file: {output_path}")
+    else:
+        print(f"✅ Generated and cached slots file: {output_path}")
     return str(output_path)
@@ -3,27 +3,34 @@ Time segmenter module for dividing available time slots between prayers.
 This module handles the segmentation of time periods into manageable slots.
 """
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional
 from zoneinfo import ZoneInfo
 
+from .prayer_table import PRAYER_NAMES, PrayerTable
+
 
 def segment_available_time(
-    prayer_times: dict,
+    prayer_times: dict | PrayerTable,
     tz_str: str,
     padding_before: int,
     padding_after: int,
     prayer_paddings: Optional[dict] = None,
+    day: Optional[date] = None,
+    include_sunset: bool = True,
 ):
     """
     Segment available time between prayer times into slots.
 
     Args:
-        prayer_times (dict): Dictionary of prayer times
+        prayer_times (dict | PrayerTable): Dictionary of prayer times, or the mosque's
+            PrayerTable
         tz_str (str): Timezone string
         padding_before (int): Default minutes to add before prayer times
         padding_after (int): Default minutes to add after prayer times
         prayer_paddings (dict): Individual padding settings for each prayer
+        day (date, optional): Day read from a PrayerTable, defaults to today
+        include_sunset (bool): Whether to read sunset from a PrayerTable
 
     Returns:
         list: List of time segments with start and end times
@@ -32,6 +39,11 @@ def segment_available_time(
     prayer_names = []
     tz = ZoneInfo(tz_str)
 
+    if isinstance(prayer_times, PrayerTable):
+        day = day or datetime.now(tz).date()
+        prayers = tuple(n for n in PRAYER_NAMES if include_sunset or n != "sunset")
+        prayer_times = prayer_times.day_minutes(day.month, day.day, prayers)
+
     if not isinstance(prayer_times, dict):
         print(
             f"⛔ segment_available_time received invalid type: {type(prayer_times)} → {prayer_times}"
@@ -41,7 +53,10 @@ def segment_available_time(
     # Convert prayer times to datetime objects and store prayer names
     for name, time_str in prayer_times.items():
         try:
-            hour, minute = map(int, time_str.strip().split(":"))
+            if isinstance(time_str, int):
+                hour, minute = divmod(time_str, 60)
+            else:
+                hour, minute = map(int, time_str.strip().split(":"))
             dt = datetime.now(tz).replace(
                 hour=hour, minute=minute, second=0, microsecond=0
             )
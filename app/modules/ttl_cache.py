@@ -0,0 +1,219 @@
+"""
+Bounded in-memory cache module.
+This module provides a thread-safe LRU cache with a per-entry TTL, an entry count limit
+and a byte budget, plus hit/miss/eviction counters.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory footprint of a cached value from its JSON length.
+
+    Args:
+        value (Any): Value to measure
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache bounded by entry count and total size, with entry expiry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: Optional[float] = 3600,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept
+            max_bytes (int): Maximum total size of the entries in bytes
+            ttl (float, optional): Default time-to-live in seconds. None disables expiry
+            sizeof (Callable): Function used to size values when no size is given
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = _MISSING,
+    ):
+        """
+        Update the cache limits, evicting entries if the new limits are lower.
+
+        Args:
+            max_entries (int, optional): New entry count limit
+            max_bytes (int, optional): New byte budget
+            ttl (float, optional): New default time-to-live in seconds
+        """
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if ttl is not _MISSING:
+                self.ttl = ttl
+            self._enforce_limits()
+
+    def _remove(self, key):
+        """Remove an entry and release its size. Caller must hold the lock."""
+        _value, size, _expires_at = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def _enforce_limits(self):
+        """Evict least recently used entries until the limits hold. Caller must hold the lock."""
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        """
+        Get a value and mark it as most recently used.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, _size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self, key, value, size: Optional[int] = None, ttl: Optional[float] = _MISSING
+    ):
+        """
+        Store a value, evicting least recently used entries if needed.
+        Values larger than the whole byte budget are not stored.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            size (int, optional): Size of the value in bytes. Estimated if omitted
+            ttl (float, optional): Time-to-live in seconds. Defaults to the cache TTL
+        """
+        if size is None:
+            size = self.sizeof(value)
+        if ttl is _MISSING:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._total_bytes += size
+            self._enforce_limits()
+
+    def pop(self, key, default=None):
+        """
+        Remove an entry and return its value.
+
+        Args:
+            key: Cache key
+            default: Value returned if the key is missing
+
+        Returns:
+            The removed value, or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            expires_at = entry[2]
+            return expires_at is None or expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, Any]: Entry count, size and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -4,11 +4,13 @@ import re
 from datetime import datetime, timezone
 from pathlib import Path
 
-import requests
 from bs4 import BeautifulSoup
 from flask import current_app
 from unidecode import unidecode
 
+from app.modules.http_client import get_http_session
+from app.modules.rate_limiter import get_rate_limiter
+
 # === CONFIG ===
 BASE_URL = current_app.config["MAWAQIT_BASE_URL"]
 HTML_MAIN = BASE_URL
@@ -47,7 +49,8 @@ def sanitize_country_name(name: str) -> str:
 # === GET COUNTRY CODES FROM MAIN PAGE ===
 def get_country_codes() -> dict:
     try:
-        res = requests.get(HTML_MAIN, timeout=10)
+        get_rate_limiter().acquire()
+        res = get_http_session().get(HTML_MAIN, timeout=10)
         res.raise_for_status()
     except Exception as e:
         log(f"[✘] Erreur récupération pays : {e}", "error")
@@ -130,7 +133,8 @@ def main():
             continue
 
         try:
-            r = requests.get(api_url, timeout=10)
+            get_rate_limiter().acquire()
+            r = get_http_session().get(api_url, timeout=10)
             r.raise_for_status()
             mosques = r.json()
             with open(output_file, "w", encoding="utf-8") as f:
@@ -152,6 +156,10 @@ def main():
     log(
         f"[✔] Terminé : {updated_countries} pays mis à jour / {len(countries)} total, {total_mosques} mosquées"
     )
+    limiter = get_rate_limiter().stats()
+    log(
+        f"[⏱] Limiteur mawaqit.net : {limiter['delayed']}/{limiter['acquired']} requêtes retardées, attente max {limiter['wait_seconds_max']:.2f}s"
+    )
 
 
 if __name__ == "__main__":
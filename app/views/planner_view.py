@@ -10,10 +10,17 @@ from pathlib import Path
 
 from flask import Blueprint, jsonify, render_template, request
 
-from app.modules.cache_manager import cache_manager
+from app.modules.cache_manager import SHARED_FILE_TYPES, cache_manager, local_now
 from app.modules.empty_generator import generate_empty_by_scope
-from app.modules.mawaqit_fetcher import fetch_mawaqit_data, fetch_mosques_data
+from app.modules.mawaqit_fetcher import (
+    fetch_mawaqit_data,
+    fetch_mosques_data,
+    get_mawaqit_cache_stats,
+    get_prayer_table,
+    get_timetable_fingerprint,
+)
 from app.modules.prayer_generator import generate_prayer_ics_file
+from app.modules.prayer_table import PrayerTable
 from app.modules.slots_generator import generate_slots_by_scope
 from app.modules.time_segmenter import (
     generate_empty_slots_for_timeline,
@@ -223,6 +230,31 @@ def normalize_year_data(prayer_times: list, include_sunset: bool = True) -> list
     return year_normalized
 
 
+def get_scope_prayer_table(
+    masjid_id: str, prayer_times: list | dict, scope: str, tz_str: str
+) -> PrayerTable:
+    """
+    Get the PrayerTable read by the generators and the segmenter.
+    The table parsed when the mosque was fetched is reused; otherwise the scope data
+    is converted once for the whole request.
+
+    Args:
+        masjid_id (str): Mosque identifier
+        prayer_times (list | dict): Normalized prayer time data for the scope
+        scope (str): Time scope (today/month/year)
+        tz_str (str): Timezone string
+
+    Returns:
+        PrayerTable: Table covering at least the days of the scope
+    """
+    table = get_prayer_table(masjid_id, fetch=False)
+    if table is None:
+        table = PrayerTable.from_scope_data(
+            prayer_times, scope, tz_str, local_now(tz_str).date()
+        )
+    return table
+
+
 def handle_planner_post(masjid_id, scope, padding_before, padding_after):
     """
     Handle prayer time planning requests and generate ICS files.
@@ -418,6 +450,8 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
                 prayer_times, include_sunset=include_sunset
             )
 
+        prayer_table = get_scope_prayer_table(masjid_id, prayer_times, scope, tz_str)
+
         # Generate prayer times ICS file
         ics_path = generate_prayer_ics_file(
             masjid_id=masjid_id,
@@ -425,7 +459,7 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
             prayer_paddings=prayer_paddings,
             features_options=features_options,
@@ -438,7 +472,7 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
             prayer_paddings=prayer_paddings,
             features_options=features_options,
@@ -451,7 +485,7 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
             prayer_paddings=prayer_paddings,
             features_options=features_options,
@@ -462,7 +496,12 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
         if scope == "today":
             if isinstance(prayer_times, dict):
                 slots = segment_available_time(
-                    prayer_times, tz_str, padding_before, padding_after, prayer_paddings
+                    prayer_table,
+                    tz_str,
+                    padding_before,
+                    padding_after,
+                    prayer_paddings,
+                    include_sunset=include_sunset,
                 )
                 empty_slots = generate_empty_slots_for_timeline(slots)
                 segments.append(
@@ -489,11 +528,13 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
                     try:
                         date = datetime(year, month, i + 1)
                         slots = segment_available_time(
-                            daily,
+                            prayer_table,
                             tz_str,
                             padding_before,
                             padding_after,
                             prayer_paddings,
+                            day=date,
+                            include_sunset=include_sunset,
                         )
                         empty_slots = generate_empty_slots_for_timeline(slots)
                         segments.append(
@@ -517,11 +558,13 @@ def handle_planner_post(masjid_id, scope, padding_before, padding_after):
                             day_num = int(day_str)
                             date = datetime(year, month_index, day_num)
                             slots = segment_available_time(
-                                times_dict,
+                                prayer_table,
                                 tz_str,
                                 padding_before,
                                 padding_after,
                                 prayer_paddings,
+                                day=date,
+                                include_sunset=include_sunset,
                             )
                             empty_slots = generate_empty_slots_for_timeline(slots)
                             month_segments.append(
@@ -788,6 +831,8 @@ def handle_planner_ajax():
                 prayer_times, include_sunset=include_sunset
             )
 
+        prayer_table = get_scope_prayer_table(masjid_id, prayer_times, scope, tz_str)
+
         # Generate ICS files
         ics_path = generate_prayer_ics_file(
             masjid_id=masjid_id,
@@ -795,7 +840,7 @@ def handle_planner_ajax():
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
             prayer_paddings=prayer_paddings,
             features_options=features_options,
@@ -807,7 +852,7 @@ def handle_planner_ajax():
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
             prayer_paddings=prayer_paddings,
             features_options=features_options,
@@ -819,7 +864,7 @@ def handle_planner_ajax():
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
             prayer_paddings=prayer_paddings,
             features_options=features_options,
@@ -830,7 +875,12 @@ def handle_planner_ajax():
         if scope == "today":
             if isinstance(prayer_times, dict):
                 slots = segment_available_time(
-                    prayer_times, tz_str, padding_before, padding_after, prayer_paddings
+                    prayer_table,
+                    tz_str,
+                    padding_before,
+                    padding_after,
+                    prayer_paddings,
+                    include_sunset=include_sunset,
                 )
                 empty_slots = generate_empty_slots_for_timeline(slots)
                 segments.append(
@@ -858,11 +908,13 @@ def handle_planner_ajax():
                     try:
                         date = datetime(year, month, i + 1)
                         slots = segment_available_time(
-                            daily,
+                            prayer_table,
                             tz_str,
                             padding_before,
                             padding_after,
                             prayer_paddings,
+                            day=date,
+                            include_sunset=include_sunset,
                         )
                         empty_slots = generate_empty_slots_for_timeline(slots)
                         segments.append(
@@ -886,11 +938,13 @@ def handle_planner_ajax():
                             day_num = int(day_str)
                             date = datetime(year, month_index, day_num)
                             slots = segment_available_time(
-                                times_dict,
+                                prayer_table,
                                 tz_str,
                                 padding_before,
                                 padding_after,
                                 prayer_paddings,
+                                day=date,
+                                include_sunset=include_sunset,
                             )
                             empty_slots = generate_empty_slots_for_timeline(slots)
                             month_segments.append(
@@ -987,6 +1041,8 @@ def handle_generate_ics():
         # Get include_sunset from request data
         include_sunset = data.get("include_sunset", False)
 
+        prayer_table = get_scope_prayer_table(masjid_id, prayer_times, scope, tz_str)
+
         # Generate ICS file
         ics_path = generate_prayer_ics_file(
             masjid_id=masjid_id,
@@ -994,7 +1050,7 @@ def handle_generate_ics():
             timezone_str=tz_str,
             padding_before=padding_before,
             padding_after=padding_after,
-            prayer_times=prayer_times,
+            prayer_times=prayer_table,
             include_sunset=include_sunset,
         )
 
@@ -1013,7 +1069,13 @@ def api_cache_stats():
     """
     try:
         stats = cache_manager.get_cache_stats()
-        return jsonify({"success": True, "stats": stats})
+        return jsonify(
+            {
+                "success": True,
+                "stats": stats,
+                "mawaqit_cache": get_mawaqit_cache_stats(),
+            }
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1043,11 +1105,41 @@ def api_cache_clear():
         return jsonify({"error": str(e)}), 500
 
 
+@planner_api.route("/api/cache/invalidate", methods=["POST"])
+def api_cache_invalidate():
+    """
+    API for invalidating the cached files of one mosque.
+    Parameters: masjid_id, file_type (optional), scope (optional)
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        masjid_id = data.get("masjid_id")
+        if not masjid_id:
+            return jsonify({"error": "Missing required parameters"}), 400
+
+        invalidated = cache_manager.invalidate(
+            masjid_id, data.get("file_type"), data.get("scope")
+        )
+
+        return jsonify(
+            {
+                "success": True,
+                "invalidated": invalidated,
+                "message": f"{invalidated} cache entries invalidated for {masjid_id}",
+            }
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @planner_api.route("/api/cache/check", methods=["GET"])
 def api_cache_check():
     """
     API for checking if a file is in cache.
-    Parameters: masjid_id, scope, padding_before, padding_after, include_sunset, file_type
+    Parameters: masjid_id, scope, padding_before, padding_after, include_sunset, file_type,
+    timezone (optional, mosque timezone of the today/month/year scopes)
+    The status is "unknown" for the slots files of a mosque whose confData is not
+    cached: they are keyed by its timetable.
     """
     try:
         masjid_id = request.args.get("masjid_id")
@@ -1056,12 +1148,43 @@ def api_cache_check():
         padding_after = int(request.args.get("padding_after", 35))
         include_sunset = request.args.get("include_sunset", "false").lower() == "true"
         file_type = request.args.get("file_type")
+        timezone_str = request.args.get("timezone")
 
         if not all([masjid_id, scope, file_type]):
             return jsonify({"error": "Missing required parameters"}), 400
+        parameters = {
+            "masjid_id": masjid_id,
+            "scope": scope,
+            "padding_before": padding_before,
+            "padding_after": padding_after,
+            "include_sunset": include_sunset,
+            "file_type": file_type,
+            "timezone": timezone_str,
+        }
+
+        fingerprint = get_timetable_fingerprint(masjid_id)
+        if fingerprint is None and file_type in SHARED_FILE_TYPES:
+            # Shared files are keyed by the timetable: without its confData, the
+            # cache key of the mosque is not known
+            return jsonify(
+                {
+                    "success": True,
+                    "status": "unknown",
+                    "is_valid": None,
+                    "cached_path": None,
+                    "parameters": parameters,
+                }
+            )
 
         is_valid = cache_manager.is_cache_valid(
-            masjid_id, scope, padding_before, padding_after, include_sunset, file_type
+            masjid_id,
+            scope,
+            padding_before,
+            padding_after,
+            include_sunset,
+            file_type,
+            timezone_str=timezone_str,
+            fingerprint=fingerprint,
         )
 
         cached_path = None
@@ -1073,21 +1196,17 @@ def api_cache_check():
                 padding_after,
                 include_sunset,
                 file_type,
+                timezone_str=timezone_str,
+                fingerprint=fingerprint,
             )
 
         return jsonify(
             {
                 "success": True,
+                "status": "hit" if is_valid else "miss",
                 "is_valid": is_valid,
                 "cached_path": cached_path,
-                "parameters": {
-                    "masjid_id": masjid_id,
-                    "scope": scope,
-                    "padding_before": padding_before,
-                    "padding_after": padding_after,
-                    "include_sunset": include_sunset,
-                    "file_type": file_type,
-                },
+                "parameters": parameters,
             }
         )
     except Exception as e:
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of confData extraction on saved mosque pages.
+Compares the BeautifulSoup + regex path with the streaming scanner of
+app.modules.confdata_extractor.
+
+Usage:
+    python -m benchmarks.bench_confdata_extractor [--pages DIR] [--iterations N]
+"""
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from app.modules.confdata_extractor import scan_conf_data
+
+DEFAULT_PAGES_DIR = (
+    Path(__file__).resolve().parent.parent / "tests" / "data" / "mosque_pages"
+)
+CHUNK_SIZE = 16 * 1024
+
+
+def extract_with_soup(html: str) -> dict:
+    """Previous extraction path: full HTML parse, then a DOTALL regex."""
+    soup = BeautifulSoup(html, "html.parser")
+    script = soup.find("script", string=re.compile(r"var\s+confData\s*=\s*{"))
+    match = re.search(r"var\s+confData\s*=\s*({.*?});\s*", script.string, re.DOTALL)
+    return json.loads(match.group(1))
+
+
+def extract_with_scanner(body: bytes) -> tuple[dict, int]:
+    """Streaming extraction over CHUNK_SIZE chunks, as done on a live response."""
+    chunks = (body[i : i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+    json_text, read = scan_conf_data(chunks)
+    return json.loads(json_text), len(read)
+
+
+def time_per_call(fn, iterations: int) -> float:
+    """Return the mean duration of fn() in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=Path, default=DEFAULT_PAGES_DIR)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = sorted(args.pages.glob("*.html"))
+    if not pages:
+        raise SystemExit(f"No .html pages found in {args.pages}")
+
+    print(
+        f"{'page':40} {'size':>8} {'read':>8} {'soup ms':>9} {'scan ms':>9} {'speedup':>8}"
+    )
+    for page in pages:
+        body = page.read_bytes()
+        html = body.decode("utf-8")
+
+        expected = extract_with_soup(html)
+        scanned, read = extract_with_scanner(body)
+        assert scanned == expected, f"Extractors disagree on {page.name}"
+
+        soup_ms = time_per_call(
+            lambda html=html: extract_with_soup(html), args.iterations
+        )
+        scan_ms = time_per_call(
+            lambda body=body: extract_with_scanner(body), args.iterations
+        )
+        print(
+            f"{page.name[:40]:40} {len(body):>8} {read:>8} "
+            f"{soup_ms:>9.2f} {scan_ms:>9.2f} {soup_ms / scan_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+End-to-end load benchmark of the planner endpoints.
+Starts the local Mawaqit stand-in and the application on a threaded WSGI server, then
+drives /planner, /api/generate_planning and /api/generate_ics concurrently and reports
+throughput and p50/p95/p99 latency per endpoint and scope.
+
+Usage:
+    python -m benchmarks.load_benchmark [--requests 200] [--concurrency 16]
+        [--mosques 20] [--latency 0.05] [--error-rate 0.01] [--json results.json]
+
+Use --app-url to benchmark an application that is already running (its
+MAWAQIT_BASE_URL must then point at a stand-in started with benchmarks.mawaqit_standin).
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+
+from .mawaqit_standin import MawaqitStandIn, StandInOptions
+
+# Scopes accepted by each endpoint
+ENDPOINT_SCOPES = {
+    "/planner": ("today", "month", "year"),
+    "/api/generate_planning": ("today", "month", "year"),
+    "/api/generate_ics": ("today", "month"),
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (list): Sorted values
+        pct (float): Percentile (0 to 100)
+
+    Returns:
+        float: Percentile value, 0 for an empty list
+    """
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def build_request(endpoint: str, scope: str, masjid_id: str) -> dict:
+    """
+    Build the keyword arguments of requests.post for an endpoint.
+
+    Args:
+        endpoint (str): Endpoint path
+        scope (str): Time scope
+        masjid_id (str): Mosque identifier
+
+    Returns:
+        dict: data= or json= payload
+    """
+    if endpoint == "/api/generate_ics":
+        return {
+            "json": {
+                "masjid_id": masjid_id,
+                "scope": scope,
+                "padding_before": 10,
+                "padding_after": 35,
+            }
+        }
+    return {
+        "data": {
+            "masjid_id": masjid_id,
+            "scope": scope,
+            "padding_before": "10",
+            "padding_after": "35",
+        }
+    }
+
+
+def is_success(r: requests.Response) -> bool:
+    """
+    Whether an endpoint answered successfully.
+    /planner renders the error page with a 200 status, the API endpoints answer
+    {"success": true, ...}.
+    """
+    if r.status_code != 200:
+        return False
+    if r.headers.get("Content-Type", "").startswith("application/json"):
+        try:
+            return bool(r.json().get("success"))
+        except ValueError:
+            return False
+    return 'class="error-page"' not in r.text
+
+
+def run_scenario(
+    app_url: str,
+    endpoint: str,
+    scope: str,
+    mosques: list,
+    total: int,
+    concurrency: int,
+    timeout: float = 120,
+) -> dict:
+    """
+    Send `total` requests to one endpoint and scope with `concurrency` clients.
+
+    Args:
+        app_url (str): Application base URL
+        endpoint (str): Endpoint path
+        scope (str): Time scope
+        mosques (list): Mosque identifiers, used in turn
+        total (int): Number of requests
+        concurrency (int): Concurrent clients
+        timeout (float): Per-request timeout in seconds
+
+    Returns:
+        dict: Request and error counts, throughput and latency percentiles in ms
+    """
+    local = threading.local()
+
+    def one(i: int) -> tuple[float, bool]:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        kwargs = build_request(endpoint, scope, mosques[i % len(mosques)])
+        started = time.perf_counter()
+        try:
+            r = session.post(f"{app_url}{endpoint}", timeout=timeout, **kwargs)
+            ok = is_success(r)
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    duration = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return {
+        "endpoint": endpoint,
+        "scope": scope,
+        "requests": total,
+        "errors": sum(1 for _, ok in results if not ok),
+        "duration_seconds": round(duration, 3),
+        "throughput_rps": round(total / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+def start_app(upstream_url: str, config_overrides: Optional[dict] = None):
+    """
+    Start the application on a threaded WSGI server in a daemon thread.
+
+    Args:
+        upstream_url (str): MAWAQIT_BASE_URL of the stand-in
+        config_overrides (dict, optional): Extra configuration
+
+    Returns:
+        tuple: (server, application base URL)
+    """
+    from werkzeug.serving import make_server
+
+    from main import create_app
+
+    overrides = {"MAWAQIT_BASE_URL": upstream_url, "MAWAQIT_RATE_LIMIT": None}
+    overrides.update(config_overrides or {})
+    app = create_app("production", overrides)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_report(results: list):
+    """Print the results as a table."""
+    print(
+        f"{'endpoint':26} {'scope':6} {'reqs':>6} {'errors':>6} {'req/s':>8}"
+        f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['endpoint']:26} {r['scope']:6} {r['requests']:>6} {r['errors']:>6}"
+            f" {r['throughput_rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}"
+            f" {r['p99_ms']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200, help="Per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mosques", type=int, default=20, help="Distinct mosques")
+    parser.add_argument("--latency", type=float, default=0.05, help="Upstream seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Upstream seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--extra-kb", type=int, default=4, help="Unused confData KB")
+    parser.add_argument("--body-kb", type=int, default=60, help="HTML after confData")
+    parser.add_argument(
+        "--endpoints", nargs="*", default=list(ENDPOINT_SCOPES), help="Endpoint paths"
+    )
+    parser.add_argument("--scopes", nargs="*", default=["today", "month", "year"])
+    parser.add_argument("--app-url", help="Benchmark a running application")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    options = StandInOptions(
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        extra_bytes=args.extra_kb * 1024,
+        body_bytes=args.body_kb * 1024,
+    )
+    mosques = [f"mosquee-bench-{i}" for i in range(args.mosques)]
+    results = []
+    # Request logs and the application prints would drown the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    upstream = None
+    with contextlib.ExitStack() as stack:
+        app_url = args.app_url
+        if app_url is None:
+            upstream = stack.enter_context(MawaqitStandIn(options))
+            # Fresh confData store, locks and limiter state: the run starts cold
+            state_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            server, app_url = start_app(
+                upstream.base_url,
+                {
+                    "MAWAQIT_STORE_PATH": os.path.join(state_dir, "confdata.sqlite3"),
+                    "MAWAQIT_LOCK_DIR": os.path.join(state_dir, "locks"),
+                    "MAWAQIT_RATE_LIMIT_PATH": os.path.join(state_dir, "ratelimit"),
+                },
+            )
+            stack.callback(server.shutdown)
+        devnull = stack.enter_context(open(os.devnull, "w"))
+        stack.enter_context(contextlib.redirect_stdout(devnull))
+
+        for endpoint in args.endpoints:
+            for scope in ENDPOINT_SCOPES.get(endpoint, ()):
+                if scope in args.scopes:
+                    results.append(
+                        run_scenario(
+                            app_url,
+                            endpoint,
+                            scope,
+                            mosques,
+                            args.requests,
+                            args.concurrency,
+                        )
+                    )
+    upstream_stats = upstream.stats() if upstream is not None else None
+
+    print_report(results)
+    if upstream_stats is not None:
+        print(f"\nUpstream: {upstream_stats}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "upstream": upstream_stats}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
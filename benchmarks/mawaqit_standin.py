@@ -0,0 +1,276 @@
+"""
+Local stand-in for mawaqit.net, used by the load benchmark and the integration tests.
+It serves mosque pages with an embedded confData, the home page listing the countries,
+and the /api/2.0/mosque/map/{code} country API, with configurable latency, error rate
+and payload sizes.
+
+Usage:
+    python -m benchmarks.mawaqit_standin [--port 8765] [--latency 0.05] [--error-rate 0.02]
+
+Then point the app at it with MAWAQIT_BASE_URL=http://127.0.0.1:8765/fr.
+Slugs starting with "missing" answer 404 and slugs starting with "broken" answer 500.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .mosque_pages import build_conf_data, render_mosque_page
+
+# Countries served by the home page and the map API: code → name
+COUNTRIES = {
+    "FR": "France",
+    "BE": "Belgique",
+    "MA": "Maroc",
+    "DZ": "Algérie",
+    "GB": "Royaume-Uni",
+}
+
+
+class StandInOptions:
+    """
+    Behaviour of the stand-in server.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        extra_bytes: int = 4096,
+        body_bytes: int = 60_000,
+        mosques_per_country: int = 50,
+        seed: int = 0,
+    ):
+        """
+        Initialize the options.
+
+        Args:
+            latency (float): Mean delay in seconds before each answer
+            latency_jitter (float): Maximum random delay added to latency
+            error_rate (float): Fraction of requests answered with a 503 (0 to 1)
+            extra_bytes (int): Size of the unused confData fields (announcements...)
+            body_bytes (int): Size of the HTML after the confData script
+            mosques_per_country (int): Mosques returned by the map API per country
+            seed (int): Seed of the latency and error draws
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.extra_bytes = extra_bytes
+        self.body_bytes = body_bytes
+        self.mosques_per_country = mosques_per_country
+        self.seed = seed
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers like mawaqit.net for the paths used by the application."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server: MawaqitStandIn = self.server.stand_in
+        path = self.path.split("?", 1)[0].strip("/")
+        delay, fail = server.draw()
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            status, body, content_type = 503, b"Service unavailable", "text/plain"
+        elif "/api/2.0/mosque/map/" in f"/{path}/":
+            code = path.rsplit("/", 1)[-1].upper()
+            status, body, content_type = server.map_response(code)
+        elif path in ("", "fr"):
+            status, body, content_type = 200, server.home_page(), "text/html"
+        else:
+            slug = path.rsplit("/", 1)[-1]
+            status, body, content_type = server.mosque_response(slug)
+
+        server.record(status)
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MawaqitStandIn:
+    """
+    Threaded HTTP server running in a background thread.
+    Usable as a context manager:
+
+        with MawaqitStandIn(StandInOptions(latency=0.05)) as upstream:
+            app = create_app("testing", {"MAWAQIT_BASE_URL": upstream.base_url})
+    """
+
+    def __init__(
+        self,
+        options: Optional[StandInOptions] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        Initialize the server (not started).
+
+        Args:
+            options (StandInOptions, optional): Server behaviour
+            host (str): Listening address
+            port (int): Listening port, 0 for a free port
+        """
+        self.options = options or StandInOptions()
+        self._rng = random.Random(self.options.seed)
+        self._lock = threading.Lock()
+        self.status_counts: Counter = Counter()
+        self._server = ThreadingHTTPServer((host, port), StandInHandler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        self._thread: Optional[threading.Thread] = None
+        self._page = lru_cache(maxsize=1024)(self._render_page)
+
+    @property
+    def base_url(self) -> str:
+        """Value to use as MAWAQIT_BASE_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/fr"
+
+    def start(self) -> "MawaqitStandIn":
+        """Start serving in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mawaqit-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and close its socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def draw(self) -> tuple[float, bool]:
+        """Draw the delay and the failure of a request."""
+        options = self.options
+        with self._lock:
+            jitter = self._rng.random() * options.latency_jitter
+            fail = self._rng.random() < options.error_rate
+        return options.latency + jitter, fail
+
+    def record(self, status: int):
+        """Count an answer by HTTP status."""
+        with self._lock:
+            self.status_counts[status] += 1
+
+    def stats(self) -> dict:
+        """
+        Get the request counters.
+
+        Returns:
+            dict: Total requests and counts per HTTP status
+        """
+        with self._lock:
+            return {
+                "requests": sum(self.status_counts.values()),
+                "status": dict(self.status_counts),
+            }
+
+    def _render_page(self, slug: str) -> bytes:
+        """Render (once) the page of a mosque."""
+        seed = sum(slug.encode()) % 1000
+        conf_data = build_conf_data(
+            slug, seed=seed, extra_bytes=self.options.extra_bytes
+        )
+        return render_mosque_page(conf_data, body_bytes=self.options.body_bytes).encode(
+            "utf-8"
+        )
+
+    def mosque_response(self, slug: str) -> tuple[int, bytes, str]:
+        """Answer for a mosque page."""
+        if slug.startswith("missing"):
+            return 404, b"Not found", "text/plain"
+        if slug.startswith("broken"):
+            return 500, b"Server error", "text/plain"
+        return 200, self._page(slug), "text/html"
+
+    def home_page(self) -> bytes:
+        """Home page with one button per country, as parsed by source_mapper."""
+        count = self.options.mosques_per_country
+        buttons = "\n".join(
+            f'<button class="country" data-data=\''
+            f"{json.dumps({'country': code, 'nb': count})}'>{name}\n"
+            f"<span>{count}</span></button>"
+            for code, name in COUNTRIES.items()
+        )
+        return f"<html><body>{buttons}</body></html>".encode()
+
+    def map_response(self, code: str) -> tuple[int, bytes, str]:
+        """Answer of /api/2.0/mosque/map/{code}: the mosques of a country."""
+        if code not in COUNTRIES:
+            return 404, b"[]", "application/json"
+        rng = random.Random(code)
+        mosques = [
+            {
+                "slug": f"mosquee-{code.lower()}-{i}",
+                "name": f"Mosquée {code} {i}",
+                "address": f"{rng.randint(1, 200)} rue de la Paix",
+                "city": f"Ville {i % 10}",
+                "zipcode": f"{rng.randint(10000, 99999)}",
+                "countryFullName": COUNTRIES[code],
+                "lat": round(rng.uniform(-60, 60), 5),
+                "lng": round(rng.uniform(-120, 120), 5),
+            }
+            for i in range(self.options.mosques_per_country)
+        ]
+        return 200, json.dumps(mosques).encode("utf-8"), "application/json"
+
+
+def main():
+    """Command line entry point: serve until interrupted."""
+    parser = argparse.ArgumentParser(description="Local stand-in for mawaqit.net")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--extra-kb", type=int, default=4, help="Unused confData KB")
+    parser.add_argument("--body-kb", type=int, default=60, help="HTML after confData")
+    parser.add_argument("--mosques-per-country", type=int, default=50)
+    args = parser.parse_args()
+
+    options = StandInOptions(
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        extra_bytes=args.extra_kb * 1024,
+        body_bytes=args.body_kb * 1024,
+        mosques_per_country=args.mosques_per_country,
+    )
+    upstream = MawaqitStandIn(options, host=args.host, port=args.port).start()
+    print(f"✅ Stand-in Mawaqit server on {upstream.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        upstream.stop()
+        print(f"📊 {upstream.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Mosque page builder for benchmarks and the local stand-in server.
+This module renders pages shaped like mawaqit.net mosque pages: an HTML head, a script
+holding `var confData = {...};` with a full yearly calendar, and a long HTML body after it.
+"""
+
+import calendar as calendar_module
+import json
+import random
+from datetime import date
+
+
+def _fmt(minutes: int) -> str:
+    """Format minutes since midnight as HH:MM."""
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def build_calendar(seed: int = 0, year: int = 2024) -> list:
+    """
+    Build a yearly calendar in the confData format.
+
+    Args:
+        seed (int): Seed used to shift the times, so different mosques differ
+        year (int): Year used for the number of days per month
+
+    Returns:
+        list: 12 dicts of day string → [fajr, shuruq, dohr, asr, maghreb, icha]
+    """
+    rng = random.Random(seed)
+    shift = rng.randint(-20, 20)
+    months = []
+    for month in range(1, 13):
+        days = {}
+        for day in range(1, calendar_module.monthrange(year, month)[1] + 1):
+            doy = date(year, month, day).timetuple().tm_yday
+            # Rough seasonal curve: longer days in summer
+            season = abs(doy - 172) / 182
+            fajr = int(230 + 190 * season) + shift
+            shuruq = fajr + 100
+            dohr = 820 + shift // 2
+            asr = int(1060 - 140 * season) + shift
+            maghreb = int(1300 - 260 * season) + shift
+            icha = maghreb + 90
+            days[str(day)] = [
+                _fmt(fajr),
+                _fmt(shuruq),
+                _fmt(dohr),
+                _fmt(asr),
+                _fmt(maghreb),
+                _fmt(icha),
+            ]
+        months.append(days)
+    return months
+
+
+def build_conf_data(
+    slug: str,
+    seed: int = 0,
+    timezone: str = "Europe/Paris",
+    extra_bytes: int = 4096,
+) -> dict:
+    """
+    Build a confData object with the fields found on real mosque pages.
+
+    Args:
+        slug (str): Mosque slug
+        seed (int): Seed for the calendar and the filler content
+        timezone (str): Mosque timezone
+        extra_bytes (int): Approximate size of the unused fields (announcements...)
+
+    Returns:
+        dict: confData object
+    """
+    rng = random.Random(seed)
+    calendar_data = build_calendar(seed)
+    today = calendar_data[0]["1"]
+    announcement = 'Cours d\'arabe "niveau 1" {samedi} \\ inscriptions ouvertes. '
+    announcements = []
+    while sum(len(a["content"]) for a in announcements) < extra_bytes:
+        announcements.append(
+            {
+                "id": rng.randint(1, 10**6),
+                "title": f"Annonce {len(announcements) + 1}",
+                "content": announcement * rng.randint(2, 6),
+                "image": f"https://cdn.mawaqit.net/images/{slug}/{rng.randint(1, 999)}.jpg",
+            }
+        )
+    return {
+        "uuid": f"{seed:08x}-0000-4000-8000-{seed:012x}",
+        "name": f"Mosquée {slug.replace('-', ' ').title()}",
+        "slug": slug,
+        "address": f"{rng.randint(1, 200)} rue de la Paix",
+        "localisation": "75001 Paris, France",
+        "lat": round(48.85 + rng.random() / 10, 6),
+        "lng": round(2.35 + rng.random() / 10, 6),
+        "timezone": timezone,
+        "times": [today[0], today[2], today[3], today[4], today[5]],
+        "shuruq": today[1],
+        "jumua": "13:30",
+        "calendar": calendar_data,
+        "iqamaCalendar": [
+            {day: ["+10", "+10", "+10", "+5", "+10"] for day in month}
+            for month in calendar_data
+        ],
+        "announcements": announcements,
+        "flashMessage": {"content": "Collecte du vendredi", "color": "#1b5e20"},
+        "image": f"https://cdn.mawaqit.net/images/{slug}/cover.jpg",
+        "iqamaEnabled": True,
+        "hijriAdjustment": -1,
+    }
+
+
+def render_mosque_page(conf_data: dict, body_bytes: int = 60_000) -> str:
+    """
+    Render a full mosque page embedding confData.
+
+    Args:
+        conf_data (dict): confData object to embed
+        body_bytes (int): Approximate size of the HTML after the confData script
+
+    Returns:
+        str: HTML page
+    """
+    head = (
+        '<!DOCTYPE html>\n<html lang="fr">\n<head>\n'
+        '<meta charset="utf-8">\n'
+        f"<title>{conf_data.get('name', '')} - Mawaqit</title>\n"
+        '<link rel="stylesheet" href="/build/mosque.css">\n'
+        '<script src="/build/runtime.js"></script>\n'
+        "<script>window.dataLayer = window.dataLayer || [];"
+        " function gtag(){dataLayer.push(arguments);}</script>\n"
+        "</head>\n<body>\n"
+        '<div id="app" class="mosque-screen">\n'
+    )
+    script = (
+        "<script>\n"
+        f"    var confData = {json.dumps(conf_data, ensure_ascii=False)};\n"
+        '    var lang = "fr";\n'
+        "</script>\n"
+    )
+    row = (
+        '<div class="prayer-row"><span class="name">{name}</span>'
+        '<span class="time">{time}</span></div>\n'
+    )
+    body = []
+    size = 0
+    index = 0
+    while size < body_bytes:
+        line = row.format(name=f"item-{index}", time=_fmt(index * 7))
+        body.append(line)
+        size += len(line)
+        index += 1
+    tail = '</div>\n<script src="/build/mosque.js"></script>\n</body>\n</html>\n'
+    return head + script + "".join(body) + tail
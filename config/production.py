@@ -2,6 +2,9 @@
 Configuration pour l'environnement de production
 """
 
+import os
+import tempfile
+
 DEBUG = False
 TESTING = False
 
@@ -13,6 +16,76 @@ MAWAQIT_BASE_URL = "https://mawaqit.net/fr"
 MAWAQIT_REQUEST_TIMEOUT = 10  # secondes
 MAWAQIT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
+# Pool HTTP partagé (keep-alive) pour mawaqit.net
+MAWAQIT_POOL_CONNECTIONS = 4
+MAWAQIT_POOL_MAXSIZE = 16  # connexions max par hôte
+MAWAQIT_POOL_BLOCK = False
+MAWAQIT_KEEPALIVE = True
+
+# Cache mémoire des confData (LRU borné avec expiration)
+MAWAQIT_CACHE_MAX_ENTRIES = 1000
+MAWAQIT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # octets
+MAWAQIT_CACHE_TTL = 6 * 3600  # secondes
+
+# Verrous inter-processus (une seule requête mawaqit.net en vol par mosquée)
+MAWAQIT_LOCK_DIR = os.path.join(tempfile.gettempdir(), "mawaqit-locks")
+MAWAQIT_LOCK_TIMEOUT = 30.0  # attente max en secondes, puis requête locale
+
+# Stockage SQLite des confData partagé entre processus (None pour désactiver)
+MAWAQIT_STORE_PATH = os.path.join(tempfile.gettempdir(), "mawaqit-confdata.sqlite3")
+
+# Données périmées : servies pendant le rafraîchissement ou si mawaqit.net est en erreur
+MAWAQIT_STALE_WHILE_REVALIDATE = True
+MAWAQIT_STALE_IF_ERROR = True
+MAWAQIT_STALE_MAX_AGE = 7 * 24 * 3600  # limite dure en secondes
+MAWAQIT_STALE_RETRY_INTERVAL = 60  # délai avant une nouvelle tentative
+
+# Nouvelles tentatives (backoff exponentiel avec jitter) et disjoncteur
+MAWAQIT_RETRY_MAX_DELAY = 8.0  # secondes
+MAWAQIT_RETRY_JITTER = 0.5  # part aléatoire de chaque délai
+MAWAQIT_RETRY_DEADLINE = 15.0  # budget total en secondes
+MAWAQIT_BREAKER_THRESHOLD = 5  # échecs consécutifs avant ouverture
+MAWAQIT_BREAKER_COOLDOWN = 30.0  # secondes avant un nouvel essai
+
+# Préchargement en masse (app/modules/bulk_fetcher.py)
+MAWAQIT_PREFETCH_CONCURRENCY = 16
+MAWAQIT_PREFETCH_RATE_PER_HOST = 10.0  # requêtes par seconde
+MAWAQIT_PREFETCH_RETRIES = 2
+
+# Limiteur de débit partagé pour tout le trafic vers mawaqit.net (seau à jetons)
+MAWAQIT_RATE_LIMIT = 10.0  # requêtes par seconde, None pour désactiver
+MAWAQIT_RATE_BURST = 20  # requêtes autorisées d'un coup après une pause
+MAWAQIT_RATE_QUEUE_TIMEOUT = 5.0  # attente maximale d'un créneau en secondes
+# État partagé entre processus (None pour un limiteur par processus)
+MAWAQIT_RATE_LIMIT_PATH = os.path.join(tempfile.gettempdir(), "mawaqit-ratelimit")
+
+# Cache mémoire des fichiers ICS les plus demandés (par processus, LRU)
+ICS_CACHE_MEMORY_MAX_BYTES = 32 * 1024 * 1024  # budget en octets
+ICS_CACHE_MEMORY_MAX_ENTRIES = 256
+
+# Quota disque de app/cache, appliqué par un nettoyeur en arrière-plan
+ICS_CACHE_MAX_BYTES = 512 * 1024 * 1024  # None pour désactiver le quota
+ICS_CACHE_EVICTION_POLICY = "lru"  # "lru" ou "lfu"
+ICS_CACHE_JANITOR_INTERVAL = 300.0  # secondes entre deux passages, None pour désactiver
+
+# Publication des fichiers en cache dans static/ics, méthodes essayées dans l'ordre
+# ("hardlink", "reflink", "symlink" ou "copy")
+ICS_CACHE_PUBLISH_METHODS = ("hardlink", "reflink", "copy")
+
+# Variantes précompressées servies selon Accept-Encoding ("gzip", "br", "zstd")
+# br et zstd nécessitent les paquets optionnels brotli et zstandard
+ICS_CACHE_ENCODINGS = ("gzip", "br", "zstd")
+
+# Les entrées today/month/year expirent à minuit (heure de la mosquée) en fin
+# de période ; au-delà de ce délai, elles sont régénérées depuis un horaire frais
+ICS_CACHE_UPSTREAM_TTL_HOURS = 7 * 24  # heures
+
+# Rafraîchissement anticipé probabiliste avant la fin du TTL amont
+# (0 = désactivé, 1 = valeur usuelle, plus grand = plus tôt)
+ICS_CACHE_EARLY_REFRESH_BETA = 0.0
+# Attente max du verrou de génération d'un autre processus, puis génération locale
+ICS_CACHE_LOCK_TIMEOUT = 30.0  # secondes
+
 # Configuration des logs
 LOG_LEVEL = "INFO"
 LOG_FILE = "logs/prod.log"
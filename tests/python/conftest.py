@@ -35,3 +35,14 @@ def pytest_configure(config):
     )
     config.addinivalue_line("markers", "api: marque les tests d'API")
     config.addinivalue_line("markers", "database: marque les tests de base de données")
+
+
+@pytest.fixture(autouse=True)
+def isolated_conf_store(tmp_path, monkeypatch):
+    """Chaque test utilise sa propre base SQLite de confData et son propre limiteur"""
+    from config import Config
+
+    monkeypatch.setattr(
+        Config, "MAWAQIT_STORE_PATH", str(tmp_path / "confdata.sqlite3")
+    )
+    monkeypatch.setattr(Config, "MAWAQIT_RATE_LIMIT_PATH", str(tmp_path / "ratelimit"))
@@ -199,3 +199,15 @@ def test_edit_slot_post(client):
     assert response.status_code == 200
     # Accepter la réponse JSON actuelle
     assert b"Slot POST not implemented" in response.data 
+
+
+def test_cache_check_unknown_timetable(client):
+    """Test that slots files of an uncached mosque are not reported missing."""
+    query = "masjid_id=mosque-a&scope=year&file_type=slots"
+    with patch("app.views.planner_view.get_timetable_fingerprint", return_value=None):
+        response = client.get(f"/api/cache/check?{query}")
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["status"] == "unknown"
+    assert data["is_valid"] is None
@@ -387,3 +387,58 @@ class TestMainController:
         assert response.status_code == 200
         data = response.get_json()
         assert data["message"] == "Slot POST not implemented"
+
+    def test_download_ics_serves_precompressed_variant(self, client, tmp_path):
+        """Test that download_ics negotiates the precompressed variant"""
+        import gzip
+
+        client.application.static_folder = str(tmp_path)
+        (tmp_path / "ics").mkdir()
+        (tmp_path / "ics" / "cal.ics").write_bytes(b"BEGIN:VCALENDAR")
+        (tmp_path / "ics" / "cal.ics.gz").write_bytes(
+            gzip.compress(b"BEGIN:VCALENDAR")
+        )
+
+        response = client.get(
+            "/download_ics/cal.ics", headers={"Accept-Encoding": "gzip, deflate"}
+        )
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.mimetype == "text/calendar"
+        assert gzip.decompress(response.data) == b"BEGIN:VCALENDAR"
+
+        response = client.get("/download_ics/cal.ics", headers={"Accept-Encoding": "br"})
+        assert "Content-Encoding" not in response.headers
+        assert response.data == b"BEGIN:VCALENDAR"
+
+    def test_download_ics_serves_published_file_from_memory(self, client, tmp_path):
+        """Test that download_ics serves a file published here from the memory tier"""
+        import gzip
+
+        from app.modules.cache_manager import ICSCacheManager
+
+        client.application.static_folder = str(tmp_path / "static")
+        manager = ICSCacheManager(tmp_path / "cache")
+        manager.encodings = ("gzip",)
+        content = b"BEGIN:VEVENT\r\nSUMMARY:Fajr\r\nEND:VEVENT\r\n" * 50
+        destination = tmp_path / "static" / "ics" / "cal.ics"
+        manager.publish_or_generate(
+            "mosque-a", "year", 10, 35, False, "prayer_times", str(destination),
+            lambda: content,
+        )
+
+        with patch("app.controllers.main.cache_manager", manager):
+            response = client.get(
+                "/download_ics/cal.ics", headers={"Accept-Encoding": "gzip"}
+            )
+            assert response.status_code == 200
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert gzip.decompress(response.data) == content
+
+            response = client.get("/download_ics/cal.ics")
+            assert "Content-Encoding" not in response.headers
+            assert response.data == content
+            assert response.mimetype == "text/calendar"
+
+        assert manager.memory.stats()["hits"] == 2
@@ -0,0 +1,188 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from app.modules.bulk_fetcher import prefetch_mosques
+from app.modules.mawaqit_fetcher import (
+    clear_mawaqit_cache,
+    fetch_mawaqit_data,
+    get_cached_conf_data,
+    get_mawaqit_cache_stats,
+)
+from app.modules.rate_limiter import RateLimitTimeout
+from benchmarks.mosque_pages import build_conf_data, render_mosque_page
+from main import create_app
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves mosque pages like mawaqit.net; /flaky-* fails once before answering."""
+
+    def do_GET(self):
+        server = self.server
+        slug = self.path.strip("/").split("/")[-1]
+        with server.lock:
+            server.requests.append(slug)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            first_attempt = server.requests.count(slug) == 1
+        try:
+            if slug.startswith("missing"):
+                self._send(404, b"Not found")
+            elif slug.startswith("broken") or (
+                slug.startswith("flaky") and first_attempt
+            ):
+                self._send(500, b"Server error")
+            else:
+                page = render_mosque_page(build_conf_data(slug), body_bytes=2000)
+                self._send(200, page.encode("utf-8"))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def standin():
+    """Local stand-in for mawaqit.net"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app(standin):
+    host, port = standin.server_address
+    app = create_app(
+        "testing",
+        {"MAWAQIT_BASE_URL": f"http://{host}:{port}/fr", "MAWAQIT_LOCK_DIR": None},
+    )
+    clear_mawaqit_cache()
+    with app.app_context():
+        yield app
+    clear_mawaqit_cache()
+
+
+@pytest.mark.usefixtures("app")
+def test_prefetch_fills_cache(standin):
+    """Test that prefetched mosques are served from the cache afterwards"""
+    slugs = [f"mosque-{i}" for i in range(12)]
+    summary = prefetch_mosques(slugs, concurrency=4, rate_per_host=None)
+
+    assert sorted(summary["fetched"]) == sorted(slugs)
+    assert summary["failed"] == {}
+    assert get_mawaqit_cache_stats()["entries"] == 12
+    assert standin.max_in_flight <= 4
+
+    requests_before = len(standin.requests)
+    assert fetch_mawaqit_data("mosque-3")["slug"] == "mosque-3"
+    assert len(standin.requests) == requests_before
+
+
+@pytest.mark.usefixtures("app")
+def test_prefetch_skips_cached_and_duplicates(standin):
+    """Test that cached mosques and duplicate slugs are not fetched again"""
+    prefetch_mosques(["mosque-a"], rate_per_host=None)
+    summary = prefetch_mosques(["mosque-a", "mosque-b", "mosque-b"], rate_per_host=None)
+
+    assert summary["skipped"] == ["mosque-a"]
+    assert summary["fetched"] == ["mosque-b"]
+    assert standin.requests.count("mosque-a") == 1
+    assert standin.requests.count("mosque-b") == 1
+
+
+@pytest.mark.usefixtures("app")
+def test_prefetch_retries_and_failures(standin):
+    """Test retries on server errors, and no retry on 404"""
+    summary = prefetch_mosques(
+        ["flaky-1", "missing-1", "broken-1"],
+        rate_per_host=None,
+        retries=2,
+        backoff=0.01,
+    )
+
+    assert summary["fetched"] == ["flaky-1"]
+    assert "Mosque not found" in summary["failed"]["missing-1"]
+    assert "HTTP error 500" in summary["failed"]["broken-1"]
+    assert standin.requests.count("flaky-1") == 2
+    assert standin.requests.count("missing-1") == 1
+    assert standin.requests.count("broken-1") == 3
+
+
+@pytest.mark.usefixtures("app")
+def test_prefetch_rate_limit_per_host():
+    """Test that request starts are spaced according to the per-host rate"""
+    summary = prefetch_mosques(
+        [f"mosque-{i}" for i in range(5)], concurrency=5, rate_per_host=20.0
+    )
+
+    assert len(summary["fetched"]) == 5
+    # 5 starts at 20 req/s: the last one waits at least 4 intervals of 50 ms
+    assert summary["duration_seconds"] >= 0.2
+
+
+@pytest.mark.usefixtures("app")
+def test_prefetch_does_not_retry_rate_limit_refusals(standin):
+    """Test that a request refused by the shared rate limiter is not retried"""
+    with patch(
+        "app.modules.rate_limiter.TokenBucket.acquire",
+        side_effect=RateLimitTimeout("queue full"),
+    ) as mock_acquire:
+        summary = prefetch_mosques(
+            ["mosque-a"], rate_per_host=None, retries=2, backoff=0.01
+        )
+
+    assert summary["failed"] == {"mosque-a": "queue full"}
+    assert mock_acquire.call_count == 1
+    assert standin.requests == []
+
+
+def test_prefetch_goes_through_circuit_breaker(app, standin):
+    """Test that failing fetches open the fetcher's breaker and stop upstream calls"""
+    app.config["MAWAQIT_BREAKER_THRESHOLD"] = 2
+    app.config["MAWAQIT_BREAKER_COOLDOWN"] = 60
+
+    summary = prefetch_mosques(
+        ["broken-1", "broken-2", "broken-3"],
+        concurrency=1,
+        rate_per_host=None,
+        retries=0,
+    )
+
+    assert set(summary["failed"]) == {"broken-1", "broken-2", "broken-3"}
+    assert standin.requests == ["broken-1", "broken-2"]
+    assert get_mawaqit_cache_stats()["circuit_breaker"]["state"] == "open"
+
+
+@pytest.mark.usefixtures("app")
+def test_prefetch_reads_cache_off_event_loop():
+    """Test that the blocking cache lookups run in the worker threads"""
+    threads = []
+
+    def record(slug):
+        threads.append(threading.current_thread().name)
+        return get_cached_conf_data(slug)
+
+    with patch("app.modules.bulk_fetcher.get_cached_conf_data", side_effect=record):
+        summary = prefetch_mosques(["mosque-a", "mosque-b"], rate_per_host=None)
+
+    assert sorted(summary["fetched"]) == ["mosque-a", "mosque-b"]
+    assert len(threads) == 2
+    assert all(name.startswith("mawaqit-prefetch") for name in threads)
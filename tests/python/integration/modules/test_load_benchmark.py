@@ -0,0 +1,63 @@
+import requests
+
+from benchmarks.load_benchmark import percentile, run_scenario, start_app
+from benchmarks.mawaqit_standin import MawaqitStandIn, StandInOptions
+
+
+def test_percentile_nearest_rank():
+    """Test the nearest-rank percentiles used in the report"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+def test_standin_serves_pages_map_api_and_errors():
+    """Test the stand-in endpoints and its error injection"""
+    with MawaqitStandIn(StandInOptions(mosques_per_country=3)) as upstream:
+        page = requests.get(f"{upstream.base_url}/mosquee-a", timeout=5)
+        assert page.status_code == 200
+        assert "var confData = {" in page.text
+
+        mosques = requests.get(
+            f"{upstream.base_url}/api/2.0/mosque/map/FR", timeout=5
+        ).json()
+        assert [m["slug"] for m in mosques] == [
+            "mosquee-fr-0",
+            "mosquee-fr-1",
+            "mosquee-fr-2",
+        ]
+        assert 'class="country"' in requests.get(upstream.base_url, timeout=5).text
+        missing = requests.get(f"{upstream.base_url}/missing-a", timeout=5)
+        assert missing.status_code == 404
+
+    with MawaqitStandIn(StandInOptions(error_rate=1.0)) as upstream:
+        assert requests.get(f"{upstream.base_url}/a", timeout=5).status_code == 503
+        assert upstream.stats() == {"requests": 1, "status": {503: 1}}
+
+
+def test_run_scenario_against_app(tmp_path):
+    """Test a small end-to-end run of the load benchmark"""
+    with MawaqitStandIn(StandInOptions(latency=0.01)) as upstream:
+        server, app_url = start_app(
+            upstream.base_url,
+            {
+                "MAWAQIT_STORE_PATH": str(tmp_path / "confdata.sqlite3"),
+                "MAWAQIT_LOCK_DIR": str(tmp_path / "locks"),
+            },
+        )
+        try:
+            result = run_scenario(
+                app_url, "/api/generate_ics", "today", ["bench-a", "bench-b"], 6, 3
+            )
+        finally:
+            server.shutdown()
+        upstream_stats = upstream.stats()
+
+    assert result["requests"] == 6
+    assert result["errors"] == 0
+    assert result["throughput_rps"] > 0
+    assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    # One upstream fetch per mosque, then the cache serves
+    assert upstream_stats["requests"] == 2
@@ -1,28 +1,50 @@
 import os
 import sys
 
+# Import create_app from main.py instead of app/__init__.py
 sys.path.insert(
     0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
+import json
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
+import requests
 
-# Import create_app from app.py instead of app/__init__.py
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from main import create_app
+from app.modules import mawaqit_fetcher
+from app.modules.cache_manager import ICSCacheManager, local_now
 from app.modules.mawaqit_fetcher import (
     clear_mawaqit_cache,
     fetch_mawaqit_data,
     fetch_mosques_data,
     get_calendar,
+    get_mawaqit_cache_stats,
     get_month,
     get_prayer_times_of_the_day,
 )
+from app.modules.prayer_table import timetable_fingerprint
+from app.modules.rate_limiter import RateLimitTimeout
+from app.modules.retry_policy import CircuitOpenError
+from benchmarks.mosque_pages import (
+    build_calendar,
+    build_conf_data,
+    render_mosque_page,
+)
+from main import create_app
+
+
+def make_page_response():
+    """Build a mocked streamed response whose body is taken from its .text"""
+    response = MagicMock()
+    response.encoding = "utf-8"
+    response.headers = {}
+    response.iter_content.side_effect = lambda **_kwargs: iter(
+        [response.text.encode()]
+    )
+    return response
 
 
 @pytest.fixture
@@ -44,66 +66,65 @@ def app():
 
 def test_fetch_mawaqit_data_success(app):
     """Test successful fetch of mawaqit data"""
-    mock_response = MagicMock()
+    mock_response = make_page_response()
     mock_response.status_code = 200
     mock_response.text = '<script>var confData = {"times": ["05:00", "13:00", "16:00", "19:00", "21:00"], "shuruq": "06:00", "timezone": "Europe/Paris"};</script>'
 
-    with app.app_context():
-        with patch("requests.get", return_value=mock_response):
-            data = fetch_mawaqit_data("123")
-            assert data["times"] == ["05:00", "13:00", "16:00", "19:00", "21:00"]
-            assert data["shuruq"] == "06:00"
-            assert data["timezone"] == "Europe/Paris"
+    with app.app_context(), patch("requests.Session.get", return_value=mock_response):
+        data = fetch_mawaqit_data("123")
+        assert data["times"] == ["05:00", "13:00", "16:00", "19:00", "21:00"]
+        assert data["shuruq"] == "06:00"
+        assert data["timezone"] == "Europe/Paris"
 
 
 def test_fetch_mawaqit_data_404(app):
     """Test fetch_mawaqit_data with 404 response"""
     clear_mawaqit_cache()
-    mock_response = MagicMock()
+    mock_response = make_page_response()
     mock_response.status_code = 404
 
-    with app.app_context():
-        with patch("requests.get", return_value=mock_response):
-            with pytest.raises(ValueError, match="Mosque not found"):
-                fetch_mawaqit_data("123")
+    with app.app_context(), patch(
+        "requests.Session.get", return_value=mock_response
+    ), pytest.raises(ValueError, match="Mosque not found"):
+        fetch_mawaqit_data("123")
 
 
 def test_fetch_mawaqit_data_http_error(app):
     """Test fetch_mawaqit_data with non-200 response"""
     clear_mawaqit_cache()
-    mock_response = MagicMock()
+    mock_response = make_page_response()
     mock_response.status_code = 500
 
-    with app.app_context():
-        with patch("requests.get", return_value=mock_response):
-            with pytest.raises(RuntimeError, match="HTTP error 500"):
-                fetch_mawaqit_data("123")
+    with app.app_context(), patch(
+        "requests.Session.get", return_value=mock_response
+    ), pytest.raises(RuntimeError, match="HTTP error 500"):
+        fetch_mawaqit_data("123")
 
 
 def test_fetch_mawaqit_data_no_script(app):
     """Test fetch_mawaqit_data when no script tag is found"""
     clear_mawaqit_cache()
-    mock_response = MagicMock()
+    mock_response = make_page_response()
     mock_response.status_code = 200
     mock_response.text = "<html><body>No script here</body></html>"
 
-    with app.app_context():
-        with patch("requests.get", return_value=mock_response):
-            with pytest.raises(ValueError, match="No <script> tag containing confData"):
-                fetch_mawaqit_data("123")
+    with app.app_context(), patch(
+        "requests.Session.get", return_value=mock_response
+    ), pytest.raises(ValueError, match="No <script> tag containing confData"):
+        fetch_mawaqit_data("123")
 
 
 def test_fetch_mawaqit_data_invalid_json(app):
     """Test fetch_mawaqit_data with invalid JSON in confData"""
     clear_mawaqit_cache()
-    mock_response = MagicMock()
+    mock_response = make_page_response()
     mock_response.status_code = 200
     mock_response.text = "<script>var confData = {invalid json};</script>"
 
-    with app.app_context():
-        with patch("requests.get", return_value=mock_response):
-            with pytest.raises(ValueError, match="JSON error in confData"):
-                fetch_mawaqit_data("123")
+    with app.app_context(), patch(
+        "requests.Session.get", return_value=mock_response
+    ), pytest.raises(ValueError, match="JSON error in confData"):
+        fetch_mawaqit_data("123")
 
 
 def test_fetch_mosques_data_today(app):
@@ -114,21 +135,20 @@ def test_fetch_mosques_data_today(app):
         "timezone": "Europe/Paris",
     }
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            data, tz = fetch_mosques_data("123", "today")
-            assert data["fajr"] == "05:00"
-            assert data["dohr"] == "13:00"
-            assert tz == "Europe/Paris"
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ):
+        data, tz = fetch_mosques_data("123", "today")
+        assert data["fajr"] == "05:00"
+        assert data["dohr"] == "13:00"
+        assert tz == "Europe/Paris"
 
 
 def test_fetch_mosques_data_month(app):
     """Test fetch_mosques_data with scope 'month'"""
     # Créer des données pour 12 mois (année complète)
     calendar_data = []
-    for month in range(12):
+    for _month in range(12):
         month_data = []
         for day in range(31):  # 31 jours par mois
             month_data.append(
@@ -144,28 +164,27 @@ def test_fetch_mosques_data_month(app):
 
     mock_data = {"calendar": calendar_data, "timezone": "Europe/Paris"}
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            data, tz = fetch_mosques_data("123", "month")
-            # Vérifier que nous avons bien les données du mois actuel (31 jours)
-            assert len(data) == 31
-            assert data[0] == [
-                "05:00",
-                "13:00",
-                "16:00",
-                "19:00",
-                "21:00",
-            ]  # Premier jour
-            assert data[30] == [
-                "05:30",
-                "13:30",
-                "16:30",
-                "19:30",
-                "21:30",
-            ]  # Dernier jour
-            assert tz == "Europe/Paris"
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ):
+        data, tz = fetch_mosques_data("123", "month")
+        # Vérifier que nous avons bien les données du mois actuel (31 jours)
+        assert len(data) == 31
+        assert data[0] == [
+            "05:00",
+            "13:00",
+            "16:00",
+            "19:00",
+            "21:00",
+        ]  # Premier jour
+        assert data[30] == [
+            "05:30",
+            "13:30",
+            "16:30",
+            "19:30",
+            "21:30",
+        ]  # Dernier jour
+        assert tz == "Europe/Paris"
 
 
 def test_fetch_mosques_data_year(app):
@@ -175,13 +194,12 @@ def test_fetch_mosques_data_year(app):
         "timezone": "Europe/Paris",
     }
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            data, tz = fetch_mosques_data("123", "year")
-            assert data == [["05:00", "13:00", "16:00", "19:00", "21:00"]]
-            assert tz == "Europe/Paris"
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ):
+        data, tz = fetch_mosques_data("123", "year")
+        assert data == [["05:00", "13:00", "16:00", "19:00", "21:00"]]
+        assert tz == "Europe/Paris"
 
 
 def test_fetch_mosques_data_invalid_scope(app):
@@ -191,12 +209,10 @@ def test_fetch_mosques_data_invalid_scope(app):
         "timezone": "Europe/Paris",
     }
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            with pytest.raises(ValueError, match="Unknown scope"):
-                fetch_mosques_data("123", "invalid")
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ), pytest.raises(ValueError, match="Unknown scope"):
+        fetch_mosques_data("123", "invalid")
 
 
 def test_get_prayer_times_of_the_day_success(app):
@@ -206,17 +222,16 @@ def test_get_prayer_times_of_the_day_success(app):
         "shuruq": "06:00",
     }
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            data = get_prayer_times_of_the_day("123")
-            assert data["fajr"] == "05:00"
-            assert data["dohr"] == "13:00"
-            assert data["asr"] == "16:00"
-            assert data["maghreb"] == "19:00"
-            assert data["icha"] == "21:00"
-            assert data["sunset"] == "06:00"
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ):
+        data = get_prayer_times_of_the_day("123")
+        assert data["fajr"] == "05:00"
+        assert data["dohr"] == "13:00"
+        assert data["asr"] == "16:00"
+        assert data["maghreb"] == "19:00"
+        assert data["icha"] == "21:00"
+        assert data["sunset"] == "06:00"
 
 
 def test_get_prayer_times_of_the_day_incomplete(app):
@@ -224,54 +239,428 @@ def test_get_prayer_times_of_the_day_incomplete(app):
     clear_mawaqit_cache()
     mock_data = {"times": ["05:00", "13:00"], "shuruq": "06:00"}
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            with pytest.raises(ValueError, match="Incomplete prayer time data"):
-                get_prayer_times_of_the_day("123")
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ), pytest.raises(ValueError, match="Incomplete prayer time data"):
+        get_prayer_times_of_the_day("123")
 
 
 def test_get_month_success(app):
     """Test get_month with valid month number"""
     mock_data = {"calendar": [["05:00", "13:00", "16:00", "19:00", "21:00"]]}
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            data = get_month("123", 1)
-            assert data == ["05:00", "13:00", "16:00", "19:00", "21:00"]
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ):
+        data = get_month("123", 1)
+        assert data == ["05:00", "13:00", "16:00", "19:00", "21:00"]
 
 
 def test_get_month_invalid_month(app):
     """Test get_month with invalid month number"""
-    with app.app_context():
-        with pytest.raises(ValueError, match="Month must be between 1 and 12"):
-            get_month("123", 13)
+    with app.app_context(), pytest.raises(
+        ValueError, match="Month must be between 1 and 12"
+    ):
+        get_month("123", 13)
 
 
 def test_get_month_unavailable(app):
     """Test get_month with unavailable month"""
     mock_data = {"calendar": []}
 
-    with app.app_context():
-        with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
-        ):
-            with pytest.raises(
-                ValueError, match="This month is not available in the calendar"
-            ):
-                get_month("123", 1)
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ), pytest.raises(
+        ValueError, match="This month is not available in the calendar"
+    ):
+        get_month("123", 1)
 
 
 def test_get_calendar_success(app):
     """Test get_calendar with valid data"""
     mock_data = {"calendar": [["05:00", "13:00", "16:00", "19:00", "21:00"]]}
 
+    with app.app_context(), patch(
+        "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+    ):
+        data = get_calendar("123")
+        assert data == [["05:00", "13:00", "16:00", "19:00", "21:00"]]
+
+
+def test_fetch_mawaqit_data_uses_bounded_cache(app):
+    """Test that a second fetch is served from the confData cache"""
+    clear_mawaqit_cache()
+    mock_response = make_page_response()
+    mock_response.status_code = 200
+    mock_response.text = '<script>var confData = {"times": ["05:00", "13:00", "16:00", "19:00", "21:00"], "timezone": "Europe/Paris"};</script>'
+
+    with app.app_context():
+        with patch("requests.Session.get", return_value=mock_response) as mock_get:
+            fetch_mawaqit_data("cached-mosque")
+            fetch_mawaqit_data("cached-mosque")
+            get_calendar("cached-mosque")
+            assert mock_get.call_count == 1
+
+        stats = get_mawaqit_cache_stats()
+        assert stats["entries"] == 1
+        assert stats["hits"] == 2
+        assert stats["size_bytes"] > 0
+
+
+def test_fetch_mawaqit_data_coalesces_concurrent_misses(app, tmp_path):
+    """Test that concurrent cold fetches for one mosque hit upstream once"""
+    clear_mawaqit_cache()
+    app.config["MAWAQIT_LOCK_DIR"] = str(tmp_path)
+    mock_response = make_page_response()
+    mock_response.status_code = 200
+    mock_response.text = '<script>var confData = {"times": ["05:00", "13:00", "16:00", "19:00", "21:00"], "timezone": "Europe/Paris"};</script>'
+
+    def slow_get(*_args, **_kwargs):
+        time.sleep(0.2)
+        return mock_response
+
+    results = []
+
+    def worker():
+        with app.app_context():
+            results.append(fetch_mawaqit_data("popular-mosque"))
+
+    with patch("requests.Session.get", side_effect=slow_get) as mock_get:
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    assert mock_get.call_count == 1
+    assert len(results) == 6
+    assert all(r["timezone"] == "Europe/Paris" for r in results)
+
+
+def test_fetch_mawaqit_data_reads_shared_store(app):
+    """Test that confData stored by another worker is reused without upstream call"""
+    clear_mawaqit_cache()
+    mock_response = make_page_response()
+    mock_response.status_code = 200
+    mock_response.headers = {"ETag": '"v1"'}
+    mock_response.text = '<script>var confData = {"times": ["05:00", "13:00", "16:00", "19:00", "21:00"], "timezone": "Europe/Paris"};</script>'
+
+    with app.app_context():
+        with patch("requests.Session.get", return_value=mock_response) as mock_get:
+            fetch_mawaqit_data("stored-mosque")
+            # A fresh worker starts with an empty memory cache
+            mawaqit_fetcher._data_cache.clear()
+            data = fetch_mawaqit_data("stored-mosque")
+            assert mock_get.call_count == 1
+
+        assert data["timezone"] == "Europe/Paris"
+        store_stats = get_mawaqit_cache_stats()["store"]
+        assert store_stats["entries"] == 1
+
+
+def test_fetch_mawaqit_data_conditional_revalidation(app):
+    """Test that an expired stored entry is revalidated with a conditional GET"""
+    clear_mawaqit_cache()
+    conf_data = {"times": ["05:00", "13:00", "16:00", "19:00", "21:00"]}
+    not_modified = MagicMock()
+    not_modified.status_code = 304
+    not_modified.headers = {"ETag": '"v2"'}
+
+    with app.app_context():
+        mawaqit_fetcher.configure_fetcher()
+        mawaqit_fetcher._conf_store.put(
+            "old-mosque",
+            conf_data,
+            etag='"v1"',
+            last_modified="Mon, 01 Jan 2024 00:00:00 GMT",
+            fetched_at=time.time() - 7 * 24 * 3600,
+        )
+        with patch("requests.Session.get", return_value=not_modified) as mock_get:
+            data = fetch_mawaqit_data("old-mosque")
+
+        sent_headers = mock_get.call_args.kwargs["headers"]
+        assert sent_headers["If-None-Match"] == '"v1"'
+        assert sent_headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+        assert data == conf_data
+
+        entry = mawaqit_fetcher._conf_store.get("old-mosque")
+        assert entry["etag"] == '"v2"'
+        assert time.time() - entry["fetched_at"] < 60
+
+
+def _store_old_entry(masjid_id, conf_data, age):
+    """Store confData fetched `age` seconds ago"""
+    mawaqit_fetcher.configure_fetcher()
+    mawaqit_fetcher._conf_store.put(
+        masjid_id, conf_data, etag='"v1"', fetched_at=time.time() - age
+    )
+
+
+def test_fetch_mawaqit_data_stale_while_revalidate(app):
+    """Test that stale data is served at once and refreshed in the background"""
+    clear_mawaqit_cache()
+    release = threading.Event()
+    fresh = make_page_response()
+    fresh.status_code = 200
+    fresh.text = '<script>var confData = {"timezone": "Europe/London"};</script>'
+
+    def slow_get(*_args, **_kwargs):
+        release.wait(5)
+        return fresh
+
+    with app.app_context():
+        app.config["MAWAQIT_STALE_WHILE_REVALIDATE"] = True
+        _store_old_entry("stale-mosque", {"timezone": "Europe/Paris"}, 24 * 3600)
+
+        with patch("requests.Session.get", side_effect=slow_get) as mock_get:
+            started = time.monotonic()
+            data = fetch_mawaqit_data("stale-mosque")
+            assert time.monotonic() - started < 1
+            assert data == {"timezone": "Europe/Paris"}
+            # Served from memory while the refresh is running
+            assert fetch_mawaqit_data("stale-mosque") == data
+
+            future = mawaqit_fetcher._refreshing["stale-mosque"]
+            release.set()
+            future.result(timeout=5)
+            assert mock_get.call_count == 1
+
+        entry = mawaqit_fetcher._conf_store.get("stale-mosque")
+        assert entry["conf_data"] == {"timezone": "Europe/London"}
+        assert get_calendar("stale-mosque") == []
+
+
+def test_fetch_mawaqit_data_stale_if_error(app):
+    """Test that stale data is served when upstream fails, up to the hard limit"""
+    clear_mawaqit_cache()
+
+    with app.app_context():
+        app.config["MAWAQIT_STALE_WHILE_REVALIDATE"] = False
+        app.config["MAWAQIT_STALE_IF_ERROR"] = True
+        app.config["MAWAQIT_STALE_MAX_AGE"] = 7 * 24 * 3600
+        _store_old_entry("down-mosque", {"timezone": "Europe/Paris"}, 24 * 3600)
+        _store_old_entry("expired-mosque", {"timezone": "Europe/Paris"}, 30 * 24 * 3600)
+
+        with patch(
+            "requests.Session.get", side_effect=requests.ConnectionError("down")
+        ):
+            data = fetch_mawaqit_data("down-mosque", max_retries=0)
+            assert data == {"timezone": "Europe/Paris"}
+
+            with pytest.raises(requests.ConnectionError):
+                fetch_mawaqit_data("expired-mosque", max_retries=0)
+
+
+def test_fetch_mawaqit_data_circuit_breaker(app):
+    """Test that repeated upstream failures open the breaker and serve stale data"""
+    clear_mawaqit_cache()
+
+    with app.app_context():
+        app.config["MAWAQIT_BREAKER_THRESHOLD"] = 2
+        app.config["MAWAQIT_BREAKER_COOLDOWN"] = 60
+        app.config["MAWAQIT_STALE_WHILE_REVALIDATE"] = False
+        app.config["MAWAQIT_STALE_IF_ERROR"] = True
+        _store_old_entry("known-mosque", {"timezone": "Europe/Paris"}, 24 * 3600)
+
+        with patch(
+            "requests.Session.get", side_effect=requests.ConnectionError("down")
+        ) as mock_get:
+            for masjid_id in ("new-1", "new-2"):
+                with pytest.raises(requests.ConnectionError):
+                    fetch_mawaqit_data(masjid_id, max_retries=0)
+            assert mock_get.call_count == 2
+
+            with pytest.raises(CircuitOpenError):
+                fetch_mawaqit_data("new-3")
+            assert fetch_mawaqit_data("known-mosque") == {"timezone": "Europe/Paris"}
+            assert mock_get.call_count == 2
+
+        assert get_mawaqit_cache_stats()["circuit_breaker"]["state"] == "open"
+    clear_mawaqit_cache()
+
+
+def test_get_prayer_table_built_once_per_fetch(app):
+    """Test that the PrayerTable is parsed once and reused"""
+    clear_mawaqit_cache()
+    mock_response = make_page_response()
+    mock_response.status_code = 200
+    mock_response.text = '<script>var confData = {"calendar": [{"1": ["05:00", "06:30", "13:00", "16:00", "19:00", "20:30"]}], "timezone": "Africa/Algiers"};</script>'
+
+    with app.app_context():
+        assert mawaqit_fetcher.get_prayer_table("table-mosque", fetch=False) is None
+        with patch("requests.Session.get", return_value=mock_response):
+            table = mawaqit_fetcher.get_prayer_table("table-mosque")
+
+        assert table is mawaqit_fetcher.get_prayer_table("table-mosque", fetch=False)
+        assert table.timezone == "Africa/Algiers"
+        assert table.day_times(1, 1)["dohr"] == "13:00"
+
+
+def test_cached_conf_data_is_compact(app):
+    """Test that only the used confData fields are cached and stored"""
+    clear_mawaqit_cache()
+    full = build_conf_data("compact-mosque", extra_bytes=20000)
+    mock_response = make_page_response()
+    mock_response.status_code = 200
+    mock_response.text = render_mosque_page(full, body_bytes=1000)
+
+    with app.app_context():
+        with patch("requests.Session.get", return_value=mock_response):
+            data = fetch_mawaqit_data("compact-mosque")
+
+        assert "announcements" not in data and "iqamaCalendar" not in data
+        assert data["calendar"] == full["calendar"]
+        assert data["slug"] == "compact-mosque"
+        stats = get_mawaqit_cache_stats()
+        assert stats["size_bytes"] * 2 < len(json.dumps(full, ensure_ascii=False))
+        stored = mawaqit_fetcher._conf_store.get("compact-mosque")
+        assert stored["conf_data"] == data
+
+        # Entries written before compaction are compacted when read back
+        _store_old_entry("legacy-mosque", full, 60)
+        legacy = mawaqit_fetcher.get_cached_conf_data("legacy-mosque")
+        assert legacy == data
+    clear_mawaqit_cache()
+
+
+def test_upstream_requests_go_through_rate_limiter(app):
+    """Test that page fetches wait for the shared limiter and report wait times"""
+    clear_mawaqit_cache()
+    app.config.update(MAWAQIT_RATE_LIMIT=50.0, MAWAQIT_RATE_BURST=1)
+    mock_response = make_page_response()
+    mock_response.status_code = 200
+    mock_response.text = '<script>var confData = {"timezone": "Europe/Paris"};</script>'
+
+    with app.app_context():
+        with patch("requests.Session.get", return_value=mock_response) as mock_get:
+            for i in range(4):
+                fetch_mawaqit_data(f"limited-{i}")
+        assert mock_get.call_count == 4
+
+        stats = get_mawaqit_cache_stats()["rate_limiter"]
+        assert stats["rate"] == 50.0
+        assert stats["acquired"] == 4
+        assert stats["delayed"] >= 3
+        assert stats["wait_seconds_max"] > 0
+    clear_mawaqit_cache()
+
+
+
+def test_rate_limit_timeout_is_not_an_upstream_failure(app):
+    """Test that local throttling is raised at once and does not trip the breaker"""
+    clear_mawaqit_cache()
+    app.config.update(MAWAQIT_BREAKER_THRESHOLD=1)
+
     with app.app_context():
         with patch(
-            "app.modules.mawaqit_fetcher.fetch_mawaqit_data", return_value=mock_data
+            "app.modules.rate_limiter.TokenBucket.acquire",
+            side_effect=RateLimitTimeout("queue full"),
+        ), patch("requests.Session.get") as mock_get, pytest.raises(RateLimitTimeout):
+            fetch_mawaqit_data("throttled-mosque", max_retries=3, retry_delay=5)
+        assert mock_get.call_count == 0
+        stats = get_mawaqit_cache_stats()["circuit_breaker"]
+        assert stats["state"] == "closed"
+        assert stats["consecutive_failures"] == 0
+    clear_mawaqit_cache()
+
+def test_timetable_change_invalidates_ics_cache(app, tmp_path):
+    """Test that a refetch with a new calendar invalidates the mosque's ICS files,
+    even without a persistent confData store"""
+    clear_mawaqit_cache()
+    fresh = make_page_response()
+    fresh.status_code = 200
+    fresh.text = '<script>var confData = {"calendar": [{"1": ["05:00"]}]};</script>'
+    new_fingerprint = timetable_fingerprint([{"1": ["05:00"]}], "Europe/Paris")
+    old_fingerprint = timetable_fingerprint([{"1": ["06:00"]}], "Europe/Paris")
+    manager = ICSCacheManager(tmp_path / "ics")
+    for masjid_id, fingerprint in (
+        ("moved-mosque", old_fingerprint),
+        ("same-mosque", new_fingerprint),
+    ):
+        manager.save_to_cache(
+            masjid_id,
+            "year",
+            10,
+            20,
+            False,
+            "prayer_times",
+            b"ICS",
+            "unused.ics",
+            fingerprint=fingerprint,
+        )
+
+    app.config.update(MAWAQIT_STORE_PATH=None, MAWAQIT_STALE_WHILE_REVALIDATE=False)
+    with app.app_context():
+        with patch("requests.Session.get", return_value=fresh), patch.object(
+            mawaqit_fetcher, "cache_manager", manager
         ):
-            data = get_calendar("123")
-            assert data == [["05:00", "13:00", "16:00", "19:00", "21:00"]]
+            fetch_mawaqit_data("moved-mosque")
+            fetch_mawaqit_data("same-mosque")
+        assert mawaqit_fetcher._conf_store is None
+
+    assert manager.catalog.stats()["entries"] == 1
+    assert manager.catalog.counters()["invalidated"] == 1
+    clear_mawaqit_cache()
+
+
+def test_mosques_with_the_same_timetable_share_a_table(app):
+    """Test that equal timetables give one PrayerTable and one fingerprint"""
+    clear_mawaqit_cache()
+    calendar = [{"1": ["05:00", "06:30", "13:00", "16:00", "19:00", "20:30"]}]
+    conf_data = {"calendar": calendar, "timezone": "Europe/Paris", "name": "A"}
+    with app.app_context():
+        assert mawaqit_fetcher.get_timetable_fingerprint("mosque-a") is None
+
+        mawaqit_fetcher._data_cache.set("mosque-a", conf_data)
+        mawaqit_fetcher._data_cache.set("mosque-b", dict(conf_data, name="B"))
+        mawaqit_fetcher._data_cache.set(
+            "mosque-c", dict(conf_data, timezone="Europe/Brussels")
+        )
+        table = mawaqit_fetcher.get_prayer_table("mosque-a", fetch=False)
+        assert mawaqit_fetcher.get_prayer_table("mosque-b", fetch=False) is table
+        assert mawaqit_fetcher.get_prayer_table("mosque-c", fetch=False) is not table
+        fingerprint_b = mawaqit_fetcher.get_timetable_fingerprint("mosque-b")
+        fingerprint_c = mawaqit_fetcher.get_timetable_fingerprint("mosque-c")
+    assert fingerprint_b == table.fingerprint
+    assert fingerprint_c != table.fingerprint
+
+
+def test_timetable_fingerprint_read_from_the_store(app):
+    """Test that the fingerprint is found without the memory cache, not fetched"""
+    clear_mawaqit_cache()
+    calendar = build_calendar(seed=4)
+    with app.app_context():
+        _store_old_entry("stored-mosque", {"calendar": calendar}, 60)
+        with patch("requests.Session.get") as mock_get:
+            fingerprint = mawaqit_fetcher.get_timetable_fingerprint("stored-mosque")
+            assert mawaqit_fetcher.get_timetable_fingerprint("other-mosque") is None
+        assert mock_get.call_count == 0
+    assert fingerprint == timetable_fingerprint(calendar, "Europe/Paris")
+    clear_mawaqit_cache()
+
+
+def test_mosques_with_the_same_calendar_but_other_times_do_not_share_a_table():
+    """Test that today's times override the shared calendar in the fingerprint"""
+    clear_mawaqit_cache()
+    calendar = build_calendar(seed=3)
+    timezone = "Europe/Paris"
+    mosque_a = {"calendar": calendar, "timezone": timezone, "name": "A"}
+    mosque_b = dict(
+        mosque_a,
+        name="B",
+        times=["04:55", "13:55", "16:55", "19:55", "21:25"],
+        shuruq="06:25",
+    )
+    mawaqit_fetcher._data_cache.set("mosque-a", mosque_a)
+    mawaqit_fetcher._data_cache.set("mosque-b", mosque_b)
+
+    table_a = mawaqit_fetcher.get_prayer_table("mosque-a", fetch=False)
+    table_b = mawaqit_fetcher.get_prayer_table("mosque-b", fetch=False)
+    assert table_b is not table_a
+    assert table_b.fingerprint != table_a.fingerprint
+    today = local_now(timezone).date()
+    assert table_b.day_times(today.month, today.day)["fajr"] == "04:55"
+    assert table_a.day_times(today.month, today.day) != table_b.day_times(
+        today.month, today.day
+    )
+    clear_mawaqit_cache()
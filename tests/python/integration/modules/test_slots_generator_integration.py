@@ -212,3 +212,120 @@ def test_generate_slots_by_scope_invalid_scope(tmp_path, app):
                 padding_after=30,
                 prayer_times={},
             )
+
+
+def test_generate_slots_by_scope_from_prayer_table(app):
+    """Test that a PrayerTable gives the same slots as the normalized dicts"""
+    from uuid import uuid4
+
+    from icalendar import Calendar
+
+    from app.modules.prayer_table import PrayerTable
+
+    prayer_times = {
+        "fajr": "05:30",
+        "dohr": "12:30",
+        "asr": "15:30",
+        "maghreb": "18:30",
+        "icha": "20:30",
+    }
+    table = PrayerTable.from_scope_data(prayer_times, "today", "Europe/Paris")
+
+    def event_times(path):
+        with open(path, "rb") as f:
+            cal = Calendar.from_ical(f.read())
+        return sorted(
+            (e.get("dtstart").dt, e.get("dtend").dt) for e in cal.walk("VEVENT")
+        )
+
+    with app.app_context():
+        paths = [
+            generate_slots_by_scope(
+                masjid_id=f"table-{uuid4().hex}",
+                scope="today",
+                timezone_str="Europe/Paris",
+                padding_before=10,
+                padding_after=20,
+                prayer_times=data,
+            )
+            for data in (prayer_times, table)
+        ]
+
+    assert event_times(paths[0]) == event_times(paths[1])
+    assert len(event_times(paths[1])) == 5
+
+
+def test_generate_slots_by_scope_uses_the_mosque_date(app):
+    """Test that the file covers the mosque's day when the server is on another day"""
+    from uuid import uuid4
+
+    from icalendar import Calendar
+
+    from app.modules.prayer_table import PrayerTable
+    from benchmarks.mosque_pages import build_calendar
+
+    calendar = build_calendar(seed=3)
+    # UTC+14 and UTC-11: never on the same date, so at least one is not the server's
+    dates = {}
+    with app.app_context():
+        for timezone_str in ("Pacific/Kiritimati", "Pacific/Pago_Pago"):
+            mosque_today = datetime.now(ZoneInfo(timezone_str)).date()
+            output_path = generate_slots_by_scope(
+                masjid_id=f"far-{uuid4().hex}",
+                scope="today",
+                timezone_str=timezone_str,
+                padding_before=10,
+                padding_after=20,
+                prayer_times=PrayerTable.from_calendar(calendar, timezone_str),
+            )
+            assert Path(output_path).name.endswith(f"_{mosque_today}.ics")
+            with open(output_path, "rb") as f:
+                events = Calendar.from_ical(f.read()).walk("VEVENT")
+            assert {e.get("dtstart").dt.date() for e in events} == {mosque_today}
+            dates[timezone_str] = mosque_today
+    assert len(set(dates.values())) == 2
+
+
+def test_generate_slots_by_scope_equal_days_share_one_object(app):
+    """Test that two mosques with the same day get the same file, stored once"""
+    from uuid import uuid4
+
+    from icalendar import Calendar
+
+    from app.modules.cache_manager import cache_manager
+
+    prayer_times = {
+        "fajr": "05:10",
+        "dohr": "12:20",
+        "asr": "15:40",
+        "maghreb": "18:50",
+        "icha": "20:25",
+    }
+
+    masjid_ids = [f"same-{uuid4().hex}" for _ in range(2)]
+    with app.app_context():
+        paths = [
+            generate_slots_by_scope(
+                masjid_id=masjid_id,
+                scope="today",
+                timezone_str="Europe/Paris",
+                padding_before=10,
+                padding_after=20,
+                prayer_times=prayer_times,
+            )
+            for masjid_id in masjid_ids
+        ]
+        # Two cache entries backed by one stored object
+        objects = {
+            cache_manager.get_cached_file_path(
+                masjid_id, "today", 10, 20, False, "slots", timezone_str="Europe/Paris"
+            )
+            for masjid_id in masjid_ids
+        }
+
+    contents = [Path(path).read_bytes() for path in paths]
+    assert contents[0] == contents[1]
+    uids = [str(e.get("uid")) for e in Calendar.from_ical(contents[0]).walk("VEVENT")]
+    assert len(uids) == len(set(uids)) == 5
+    assert len(objects) == 1
+    assert None not in objects
@@ -0,0 +1,65 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.modules.atomic_file import atomic_publish, atomic_write
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    """Test that the destination is created, then replaced, without leftovers"""
+    path = tmp_path / "sub" / "file.ics"
+    atomic_write(path, b"first")
+    atomic_write(path, b"second", fsync=False)
+
+    assert path.read_bytes() == b"second"
+    assert os.listdir(path.parent) == ["file.ics"]
+    assert path.stat().st_mode & 0o777 == 0o644
+
+
+def test_failed_write_keeps_previous_content(tmp_path):
+    """Test that an interrupted write leaves the previous file untouched"""
+    path = tmp_path / "file.ics"
+    atomic_write(path, b"complete")
+
+    with patch("os.replace", side_effect=OSError("disk full")), pytest.raises(OSError):
+        atomic_write(path, b"never published")
+
+    assert path.read_bytes() == b"complete"
+    assert os.listdir(tmp_path) == ["file.ics"]
+
+
+def test_atomic_publish_methods(tmp_path):
+    """Test hard link, symlink and copy publishing"""
+    source = tmp_path / "objects" / "abc.ics"
+    atomic_write(source, b"content")
+
+    assert atomic_publish(source, tmp_path / "a.ics") == "hardlink"
+    assert (tmp_path / "a.ics").stat().st_ino == source.stat().st_ino
+    assert atomic_publish(source, tmp_path / "b.ics", ("symlink",)) == "symlink"
+    assert (tmp_path / "b.ics").resolve() == source
+    assert atomic_publish(source, tmp_path / "c.ics", ("copy",)) == "copy"
+    assert (tmp_path / "c.ics").read_bytes() == b"content"
+
+    # Methods the filesystem refuses are skipped
+    with patch("os.link", side_effect=OSError("cross-device link")):
+        method = atomic_publish(source, tmp_path / "a.ics", ("hardlink", "copy"))
+    assert method == "copy"
+    assert sorted(os.listdir(tmp_path)) == ["a.ics", "b.ics", "c.ics", "objects"]
+
+    with pytest.raises(FileNotFoundError):
+        atomic_publish(tmp_path / "missing.ics", tmp_path / "a.ics")
+    with pytest.raises(ValueError):
+        atomic_publish(source, tmp_path / "a.ics", ("rsync",))
+
+
+def test_republishing_the_same_file_leaves_no_temp_file(tmp_path):
+    """Test that publishing over an existing link to the same file cleans up"""
+    source = tmp_path / "object.ics"
+    source.write_bytes(b"content")
+    path = tmp_path / "static" / "file.ics"
+    for _ in range(3):
+        atomic_publish(source, path, ("hardlink", "copy"))
+
+    assert os.listdir(path.parent) == ["file.ics"]
+    assert path.read_bytes() == b"content"
@@ -0,0 +1,837 @@
+import gzip
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app.modules.cache_manager import (
+    DEFAULT_UPSTREAM_TTL_HOURS,
+    ICSCacheManager,
+    local_now,
+    scope_period,
+)
+from app.modules.file_lock import FileLock, remove_lock_file
+
+PARAMS = ("mosque-a", "month", 10, 35, False)
+
+
+def _save(manager, params=PARAMS, file_type="prayer_times", content=b"BEGIN:VCALENDAR"):
+    """Save a cache entry for the given parameters"""
+    return manager.save_to_cache(*params, file_type, content, "/tmp/out.ics")
+
+
+def _backdate(manager, key, hours, expires_at=None):
+    """Move the creation time of an entry back by `hours`"""
+    entry = manager.catalog.get(key)
+    manager.catalog.put(
+        key,
+        entry["file_type"],
+        entry["parameters"],
+        entry["content_hash"],
+        entry["size"],
+        created_at=time.time() - hours * 3600,
+        stored_size=entry["stored_size"],
+        expires_at=expires_at or entry["expires_at"],
+        build_seconds=entry["build_seconds"],
+        generator_version=entry["generator_version"],
+        fingerprint=entry["fingerprint"],
+    )
+
+
+def test_save_and_lookup_counts_hits(tmp_path):
+    """Test that a saved entry is found and its hits are counted"""
+    manager = ICSCacheManager(tmp_path)
+    path = _save(manager)
+
+    assert manager.is_cache_valid(*PARAMS, "prayer_times")
+    assert manager.get_cached_file_path(*PARAMS, "prayer_times") == path
+    assert manager.get_cached_file_path(*PARAMS, "prayer_times") == path
+    assert manager.get_cached_file_path(*PARAMS, "slots") is None
+
+    key = manager._generate_cache_key(*PARAMS, "prayer_times")
+    entry = manager.catalog.get(key)
+    assert entry["hit_count"] == 2
+    assert entry["parameters"]["masjid_id"] == "mosque-a"
+    assert entry["last_access"] >= entry["created_at"]
+    # No metadata file next to the ICS any more
+    assert not list(tmp_path.glob("*_metadata.json"))
+
+
+def test_expired_and_damaged_entries_are_misses(tmp_path):
+    """Test the age and size checks"""
+    manager = ICSCacheManager(tmp_path)
+    path = _save(manager)
+    key = manager._generate_cache_key(*PARAMS, "prayer_times")
+
+    with open(path, "ab") as f:
+        f.write(b"partial")
+    assert not manager.is_cache_valid(*PARAMS, "prayer_times")
+
+    _save(manager)
+    _backdate(manager, key, DEFAULT_UPSTREAM_TTL_HOURS + 1)
+    assert manager.get_cached_file_path(*PARAMS, "prayer_times") is None
+
+    # Past the end of its period, even if the upstream TTL is not reached
+    _save(manager)
+    _backdate(manager, key, 1, expires_at=time.time() - 1)
+    assert manager.get_cached_file_path(*PARAMS, "prayer_times") is None
+
+
+def test_stats_and_clear_use_the_catalog(tmp_path):
+    """Test statistics and age-based clearing"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    _save(manager, file_type="prayer_times")
+    _save(manager, file_type="slots", content=b"0123456789")
+    old_key = manager._generate_cache_key(*PARAMS, "slots")
+    old_path = manager._object_path(manager.catalog.get(old_key)["content_hash"])
+    _backdate(manager, old_key, 48)
+
+    stats = manager.get_cache_stats()
+    assert stats["total_files"] == 2
+    assert stats["total_size_bytes"] == 25
+    assert stats["by_file_type"]["slots"] == {"entries": 1, "size_bytes": 10}
+
+    manager.clear_cache(max_age_hours=24)
+    assert manager.get_cache_stats()["total_files"] == 1
+    assert not old_path.exists()
+
+    manager.clear_cache()
+    assert manager.get_cache_stats()["total_files"] == 0
+    assert not list(tmp_path.rglob("*.ics"))
+
+
+def test_legacy_metadata_files_are_imported(tmp_path):
+    """Test the one-time import of <key>_metadata.json files"""
+    key = "0123456789abcdef0123456789abcdef"
+    (tmp_path / f"{key}_slots.ics").write_bytes(b"BEGIN:VCALENDAR")
+    metadata = {
+        "created_at": (datetime.now() - timedelta(hours=1)).isoformat(),
+        "file_size": 15,
+        "parameters": {"masjid_id": "mosque-a", "file_type": "slots"},
+    }
+    (tmp_path / f"{key}_metadata.json").write_text(json.dumps(metadata))
+
+    manager = ICSCacheManager(tmp_path)
+
+    entry = manager.catalog.get(key)
+    assert entry["size"] == 15
+    assert entry["parameters"]["masjid_id"] == "mosque-a"
+    assert not (tmp_path / f"{key}_metadata.json").exists()
+    assert ICSCacheManager(tmp_path).get_cache_stats()["total_files"] == 1
+
+
+def test_memory_tier_serves_published_files(tmp_path):
+    """Test that a published file is served from memory while it is still in place"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ("gzip",)
+    content = b"BEGIN:VEVENT\r\nSUMMARY:Fajr\r\nEND:VEVENT\r\n" * 50
+    destination = tmp_path / "static" / "out.ics"
+    assert not manager.publish_or_generate(
+        *PARAMS, "prayer_times", str(destination), lambda: content
+    )
+    key = manager._generate_cache_key(*PARAMS, "prayer_times")
+
+    # The stored object is gone but the bytes and variants are still in memory
+    content_hash = manager.catalog.get(key)["content_hash"]
+    manager._object_path(content_hash).unlink()
+    cached = manager.get_published_content(destination)
+    assert cached["content"] == content
+    assert gzip.decompress(cached["variants"]["gzip"]) == content
+    assert manager.get_cache_stats()["memory"]["hits"] == 1
+
+    # Unknown here, or replaced by another process: served from disk
+    assert manager.get_published_content(tmp_path / "static" / "other.ics") is None
+    destination.unlink()
+    destination.write_bytes(b"published elsewhere")
+    assert manager.get_published_content(destination) is None
+
+
+def test_memory_tier_promotes_disk_hits_within_budget(tmp_path):
+    """Test promotion from disk and eviction on the byte budget"""
+    ICSCacheManager(tmp_path).save_to_cache(
+        *PARAMS, "slots", b"x" * 600, "/tmp/out.ics"
+    )
+    _save(ICSCacheManager(tmp_path), content=b"y" * 600)
+
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    manager.memory.configure(max_bytes=1000)
+    assert manager.get_cached_content(*PARAMS, "slots") == b"x" * 600
+    assert manager.get_cached_content(*PARAMS, "prayer_times") == b"y" * 600
+
+    stats = manager.get_cache_stats()["memory"]
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] == 600
+    assert stats["evictions"] == 1
+
+    # Entries larger than the budget are served from disk only
+    manager.memory.configure(max_bytes=100)
+    assert manager.get_cached_content(*PARAMS, "slots") == b"x" * 600
+    assert manager.get_cache_stats()["memory"]["entries"] == 0
+
+
+def test_memory_tier_is_thread_safe(tmp_path):
+    """Test concurrent lookups and saves on a small memory budget"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    manager.memory.configure(max_bytes=2000)
+    scopes = [("mosque-a", "month", i, 35, False) for i in range(8)]
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(50):
+                params = scopes[(n + i) % len(scopes)]
+                content = manager.get_cached_content(*params, "slots")
+                if content is None:
+                    _save(manager, params, "slots", bytes([65 + params[2]]) * 400)
+                else:
+                    assert content == bytes([65 + params[2]]) * 400
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert errors == []
+    assert manager.get_cache_stats()["memory"]["size_bytes"] <= 2000
+
+
+def _fill(manager, count, size=100):
+    """Save `count` distinct slots entries of `size` bytes, oldest access first"""
+    keys = []
+    for i in range(count):
+        params = ("mosque-a", "month", i, 35, False)
+        _save(manager, params, "slots", bytes([65 + i]) * size)
+        key = manager._generate_cache_key(*params, "slots")
+        keys.append(key)
+        time.sleep(0.002)
+    return keys
+
+
+def test_janitor_evicts_least_recently_used(tmp_path):
+    """Test LRU eviction down to the low watermark of the quota"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    keys = _fill(manager, 10)
+    hashes = [manager.catalog.get(key)["content_hash"] for key in keys]
+    manager.catalog.touch(keys[0])
+    manager.max_bytes = 900
+
+    result = manager.run_janitor()
+
+    # 1000 bytes for a 900 bytes quota: down to 810, i.e. 2 evictions
+    assert result == {"expired": 0, "outdated": 0, "evicted": 2, "evicted_bytes": 200}
+    assert manager.catalog.get(keys[0]) is not None
+    assert manager.catalog.get(keys[1]) is None
+    assert manager.catalog.get(keys[2]) is None
+    assert not manager._object_path(hashes[1]).exists()
+    assert manager.run_janitor()["evicted"] == 0
+
+    quota = manager.get_cache_stats()["quota"]
+    assert quota["evicted"] == 2
+    assert quota["evicted_bytes"] == 200
+    assert quota["janitor_runs"] == 2
+    assert quota["usage"] == 0.8889
+
+
+def test_janitor_evicts_least_frequently_used(tmp_path):
+    """Test LFU eviction and the removal of expired entries"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    keys = _fill(manager, 5)
+    manager.catalog.add_hits(dict.fromkeys(keys[:3], 3))
+    _backdate(manager, keys[0], DEFAULT_UPSTREAM_TTL_HOURS + 1)
+    manager.max_bytes = 300
+    manager.eviction_policy = "lfu"
+
+    assert manager.run_janitor() == {
+        "expired": 1,
+        "outdated": 0,
+        "evicted": 2,
+        "evicted_bytes": 200,
+    }
+    assert [manager.catalog.get(key) is not None for key in keys] == [
+        False,
+        True,
+        True,
+        False,
+        False,
+    ]
+
+
+def test_janitor_thread(tmp_path):
+    """Test that the janitor runs in the background until stopped"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    _fill(manager, 3)
+    manager.max_bytes = 150
+    manager.janitor_interval = 0.01
+
+    manager.start_janitor()
+    deadline = time.time() + 5
+    while (
+        manager.get_cache_stats()["total_size_bytes"] > 150 and time.time() < deadline
+    ):
+        time.sleep(0.01)
+    manager.stop_janitor()
+
+    assert manager.get_cache_stats()["total_size_bytes"] <= 150
+    assert manager.get_cache_stats()["quota"]["janitor_runs"] >= 1
+
+
+def _write_in_process(cache_dir, count):
+    """Rewrite the same entry with alternating sizes from another process"""
+    manager = ICSCacheManager(cache_dir)
+    for i in range(count):
+        _save(manager, content=b"a" * 5000 if i % 2 else b"b" * 20000)
+
+
+def test_readers_never_see_partial_entries(tmp_path):
+    """Test concurrent writer processes against a reader of the same entry"""
+    manager = ICSCacheManager(tmp_path)
+    _save(manager, content=b"b" * 20000)
+    context = multiprocessing.get_context("fork")
+    writers = [
+        context.Process(target=_write_in_process, args=(str(tmp_path), 100))
+        for _ in range(2)
+    ]
+    for writer in writers:
+        writer.start()
+
+    seen = set()
+    while any(writer.is_alive() for writer in writers):
+        content = manager.get_cached_content(*PARAMS, "prayer_times")
+        seen.add(content)
+    for writer in writers:
+        writer.join(timeout=10)
+
+    assert seen <= {b"a" * 5000, b"b" * 20000}
+    assert all(writer.exitcode == 0 for writer in writers)
+    assert not list(tmp_path.rglob(".*.tmp"))
+
+
+def test_identical_contents_are_stored_once(tmp_path):
+    """Test deduplication, reference counting and hard-link publishing"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    first = _save(manager, content=b"same calendar")
+    second = _save(
+        manager, ("mosque-b", "month", 10, 35, False), content=b"same calendar"
+    )
+    assert first == second
+
+    stats = manager.get_cache_stats()
+    assert stats["total_files"] == 2
+    assert stats["total_objects"] == 1
+    assert stats["total_size_bytes"] == 13
+    assert stats["deduplicated_bytes"] == 13
+
+    destination = tmp_path / "static" / "out.ics"
+    destination.parent.mkdir()
+    destination.write_bytes(b"previous")
+    assert manager.copy_cached_to_destination(*PARAMS, "prayer_times", str(destination))
+    assert destination.read_bytes() == b"same calendar"
+    assert os.path.samefile(destination, first)
+    assert manager.get_cache_stats()["publish"]["counts"] == {"hardlink": 1}
+
+    # The content stays while another entry refers to it
+    _save(manager, content=b"new calendar")
+    assert Path(first).exists()
+    manager.clear_cache()
+    assert not list((tmp_path / "objects").rglob("*.ics"))
+    # The published file keeps its content
+    assert destination.read_bytes() == b"same calendar"
+
+
+def test_publish_falls_back_to_copy(tmp_path):
+    """Test the configured publish methods"""
+    manager = ICSCacheManager(tmp_path)
+    path = _save(manager)
+    manager.publish_methods = ("copy",)
+
+    destination = tmp_path / "out.ics"
+    assert manager.copy_cached_to_destination(*PARAMS, "prayer_times", str(destination))
+    assert destination.read_bytes() == b"BEGIN:VCALENDAR"
+    assert not os.path.samefile(destination, path)
+    assert manager.get_cache_stats()["publish"]["counts"] == {"copy": 1}
+
+
+def test_compressed_variants_are_stored_and_published(tmp_path):
+    """Test the gzip variant of a cached file and its publication"""
+    manager = ICSCacheManager(tmp_path)
+    content = b"BEGIN:VEVENT\r\nSUMMARY:Fajr\r\nEND:VEVENT\r\n" * 100
+    path = Path(_save(manager, content=content))
+
+    assert gzip.decompress(Path(f"{path}.gz").read_bytes()) == content
+    entry = manager.catalog.get(manager._generate_cache_key(*PARAMS, "prayer_times"))
+    assert entry["stored_size"] == len(content) + Path(f"{path}.gz").stat().st_size
+    assert manager.get_cache_stats()["total_size_bytes"] == entry["stored_size"]
+
+    destination = tmp_path / "static" / "out.ics"
+    assert manager.copy_cached_to_destination(*PARAMS, "prayer_times", str(destination))
+    assert os.path.samefile(f"{destination}.gz", f"{path}.gz")
+
+    # Without variants, the published variant of the previous content is removed
+    manager.encodings = ()
+    _save(manager, content=b"BEGIN:VCALENDAR")
+    manager.copy_cached_to_destination(*PARAMS, "prayer_times", str(destination))
+    assert not Path(f"{destination}.gz").exists()
+
+    manager.clear_cache()
+    assert not list((tmp_path / "objects").rglob("*.*"))
+
+
+def test_scope_period_follows_the_mosque_timezone():
+    """Test the period labels and their end at mosque-local midnight"""
+    # 2025-12-31 23:30 UTC is already 2026-01-01 in Paris, still 2025 in New York
+    now = datetime(2025, 12, 31, 23, 30, tzinfo=timezone.utc).timestamp()
+
+    assert scope_period("today", "Europe/Paris", now) == (
+        "2026-01-01",
+        datetime(2026, 1, 1, 23, tzinfo=timezone.utc).timestamp(),
+    )
+    assert scope_period("month", "America/New_York", now) == (
+        "2025_12",
+        datetime(2026, 1, 1, 5, tzinfo=timezone.utc).timestamp(),
+    )
+    assert scope_period("year", "Asia/Tokyo", now) == (
+        "2026",
+        datetime(2026, 12, 31, 15, tzinfo=timezone.utc).timestamp(),
+    )
+    assert scope_period("custom", "Europe/Paris", now) == ("", None)
+
+
+def test_local_now_follows_the_mosque_timezone():
+    """Test that the mosque's date is used, not the server's"""
+    # 2025-03-14 23:30 UTC
+    now = datetime(2025, 3, 14, 23, 30, tzinfo=timezone.utc).timestamp()
+    assert local_now("Asia/Tokyo", now) == datetime(2025, 3, 15, 8, 30)
+    assert local_now("America/New_York", now) == datetime(2025, 3, 14, 19, 30)
+    assert local_now("UTC", now).tzinfo is None
+
+
+def test_entries_expire_at_the_end_of_their_period(tmp_path):
+    """Test that a year entry outlives a day and expires with its local year"""
+    manager = ICSCacheManager(tmp_path)
+    params = ("mosque-a", "year", 10, 35, False)
+    manager.save_to_cache(
+        *params, "slots", b"BEGIN:VCALENDAR", "/tmp/out.ics", timezone_str="Asia/Tokyo"
+    )
+    key = manager._generate_cache_key(*params, "slots", timezone_str="Asia/Tokyo")
+    entry = manager.catalog.get(key)
+    assert entry["expires_at"] == scope_period("year", "Asia/Tokyo")[1]
+    assert entry["parameters"]["timezone"] == "Asia/Tokyo"
+
+    _backdate(manager, key, 30)
+    content = manager.get_cached_content(*params, "slots", timezone_str="Asia/Tokyo")
+    assert content == b"BEGIN:VCALENDAR"
+
+    _backdate(manager, key, 30, expires_at=time.time() - 1)
+    assert manager.run_janitor()["expired"] == 1
+    assert manager.catalog.get(key) is None
+
+
+def test_equivalent_requests_share_a_cache_key(tmp_path):
+    """Test that only the parameters changing the file change the key"""
+    manager = ICSCacheManager(tmp_path)
+    paddings = {
+        name: {"before": 5, "after": 15}
+        for name in ("fajr", "sunset", "dohr", "asr", "maghreb", "icha")
+    }
+
+    def key(*params, file_type="prayer_times", **kwargs):
+        return manager._generate_cache_key(
+            "mosque-a", "month", *params, file_type, **kwargs
+        )
+
+    # Global paddings are unused once every prayer has its own
+    assert key(10, 35, False, prayer_paddings=paddings) == key(
+        0, 0, False, prayer_paddings=paddings
+    )
+    assert key(5, 15, False) == key(0, 0, False, prayer_paddings=paddings)
+    # Sunset and its paddings only matter when sunset is included
+    assert key(5, 15, False) != key(5, 15, True)
+    assert key(5, 15, True, prayer_paddings={"sunset": {"before": 0, "after": 20}}) != (
+        key(5, 15, True)
+    )
+    # Paddings after a prayer below the minimum are raised to it
+    assert key(10, 0, False) == key(10, 10, False)
+    # Disabled features are dropped, and features only change the prayer times file
+    options = {"include_adhkar": True, "show_hijri_date": False}
+    assert key(10, 35, False, features_options=options) == key(
+        10, 35, False, features_options={"include_adhkar": True}
+    )
+    assert key(10, 35, False, features_options=options) != key(10, 35, False)
+    assert key(10, 35, False, file_type="slots", features_options=options) == key(
+        10, 35, False, file_type="slots"
+    )
+    assert key(10, 35, False, features_options={"show_hijri_date": False}) == (
+        key(10, 35, False)
+    )
+
+
+def test_concurrent_misses_generate_once(tmp_path):
+    """Test that concurrent misses of an entry share a single generation"""
+    manager = ICSCacheManager(tmp_path)
+    calls = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.2)
+        return b"BEGIN:VCALENDAR"
+
+    def worker(n):
+        barrier.wait()
+        destination = tmp_path / "static" / f"out{n}.ics"
+        results.append(
+            manager.publish_or_generate(
+                *PARAMS, "slots", str(destination), generate, timezone_str="UTC"
+            )
+        )
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert len(calls) == 1
+    assert sorted(results) == [False] + [True] * 7
+    for n in range(8):
+        assert (tmp_path / "static" / f"out{n}.ics").read_bytes() == b"BEGIN:VCALENDAR"
+    assert manager.get_cache_stats()["generation"]["coalesced"] >= 1
+
+
+def test_generation_by_another_process_is_reused(tmp_path):
+    """Test the recheck of the entry once the generation lock is released"""
+    manager = ICSCacheManager(tmp_path)
+    key = manager._generate_cache_key(*PARAMS, "slots")
+    destination = tmp_path / "static" / "out.ics"
+    results = []
+
+    def generate():
+        raise AssertionError("generated twice")
+
+    # Another worker holds the generation lock of the entry
+    lock = FileLock(manager._generation_flight._lock_path(key))
+    lock.acquire()
+    thread = threading.Thread(
+        target=lambda: results.append(
+            manager.publish_or_generate(*PARAMS, "slots", str(destination), generate)
+        )
+    )
+    thread.start()
+    time.sleep(0.1)
+    ICSCacheManager(tmp_path).save_to_cache(
+        *PARAMS, "slots", b"BEGIN:VCALENDAR", "/tmp/out.ics"
+    )
+    lock.release()
+    thread.join(timeout=10)
+
+    assert results == [True]
+    assert destination.read_bytes() == b"BEGIN:VCALENDAR"
+
+
+def test_early_refresh_rebuilds_entries_before_expiry(tmp_path):
+    """Test the probabilistic early refresh of entries close to their TTL"""
+    manager = ICSCacheManager(tmp_path)
+    manager.upstream_ttl_hours = 1
+    params = ("mosque-a", "year", 10, 35, False)
+    destination = str(tmp_path / "static" / "out.ics")
+    manager.save_to_cache(
+        *params, "slots", b"old calendar", "/tmp/out.ics", build_seconds=1.0
+    )
+
+    # Disabled by default
+    assert manager.publish_or_generate(
+        *params, "slots", destination, lambda: b"new calendar"
+    )
+
+    # Certain with a huge beta: the entry is rebuilt while still valid
+    manager.early_refresh_beta = 1e9
+    assert not manager.publish_or_generate(
+        *params, "slots", destination, lambda: b"new calendar"
+    )
+    assert Path(destination).read_bytes() == b"new calendar"
+    assert manager.get_cache_stats()["generation"]["early_refreshes"] == 1
+
+    # Never for entries without a known generation time
+    manager.save_to_cache(*params, "slots", b"old calendar", "/tmp/out.ics")
+    assert manager.publish_or_generate(
+        *params, "slots", destination, lambda: b"new calendar"
+    )
+
+
+def test_entries_of_other_generator_versions_are_rebuilt(tmp_path):
+    """Test version stamping, lazy rebuilds and the collection of outdated entries"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    _save(manager, file_type="prayer_times", content=b"old prayers")
+    _save(manager, file_type="slots", content=b"old slots")
+    key = manager._generate_cache_key(*PARAMS, "prayer_times")
+    assert manager.catalog.get(key)["generator_version"] == 1
+
+    # Deploy of a new prayer times generator
+    manager = ICSCacheManager(tmp_path)
+    manager.generator_versions["prayer_times"] = 2
+    destination = str(tmp_path / "static" / "out.ics")
+    assert not manager.publish_or_generate(
+        *PARAMS, "prayer_times", destination, lambda: b"new prayers"
+    )
+    assert manager.catalog.get(key)["generator_version"] == 2
+    assert manager.get_cached_content(*PARAMS, "prayer_times") == b"new prayers"
+    assert manager.get_cached_content(*PARAMS, "slots") == b"old slots"
+
+    # Entries nobody asked for since the deploy are collected by the janitor
+    other = ("mosque-b", "month", 10, 35, False)
+    manager.generator_versions["prayer_times"] = 1
+    _save(manager, other, content=b"other prayers")
+    manager.generator_versions["prayer_times"] = 2
+    assert manager.run_janitor()["outdated"] == 1
+    assert manager.get_cache_stats()["total_files"] == 2
+    assert manager.get_cache_stats()["quota"]["outdated"] == 1
+
+
+def test_catalog_upgrade_keeps_entries(tmp_path):
+    """Test that the catalog of the previous schema is migrated, not emptied"""
+    manager = ICSCacheManager(tmp_path)
+    _save(manager)
+    key = manager._generate_cache_key(*PARAMS, "prayer_times")
+    conn = sqlite3.connect(tmp_path / "cache_catalog.sqlite3")
+    with conn:
+        conn.execute("DROP INDEX idx_cache_entries_masjid_id")
+        conn.execute("DROP INDEX idx_cache_entries_fingerprint")
+        conn.execute("DROP TABLE timetable_refs")
+        for column in ("generator_version", "masjid_id", "scope", "fingerprint"):
+            conn.execute(f"ALTER TABLE cache_entries DROP COLUMN {column}")
+        conn.execute("PRAGMA user_version = 5")
+    conn.close()
+
+    manager = ICSCacheManager(tmp_path)
+    # Indexed by mosque from the stored parameters
+    assert manager.catalog.get(key)["masjid_id"] == "mosque-a"
+    assert manager.catalog.get(key)["scope"] == "month"
+    assert manager.catalog.get(key)["fingerprint"] is None
+    # Kept, but from an unknown generator version: rebuilt on the next request
+    assert manager.catalog.get(key)["generator_version"] == 0
+    assert manager.get_cached_content(*PARAMS, "prayer_times") is None
+
+
+def test_invalidate_removes_the_entries_of_a_mosque(tmp_path):
+    """Test invalidation by mosque, file type and scope, across processes"""
+    manager = ICSCacheManager(tmp_path)
+    other_process = ICSCacheManager(tmp_path)
+    year = ("mosque-a", "year", 10, 35, False)
+    other = ("mosque-b", "month", 10, 35, False)
+    _save(manager, content=b"month prayers")
+    _save(manager, year, content=b"year prayers")
+    _save(manager, file_type="slots", content=b"month slots")
+    _save(manager, other, content=b"other prayers")
+    assert other_process.get_cached_content(*PARAMS, "slots") == b"month slots"
+
+    assert manager.invalidate("mosque-a", "prayer_times", "year") == 1
+    assert manager.get_cached_content(*year, "prayer_times") is None
+    assert manager.invalidate("mosque-a", "slots") == 1
+    assert manager.invalidate("mosque-a") == 1
+    assert manager.invalidate("mosque-a") == 0
+    assert manager.get_cached_content(*PARAMS, "prayer_times") is None
+    assert manager.get_cached_content(*other, "prayer_times") == b"other prayers"
+
+    # The memory tier of the other process is dropped at its next sync
+    other_process._memory_synced_at = 0
+    assert other_process.get_cached_content(*PARAMS, "slots") is None
+    stats = manager.get_cache_stats()
+    assert stats["total_files"] == 1
+    assert stats["quota"]["invalidated"] == 3
+
+
+def test_lock_files_of_removed_entries_are_removed(tmp_path):
+    """Test that invalidation and the janitor remove the lock files nobody holds"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    year = ("mosque-a", "year", 10, 35, False)
+    locks = {}
+    for params in (PARAMS, year):
+        destination = str(tmp_path / "static" / f"{params[1]}.ics")
+        manager.publish_or_generate(*params, "prayer_times", destination, lambda: b"x")
+        key = manager._generate_cache_key(*params, "prayer_times")
+        locks[params] = (
+            manager._entry_lock(key).path,
+            manager._generation_flight._lock_path(key),
+        )
+        assert all(path.exists() for path in locks[params])
+
+    year_key = manager._generate_cache_key(*year, "prayer_times")
+    reader = manager._entry_lock(year_key, shared=True)
+    assert reader.acquire()
+    try:
+        assert manager.invalidate("mosque-a", scope="month") == 1
+        _backdate(manager, year_key, 1e6)
+        assert manager.run_janitor()["expired"] == 1
+    finally:
+        reader.release()
+
+    assert not any(path.exists() for path in locks[PARAMS])
+    # Still held by a reader when its entry expired
+    entry_lock, generation_lock = locks[year]
+    assert entry_lock.exists()
+    assert not generation_lock.exists()
+    assert remove_lock_file(entry_lock)
+    assert not entry_lock.exists()
+
+
+def test_lock_file_removed_while_waiting_is_opened_again(tmp_path):
+    """Test that a waiter does not lock a lock file unlinked in the meantime"""
+    path = tmp_path / "entry.lock"
+    holder = FileLock(path)
+    assert holder.acquire()
+    waiter = FileLock(path)
+    acquired = threading.Event()
+
+    def wait_for_lock():
+        waiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=wait_for_lock)
+    thread.start()
+    time.sleep(0.1)
+    assert not remove_lock_file(path)
+    path.unlink()
+    holder.release()
+    thread.join(timeout=5)
+
+    assert acquired.is_set()
+    # The waiter holds the lock of the file now at the path, not of the unlinked one
+    assert path.exists()
+    assert not FileLock(path).acquire(timeout=0)
+    waiter.release()
+    assert remove_lock_file(path)
+    assert not path.exists()
+
+
+def test_expired_entries_of_an_unchanged_timetable_are_restamped(tmp_path):
+    """Test that only a change of timetable rebuilds an entry past its TTL"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    destination = str(tmp_path / "static" / "out.ics")
+    key = manager._generate_cache_key(*PARAMS, "prayer_times")
+    builds = []
+
+    def generate():
+        builds.append(True)
+        return b"prayers %d" % len(builds)
+
+    assert not manager.publish_or_generate(
+        *PARAMS, "prayer_times", destination, generate, fingerprint="v1"
+    )
+    assert manager.catalog.get(key)["fingerprint"] == "v1"
+
+    # Past its TTL, same timetable: renewed, not rebuilt, and kept by the janitor
+    _backdate(manager, key, DEFAULT_UPSTREAM_TTL_HOURS + 1)
+    assert manager.run_janitor()["expired"] == 0
+    assert manager.publish_or_generate(
+        *PARAMS, "prayer_times", destination, generate, fingerprint="v1"
+    )
+    assert len(builds) == 1
+    assert time.time() - manager.catalog.get(key)["created_at"] < 60
+    assert manager.get_cache_stats()["generation"]["restamped"] == 1
+
+    # New timetable: rebuilt
+    assert not manager.publish_or_generate(
+        *PARAMS, "prayer_times", destination, generate, fingerprint="v2"
+    )
+    assert len(builds) == 2
+    assert Path(destination).read_bytes() == b"prayers 2"
+
+    # Without a fingerprint, an entry past its TTL is still rebuilt
+    _backdate(manager, key, DEFAULT_UPSTREAM_TTL_HOURS + 1)
+    assert not manager.publish_or_generate(
+        *PARAMS, "prayer_times", destination, generate
+    )
+    assert len(builds) == 3
+
+
+def test_mosques_with_the_same_timetable_share_slots(tmp_path):
+    """Test that slots files are keyed by timetable, prayer times by mosque"""
+    manager = ICSCacheManager(tmp_path)
+    manager.encodings = ()
+    other = ("mosque-b", "month", 10, 35, False)
+    builds = []
+
+    def generate():
+        builds.append(True)
+        return b"content %d" % len(builds)
+
+    for params in (PARAMS, other):
+        for file_type in ("slots", "empty_slots", "prayer_times"):
+            destination = str(tmp_path / "static" / f"{file_type}_{params[0]}.ics")
+            manager.publish_or_generate(
+                *params, file_type, destination, generate, fingerprint="same"
+            )
+    # Slots and empty slots built once for both mosques, prayer times twice
+    assert len(builds) == 4
+    assert (tmp_path / "static" / "slots_mosque-b.ics").read_bytes() == b"content 1"
+    assert manager.get_cached_content(*other, "slots", fingerprint="same") == (
+        b"content 1"
+    )
+    assert manager.get_cached_content(*other, "slots", fingerprint="moved") is None
+    assert manager.get_cache_stats()["total_files"] == 4
+
+
+def _serve_timetable(manager, tmp_path, params, fingerprint):
+    """Publish the slots and prayer times of a mosque built from a timetable"""
+    for file_type in ("slots", "prayer_times"):
+        destination = str(tmp_path / "static" / f"{file_type}_{params[0]}.ics")
+        manager.publish_or_generate(
+            *params,
+            file_type,
+            destination,
+            lambda file_type=file_type: f"{file_type} {params[0]}".encode(),
+            fingerprint=fingerprint,
+        )
+
+
+def test_invalidate_reaches_the_shared_entries_of_a_mosque(tmp_path):
+    """Test that invalidating any mosque served a shared entry removes it"""
+    manager = ICSCacheManager(tmp_path)
+    other = ("mosque-b", "month", 10, 35, False)
+    _serve_timetable(manager, tmp_path, PARAMS, "same")
+    _serve_timetable(manager, tmp_path, other, "same")
+    slots_key = manager._generate_cache_key(*PARAMS, "slots", fingerprint="same")
+    assert manager.catalog.get(slots_key)["masjid_id"] is None
+
+    # Built for mosque A, invalidated through mosque B
+    assert manager.invalidate("mosque-b") == 2
+    assert manager.catalog.get(slots_key) is None
+    assert manager.get_cached_content(*PARAMS, "prayer_times") is not None
+
+
+def test_timetable_change_removes_outdated_entries(tmp_path):
+    """Test that a new timetable removes the entries of the previous one, shared
+    entries once no mosque is served their timetable any more"""
+    manager = ICSCacheManager(tmp_path)
+    other = ("mosque-b", "month", 10, 35, False)
+    _serve_timetable(manager, tmp_path, PARAMS, "v1")
+    _serve_timetable(manager, tmp_path, other, "v1")
+    slots_key = manager._generate_cache_key(*PARAMS, "slots", fingerprint="v1")
+
+    assert manager.invalidate_outdated("mosque-a", "v1") == 0
+    # Mosque B is still served the shared slots
+    assert manager.invalidate_outdated("mosque-a", "v2") == 1
+    assert manager.get_cached_content(*PARAMS, "prayer_times") is None
+    assert manager.catalog.get(slots_key) is not None
+    assert manager.invalidate_outdated("mosque-b", "v2") == 2
+    assert manager.catalog.get(slots_key) is None
+    assert manager.invalidate_outdated("mosque-b", "v2") == 0
+    assert manager.get_cache_stats()["total_files"] == 0
@@ -0,0 +1,54 @@
+import gzip
+
+import pytest
+from werkzeug.http import parse_accept_header
+
+from app.modules.compression import (
+    COMPRESSION_LEVELS,
+    available_encodings,
+    compress,
+    negotiate,
+    variant_path,
+)
+
+
+def test_available_encodings():
+    """Test that gzip is always available and unknown encodings are refused"""
+    assert "gzip" in available_encodings()
+    assert available_encodings(["gzip"]) == ("gzip",)
+    with pytest.raises(ValueError):
+        available_encodings(["deflate"])
+
+
+def test_gzip_variant_is_deterministic():
+    """Test that the same content always gives the same variant"""
+    data = b"BEGIN:VEVENT\r\nEND:VEVENT\r\n" * 200
+    variant = compress(data, "gzip")
+    assert variant == compress(data, "gzip")
+    assert gzip.decompress(variant) == data
+    assert len(variant) * 10 < len(data)
+
+
+def test_variants_use_moderate_levels():
+    """Test that variants are compressed at the COMPRESSION_LEVELS levels"""
+    data = b"BEGIN:VEVENT\r\nSUMMARY:Fajr\r\nEND:VEVENT\r\n" * 200
+    level = COMPRESSION_LEVELS["gzip"]
+    assert level < 9
+    assert compress(data, "gzip") == gzip.compress(data, compresslevel=level, mtime=0)
+    for encoding in available_encodings():
+        assert len(compress(data, encoding)) < len(data)
+
+
+def test_negotiate_uses_present_variants(tmp_path):
+    """Test the choice of the variant from Accept-Encoding"""
+    path = tmp_path / "cal.ics"
+    path.write_bytes(b"raw")
+    accept = parse_accept_header("br;q=1.0, gzip;q=0.5")
+
+    assert negotiate(accept, path) is None
+    variant_path(path, "gzip").write_bytes(b"gz")
+    assert negotiate(accept, path) == "gzip"
+    variant_path(path, "br").write_bytes(b"br")
+    assert negotiate(accept, path) == "br"
+    assert negotiate(parse_accept_header("identity"), path) is None
+    assert negotiate(parse_accept_header("gzip;q=0"), path) is None
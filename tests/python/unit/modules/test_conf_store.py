@@ -0,0 +1,57 @@
+import time
+
+from app.modules.conf_store import ConfStore
+
+
+def test_put_and_get(tmp_path):
+    """Test that stored confData is read back with its validators"""
+    store = ConfStore(tmp_path / "store.sqlite3")
+    store.put("mosque-a", {"timezone": "Europe/Paris"}, etag='"abc"')
+
+    entry = store.get("mosque-a")
+    assert entry["conf_data"] == {"timezone": "Europe/Paris"}
+    assert entry["etag"] == '"abc"'
+    assert entry["last_modified"] is None
+    assert entry["size"] > 0
+    assert store.get("unknown") is None
+
+
+def test_shared_between_instances(tmp_path):
+    """Test that two instances (two workers) see the same entries"""
+    path = tmp_path / "store.sqlite3"
+    ConfStore(path).put("mosque-a", {"name": "A"})
+
+    other = ConfStore(path)
+    assert other.get("mosque-a")["conf_data"] == {"name": "A"}
+    with other._connect() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_touch_keeps_payload_and_updates_validators(tmp_path):
+    """Test that a 304 revalidation renews the fetch time only"""
+    store = ConfStore(tmp_path / "store.sqlite3")
+    store.put(
+        "mosque-a", {"name": "A"}, etag='"v1"', last_modified="x", fetched_at=100.0
+    )
+
+    store.touch("mosque-a", etag='"v2"')
+    entry = store.get("mosque-a")
+    assert entry["conf_data"] == {"name": "A"}
+    assert entry["etag"] == '"v2"'
+    assert entry["last_modified"] == "x"
+    assert entry["fetched_at"] > time.time() - 60
+
+
+def test_delete_clear_and_stats(tmp_path):
+    """Test removal and statistics"""
+    store = ConfStore(tmp_path / "store.sqlite3")
+    store.put("mosque-a", {"name": "A"})
+    store.put("mosque-b", {"name": "B"})
+    store.delete("mosque-a")
+
+    stats = store.stats()
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] > 0
+
+    store.clear()
+    assert store.stats()["entries"] == 0
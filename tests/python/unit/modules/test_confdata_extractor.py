@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+
+from app.modules.confdata_extractor import (
+    CONF_DATA_FIELDS,
+    ConfDataScanner,
+    compact_conf_data,
+    extract_conf_data_text,
+    scan_conf_data,
+)
+from benchmarks.mosque_pages import build_conf_data
+
+PAGES_DIR = Path(__file__).resolve().parents[3] / "data" / "mosque_pages"
+
+
+def _chunks(data: bytes, size: int):
+    """Split data into chunks of the given size."""
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_extract_from_saved_page():
+    """Test extraction on a saved mosque page"""
+    page = (PAGES_DIR / "mosquee-exemple-paris.html").read_bytes()
+    json_text, read = scan_conf_data(_chunks(page, 16 * 1024))
+
+    conf_data = json.loads(json_text)
+    assert conf_data["slug"] == "mosquee-exemple-paris"
+    assert len(conf_data["calendar"]) == 12
+    # Reading stops once the object is closed, before the end of the page
+    assert len(read) < len(page)
+
+
+def test_strings_with_braces_and_escapes():
+    """Test that braces and escaped quotes inside strings are ignored"""
+    html = (
+        '<script>var confData = {"a": "} { \\" \\\\", "b": {"c": [1, 2]}};'
+        " var other = {};</script>"
+    )
+    json_text = extract_conf_data_text(html)
+    assert json.loads(json_text) == {"a": '} { " \\', "b": {"c": [1, 2]}}
+
+
+def test_byte_by_byte_feeding():
+    """Test that markers and escapes split across chunks are handled"""
+    html = '<p>x</p><script>var   confData =\n{"k": "v\\"}", "n": {"m": 1}};</script>'
+    data = html.encode()
+
+    scanner = ConfDataScanner()
+    for chunk in _chunks(data, 1):
+        if scanner.feed(chunk):
+            break
+
+    assert scanner.done
+    assert json.loads(scanner.json_text) == {"k": 'v"}', "n": {"m": 1}}
+
+
+def test_missing_marker_returns_whole_body():
+    """Test that a page without confData is fully returned for the fallback"""
+    body = b"<html><body>No script here</body></html>"
+    json_text, read = scan_conf_data(_chunks(body, 8))
+    assert json_text is None
+    assert read == body
+
+
+def test_unclosed_object():
+    """Test that a truncated object is not returned"""
+    assert extract_conf_data_text('<script>var confData = {"a": [1, 2') is None
+
+
+def test_compact_conf_data_keeps_used_fields():
+    """Test that unused fields are dropped and time strings are shared"""
+    conf_data = build_conf_data("mosque-a", extra_bytes=20000)
+    other = build_conf_data("mosque-b", extra_bytes=20000)
+    compact = compact_conf_data(conf_data)
+
+    assert set(compact) == set(CONF_DATA_FIELDS) & set(conf_data)
+    assert "announcements" not in compact
+    assert compact["calendar"] == conf_data["calendar"]
+    assert compact["times"] == conf_data["times"]
+    assert compact_conf_data(compact) == compact
+    # Same time in two mosques: a single string object
+    assert (
+        compact["calendar"][0]["1"][2]
+        is compact_conf_data(other)["calendar"][0]["1"][2]
+    )
+    assert len(json.dumps(compact)) * 2 < len(json.dumps(conf_data))
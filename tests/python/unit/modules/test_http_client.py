@@ -0,0 +1,40 @@
+from flask import Flask
+
+from app.modules.http_client import (
+    get_http_session,
+    get_pool_settings,
+    reset_http_session,
+)
+
+
+def test_get_http_session_is_shared():
+    """Test that the same pooled session is returned on every call"""
+    reset_http_session()
+    session = get_http_session()
+    assert get_http_session() is session
+    assert session.headers["Connection"] == "keep-alive"
+
+
+def test_reset_http_session_builds_new_session():
+    """Test that reset drops the shared session"""
+    session = get_http_session()
+    reset_http_session()
+    assert get_http_session() is not session
+
+
+def test_pool_settings_from_config():
+    """Test that the pool is sized from the MAWAQIT_* settings"""
+    app = Flask(__name__)
+    app.config.update({"MAWAQIT_POOL_MAXSIZE": 3, "MAWAQIT_KEEPALIVE": False})
+
+    with app.app_context():
+        settings = get_pool_settings()
+        assert settings["pool_maxsize"] == 3
+        reset_http_session()
+        session = get_http_session()
+        adapter = session.get_adapter("https://mawaqit.net")
+        assert adapter._pool_maxsize == 3
+        assert adapter.max_retries.total == 0
+        assert session.headers["Connection"] == "close"
+
+    reset_http_session()
@@ -0,0 +1,134 @@
+from datetime import date
+
+import pytest
+
+from app.modules.prayer_table import (
+    PrayerTable,
+    format_minutes,
+    parse_minutes,
+    timetable_fingerprint,
+)
+from benchmarks.mosque_pages import build_calendar, build_conf_data
+
+
+def test_parse_and_format_minutes():
+    """Test the HH:MM conversions"""
+    assert parse_minutes("05:07") == 307
+    assert parse_minutes(" 23:59 ") == 1439
+    assert format_minutes(307) == "05:07"
+    for invalid in ("24:00", "0530", "", None):
+        with pytest.raises(ValueError):
+            parse_minutes(invalid)
+
+
+def test_from_calendar():
+    """Test that the calendar is parsed into minutes per day and prayer"""
+    calendar = build_calendar(seed=1)
+    table = PrayerTable.from_calendar(calendar, "Europe/Paris")
+
+    fajr, sunset, dohr, asr, maghreb, icha = calendar[2]["15"]
+    assert table.day_times(3, 15) == {
+        "fajr": fajr,
+        "sunset": sunset,
+        "dohr": dohr,
+        "asr": asr,
+        "maghreb": maghreb,
+        "icha": icha,
+    }
+    assert table.day_minutes(3, 15, ("fajr", "icha")) == {
+        "fajr": parse_minutes(fajr),
+        "icha": parse_minutes(icha),
+    }
+    # 366 days x 6 prayers x 2 bytes
+    assert table.nbytes == 366 * 6 * 2
+
+
+def test_missing_days_filled_from_last_day():
+    """Test that missing days at the end of a month reuse the last available day"""
+    calendar = [{"1": ["05:00", "06:30", "13:00", "16:00", "19:00", "20:30"]}]
+    table = PrayerTable.from_calendar(calendar, "Europe/Paris")
+
+    assert table.day_times(1, 31) == table.day_times(1, 1)
+    assert not table.has_day(2, 1)
+
+
+def test_from_conf_data_uses_todays_times():
+    """Test that today's row comes from the times and shuruq fields"""
+    conf_data = build_conf_data("mosque-a", seed=2)
+    conf_data["times"] = ["04:00", "12:00", "15:00", "18:00", "19:30"]
+    conf_data["shuruq"] = "05:30"
+
+    table = PrayerTable.from_conf_data(conf_data, today=date(2025, 6, 10))
+    assert table.day_times(6, 10) == {
+        "fajr": "04:00",
+        "sunset": "05:30",
+        "dohr": "12:00",
+        "asr": "15:00",
+        "maghreb": "18:00",
+        "icha": "19:30",
+    }
+    assert table.timezone == "Europe/Paris"
+
+
+def test_scope_days_follow_the_year_length():
+    """Test that 29 February only exists in leap years"""
+    table = PrayerTable.from_calendar(build_calendar(), "Europe/Paris")
+
+    assert len(list(table.scope_days("year", date(2025, 3, 1)))) == 365
+    assert len(list(table.scope_days("year", date(2024, 3, 1)))) == 366
+    days = list(table.scope_days("month", date(2025, 2, 14)))
+    assert (days[0].day, days[-1].day) == (1, 28)
+    assert [d.day for d in table.scope_days("today", date(2025, 2, 14))] == [14]
+    with pytest.raises(ValueError):
+        list(table.scope_days("week"))
+
+
+def test_from_scope_data():
+    """Test conversion of the normalized planner data"""
+    today = date(2025, 4, 20)
+    daily = {"fajr": "05:00", "dohr": "13:00", "asr": "16:30", "maghreb": "20:00"}
+
+    table = PrayerTable.from_scope_data(daily, "today", "Europe/Paris", today)
+    assert table.day_times(4, 20) == daily
+
+    table = PrayerTable.from_scope_data([daily, daily], "month", "UTC", today)
+    assert [d.day for d in table.scope_days("month", today)] == [1, 2]
+
+    table = PrayerTable.from_scope_data([{}, {"3": daily}], "year", "UTC", today)
+    assert [(d.month, d.day) for d in table.scope_days("year", today)] == [(2, 3)]
+
+
+def test_fingerprint_follows_the_calendar():
+    """Test that the fingerprint follows the calendar, timezone and today's times"""
+    calendar = build_calendar(seed=1)
+    table = PrayerTable.from_calendar(calendar, "Europe/Paris")
+    fingerprint = table.fingerprint
+    assert fingerprint == timetable_fingerprint(calendar, "Europe/Paris")
+    assert len(fingerprint) == 64
+    assert timetable_fingerprint(calendar, "UTC") != fingerprint
+    assert timetable_fingerprint(build_calendar(seed=2), "Europe/Paris") != (
+        fingerprint
+    )
+
+    # Today's times matching the calendar change every day, the timetable does not
+    for today in (date(2025, 3, 15), date(2025, 3, 16)):
+        fajr, shuruq, dohr, asr, maghreb, icha = calendar[2][str(today.day)]
+        conf_data = {
+            "calendar": calendar,
+            "timezone": "Europe/Paris",
+            "times": [fajr, dohr, asr, maghreb, icha],
+            "shuruq": shuruq,
+        }
+        table = PrayerTable.from_conf_data(conf_data, today)
+        assert table.fingerprint == fingerprint
+
+    # Times of the mosque that differ from its calendar are part of the timetable
+    conf_data["times"] = ["05:00", "13:00", "16:00", "19:00", "20:30"]
+    other = PrayerTable.from_conf_data(conf_data, date(2025, 3, 16))
+    assert other.fingerprint not in (None, fingerprint)
+    assert other != table
+    assert PrayerTable.from_conf_data(conf_data, date(2025, 3, 16)).fingerprint == (
+        other.fingerprint
+    )
+
+    assert PrayerTable.from_scope_data({}, "month", "UTC").fingerprint is None
@@ -0,0 +1,96 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from app.modules.rate_limiter import RateLimitTimeout, TokenBucket
+
+
+def _acquire_in_process(path, count, results):
+    """Take tokens from a bucket built in another process"""
+    bucket = TokenBucket(rate=20.0, burst=1, path=path)
+    for _ in range(count):
+        bucket.acquire()
+    results.put(time.time())
+
+
+def test_burst_then_rate():
+    """Test that the burst passes at once and later requests are spaced"""
+    bucket = TokenBucket(rate=50.0, burst=3)
+    started = time.monotonic()
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert all(w > 0 for w in waits[3:])
+    # 3 extra tokens at 50/s: at least 60 ms
+    assert time.monotonic() - started >= 0.05
+
+    stats = bucket.stats()
+    assert stats["acquired"] == 6
+    assert stats["delayed"] == 3
+    assert stats["wait_seconds_max"] > 0
+    assert stats["wait_seconds_total"] >= stats["wait_seconds_max"]
+
+
+def test_queue_timeout():
+    """Test that a request is refused when its slot is beyond the timeout"""
+    bucket = TokenBucket(rate=1.0, burst=1, queue_timeout=0.1)
+    bucket.acquire()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire()
+    assert bucket.stats()["timeouts"] == 1
+    # A refused request does not consume a token
+    assert bucket.acquire(timeout=1.5) <= 1.0
+
+
+def test_disabled():
+    """Test that a zero rate never waits"""
+    bucket = TokenBucket(rate=None, burst=1)
+    assert [bucket.acquire() for _ in range(100)] == [0.0] * 100
+
+
+def test_threads_share_the_bucket():
+    """Test that concurrent threads are served in turn"""
+    bucket = TokenBucket(rate=40.0, burst=1)
+    started = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert time.monotonic() - started >= 4 / 40 - 0.01
+    assert bucket.stats()["acquired"] == 5
+
+
+def test_state_file_is_shared(tmp_path):
+    """Test that two buckets on the same file share their tokens"""
+    path = tmp_path / "ratelimit"
+    first = TokenBucket(rate=20.0, burst=2, path=path)
+    second = TokenBucket(rate=20.0, burst=2, path=path)
+
+    assert first.acquire() == 0.0
+    assert second.acquire() == 0.0
+    assert first.acquire() > 0
+    assert second.acquire() > 0
+
+
+def test_processes_share_the_bucket(tmp_path):
+    """Test the limit across worker processes"""
+    path = str(tmp_path / "ratelimit")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    started = time.time()
+    workers = [
+        context.Process(target=_acquire_in_process, args=(path, 3, results))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+
+    finished = max(results.get(timeout=1) for _ in workers)
+    # 6 requests at 20/s with a single token of burst: at least 5 intervals of 50 ms
+    assert finished - started >= 0.24
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+from app.modules.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class Flaky:
+    """Callable failing a given number of times before succeeding"""
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, _remaining):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("upstream down")
+        return "ok"
+
+
+def test_backoff_is_exponential_jittered_and_capped():
+    """Test the delay bounds"""
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=0.5)
+    for attempt, full in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)]:
+        delay = policy.backoff(attempt)
+        assert full * 0.5 <= delay <= full
+
+
+def test_call_retries_then_succeeds():
+    """Test that retryable errors are retried"""
+    fn = Flaky(2)
+    policy = RetryPolicy(max_retries=2, base_delay=0.01)
+    assert policy.call(fn, retry_on=(ConnectionError,)) == "ok"
+    assert fn.calls == 3
+
+
+def test_call_does_not_retry_other_errors():
+    """Test that errors outside retry_on are raised at once"""
+    fn = Flaky(5, error=ValueError)
+    policy = RetryPolicy(max_retries=3, base_delay=0.01)
+    with pytest.raises(ValueError):
+        policy.call(fn, retry_on=(ConnectionError,))
+    assert fn.calls == 1
+
+
+def test_call_stops_at_deadline():
+    """Test that no retry starts once the budget cannot cover the delay"""
+    fn = Flaky(10)
+    policy = RetryPolicy(max_retries=10, base_delay=0.2, jitter=0, deadline=0.5)
+    started = time.monotonic()
+    with pytest.raises(ConnectionError):
+        policy.call(fn, retry_on=(ConnectionError,))
+    assert time.monotonic() - started < 0.5
+    assert fn.calls == 2
+
+
+def test_breaker_opens_and_fails_fast():
+    """Test that the breaker rejects calls once open"""
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    policy = RetryPolicy(max_retries=0)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            policy.call(Flaky(1), retry_on=(ConnectionError,), breaker=breaker)
+
+    fn = Flaky(0)
+    with pytest.raises(CircuitOpenError):
+        policy.call(fn, retry_on=(ConnectionError,), breaker=breaker)
+    assert fn.calls == 0
+    assert breaker.stats()["state"] == "open"
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_breaker_half_open_trial():
+    """Test that a successful trial after the cool-down closes the circuit"""
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    policy = RetryPolicy(max_retries=0)
+    with pytest.raises(ConnectionError):
+        policy.call(Flaky(1), retry_on=(ConnectionError,), breaker=breaker)
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+
+    assert policy.call(Flaky(0), retry_on=(ConnectionError,), breaker=breaker) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_retry_wait_interrupted_when_circuit_opens():
+    """Test that a sleeping retry gives up when the breaker opens meanwhile"""
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    policy = RetryPolicy(max_retries=1, base_delay=5.0, jitter=0)
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        policy.call(Flaky(1), retry_on=(ConnectionError,), breaker=breaker)
+    assert time.monotonic() - started < 1
+
+
+def test_local_errors_are_neither_retried_nor_counted():
+    """Test that no_retry errors are raised at once and leave the breaker alone"""
+
+    class Throttled(RuntimeError):
+        pass
+
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    policy = RetryPolicy(max_retries=3, base_delay=5.0, jitter=0)
+    fn = Flaky(1, error=Throttled)
+    started = time.monotonic()
+    with pytest.raises(Throttled):
+        policy.call(
+            fn, retry_on=(RuntimeError,), breaker=breaker, no_retry=(Throttled,)
+        )
+    assert time.monotonic() - started < 1
+    assert fn.calls == 1
+    assert breaker.stats()["state"] == "closed"
+
+    # A half-open trial refused locally does not block the next trial
+    policy = RetryPolicy(max_retries=0)
+    with pytest.raises(ConnectionError):
+        policy.call(Flaky(1), retry_on=(ConnectionError,), breaker=breaker)
+    time.sleep(0.06)
+    with pytest.raises(Throttled):
+        policy.call(
+            Flaky(1, error=Throttled),
+            retry_on=(RuntimeError,),
+            breaker=breaker,
+            no_retry=(Throttled,),
+        )
+    assert policy.call(Flaky(0), retry_on=(RuntimeError,), breaker=breaker) == "ok"
+    assert breaker.state == "closed"
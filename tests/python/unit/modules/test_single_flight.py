@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from app.modules.file_lock import FileLock
+from app.modules.single_flight import SingleFlight
+
+
+def _run_concurrently(target, count):
+    """Start count threads on target and collect their results or errors."""
+    results = []
+    barrier = threading.Barrier(count)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+
+def test_concurrent_calls_are_coalesced():
+    """Test that concurrent callers share a single execution"""
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"ok": True}
+
+    results = _run_concurrently(lambda: flight.do("mosque", work), 8)
+
+    assert len(calls) == 1
+    assert results == [{"ok": True}] * 8
+    assert flight.coalesced == 7
+    assert flight.in_flight() == 0
+
+
+def test_exception_is_shared_with_waiters():
+    """Test that waiters receive the leader's exception"""
+    flight = SingleFlight()
+
+    def work():
+        time.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    results = _run_concurrently(lambda: flight.do("mosque", work), 4)
+
+    assert len(results) == 4
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_sequential_calls_run_again():
+    """Test that a finished call does not stick around"""
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_lock_file_recheck(tmp_path):
+    """Test that recheck short-circuits the work once the lock file is held"""
+    flight = SingleFlight(lock_dir=tmp_path)
+
+    def work():
+        pytest.fail("work should not run when recheck finds a value")
+
+    assert flight.do("k", work, recheck=lambda: "from-other-process") == (
+        "from-other-process"
+    )
+    assert list(tmp_path.glob("*.lock"))
+
+
+def test_lock_file_wait_is_bounded(tmp_path):
+    """Test that a lock file held elsewhere delays the work by lock_timeout at most"""
+    flight = SingleFlight(lock_dir=tmp_path, lock_timeout=0.2)
+    held = FileLock(flight._lock_path("k"))
+    assert held.acquire()
+    try:
+        assert not FileLock(held.path).acquire(timeout=0)
+        started = time.monotonic()
+        assert flight.do("k", lambda: "local") == "local"
+        waited = time.monotonic() - started
+    finally:
+        held.release()
+
+    assert 0.2 <= waited < 2
+    assert flight.lock_timeouts == 1
+    assert flight.do("k", lambda: "locked") == "locked"
+    assert flight.lock_timeouts == 1
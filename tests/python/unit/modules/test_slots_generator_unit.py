@@ -3,7 +3,7 @@ from zoneinfo import ZoneInfo
 
 import pytest
 
-from app.modules.slots_generator import format_duration, to_datetime
+from app.modules.slots_generator import format_duration, slot_events, to_datetime
 
 
 def test_to_datetime():
@@ -50,3 +50,18 @@ def test_format_duration():
     # Test negative durations (should return '0h00')
     assert format_duration(timedelta(hours=-2, minutes=-30)) == "0h00"
     assert format_duration(timedelta(hours=-1, minutes=-5)) == "0h00"
+
+
+def test_slot_events_are_built_in_memory(tmp_path, monkeypatch):
+    """Test that the day's slots are returned as events, without any file"""
+    monkeypatch.chdir(tmp_path)
+    times = {"fajr": "05:00", "dohr": "13:00", "asr": "16:00", "maghreb": "19:00"}
+    times["icha"] = "20:30"
+    events = slot_events(times, datetime(2024, 3, 15), "Europe/Paris", 10, 20)
+
+    tz = ZoneInfo("Europe/Paris")
+    assert str(events[0]["summary"]) == "Availability (7h30)"
+    assert events[0].decoded("dtstart") == datetime(2024, 3, 15, 5, 20, tzinfo=tz)
+    assert events[-1].decoded("dtend") == datetime(2024, 3, 16, 4, 50, tzinfo=tz)
+    assert len(events) == 5
+    assert list(tmp_path.iterdir()) == []
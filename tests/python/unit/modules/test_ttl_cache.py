@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from app.modules.ttl_cache import TTLCache
+
+
+def test_get_set_and_counters():
+    """Test basic storage with hit/miss counters"""
+    cache = TTLCache(max_entries=10, max_bytes=1000, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", {"x": 1}, size=10)
+    assert cache.get("a") == {"x": 1}
+    assert "a" in cache
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size_bytes"] == 10
+
+
+def test_lru_eviction_by_entry_count():
+    """Test that the least recently used entry is evicted first"""
+    cache = TTLCache(max_entries=2, max_bytes=1000, ttl=None)
+    cache.set("a", 1, size=1)
+    cache.set("b", 2, size=1)
+    cache.get("a")  # "b" becomes the least recently used
+    cache.set("c", 3, size=1)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_byte_budget():
+    """Test that the byte budget is enforced"""
+    cache = TTLCache(max_entries=100, max_bytes=100, ttl=None)
+    cache.set("a", "x", size=60)
+    cache.set("b", "y", size=60)
+    assert "a" not in cache
+    assert cache.stats()["size_bytes"] == 60
+
+    # A value larger than the whole budget is not stored
+    cache.set("c", "z", size=500)
+    assert "c" not in cache
+    assert "b" in cache
+
+
+def test_entry_expiry():
+    """Test that expired entries are treated as misses"""
+    cache = TTLCache(max_entries=10, max_bytes=1000, ttl=30)
+    with patch("app.modules.ttl_cache.time.monotonic", return_value=1000.0):
+        cache.set("a", 1, size=1)
+    with patch("app.modules.ttl_cache.time.monotonic", return_value=1029.0):
+        assert cache.get("a") == 1
+    with patch("app.modules.ttl_cache.time.monotonic", return_value=1031.0):
+        assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_configure_shrinks_cache():
+    """Test that lowering the limits evicts entries"""
+    cache = TTLCache(max_entries=10, max_bytes=1000, ttl=None)
+    for key in range(5):
+        cache.set(key, key, size=1)
+    cache.configure(max_entries=2)
+    assert len(cache) == 2
+    assert 4 in cache
+    assert 0 not in cache